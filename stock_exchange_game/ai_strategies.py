@@ -0,0 +1,170 @@
+"""
+AI player strategies.
+
+Each strategy is a pure function of (market, holdings, cash, rng) returning a list of
+orders, so it can run in a worker process. Nothing here touches Flask or the database.
+"""
+import random
+import time
+from collections import namedtuple
+
+Order = namedtuple('Order', ['stock_id', 'quantity'])  # positive quantity buys, negative sells
+Holding = namedtuple('Holding', ['quantity', 'purchase_price'])
+MarketSnapshot = namedtuple('MarketSnapshot', ['year', 'stock_ids', 'prices', 'previous_prices', 'names'])
+
+AI_STRATEGIES = {}
+
+
+def ai_strategy(name):
+    """
+    Register a strategy function under a name bots can be configured with.
+    """
+    def register(func):
+        AI_STRATEGIES[name] = func
+        return func
+    return register
+
+
+# AI Basic Buyer
+@ai_strategy('basic_buyer')
+def ai_basic_buyer(market, holdings, cash, rng):
+    """
+    Sell anything down more than 3 or above 65, then buy 3 of every available stock not owned.
+    """
+    orders = []
+    for stock_id, holding in holdings.items():
+        price = market.prices.get(stock_id)
+        if price is not None and (price < holding.purchase_price - 3 or price > 65):
+            orders.append(Order(stock_id, -holding.quantity))
+            cash += price * holding.quantity
+
+    for stock_id in market.stock_ids:
+        price = market.prices[stock_id]
+        if 8 <= price <= 65 and stock_id not in holdings:
+            total_cost = price * 3
+            if cash >= total_cost:
+                cash -= total_cost
+                orders.append(Order(stock_id, 3))
+    return orders
+
+
+# AI Top Movers
+@ai_strategy('top_movers')
+def ai_top_movers(market, holdings, cash, rng):
+    """
+    Buy 5 of each of the five biggest risers and sell out of the five biggest fallers.
+    """
+    stock_changes = []
+    for stock_id in market.stock_ids:
+        price = market.prices[stock_id]
+        previous_price = market.previous_prices.get(stock_id) or price
+        stock_changes.append((stock_id, price - previous_price))
+
+    stock_changes_sorted = sorted(stock_changes, key=lambda x: x[1], reverse=True)
+    top_movers = stock_changes_sorted[:5]
+    biggest_losers = stock_changes_sorted[-5:]
+
+    orders = []
+    for stock_id, _ in biggest_losers:
+        if stock_id in holdings:
+            orders.append(Order(stock_id, -holdings[stock_id].quantity))
+            cash += market.prices[stock_id] * holdings[stock_id].quantity
+
+    for stock_id, _ in top_movers:
+        price = market.prices[stock_id]
+        if price >= 8 and stock_id not in holdings:
+            total_cost = price * 5
+            if cash >= total_cost:
+                cash -= total_cost
+                orders.append(Order(stock_id, 5))
+    return orders
+
+
+# AI Random Trader
+@ai_strategy('random_trader')
+def ai_random_trader(market, holdings, cash, rng):
+    """
+    Ten random actions: buy 1-5 of a random stock not owned, or sell out of a random holding.
+    """
+    owned = {stock_id: holding.quantity for stock_id, holding in holdings.items()}
+    orders = []
+
+    for _ in range(10):  # Perform 10 random actions
+        action = rng.choice(["buy", "sell"])
+
+        if action == "buy":
+            stock_id = rng.choice(market.stock_ids)
+            price = market.prices[stock_id]
+            if price >= 8 and stock_id not in owned:
+                quantity = rng.randint(1, 5)
+                total_cost = price * quantity
+                if cash >= total_cost:
+                    cash -= total_cost
+                    owned[stock_id] = quantity
+                    orders.append(Order(stock_id, quantity))
+
+        elif action == "sell" and owned:
+            stock_id = rng.choice(list(owned))
+            price = market.prices.get(stock_id)
+            if price is not None:
+                cash += price * owned[stock_id]
+                orders.append(Order(stock_id, -owned.pop(stock_id)))
+
+    return orders
+
+
+# AI Value Investor
+@ai_strategy('value_investor')
+def ai_value_investor(market, holdings, cash, rng):
+    """
+    Buy 5 each of up to five random stocks priced 8-15, sell anything above 60.
+    """
+    orders = []
+    for stock_id, holding in holdings.items():
+        price = market.prices.get(stock_id)
+        if price is not None and price > 60:
+            orders.append(Order(stock_id, -holding.quantity))
+            cash += price * holding.quantity
+
+    affordable_stocks = [stock_id for stock_id in market.stock_ids if 8 <= market.prices[stock_id] < 15]
+    rng.shuffle(affordable_stocks)  # Randomize the affordable stocks
+    for stock_id in affordable_stocks[:5]:  # Limit to top 5 affordable stocks
+        if stock_id not in holdings:
+            total_cost = market.prices[stock_id] * 5
+            if cash >= total_cost:
+                cash -= total_cost
+                orders.append(Order(stock_id, 5))
+    return orders
+
+
+# AI Fully Random
+@ai_strategy('fully_random')
+def ai_fully_random(market, holdings, cash, rng):
+    return ai_random_trader(market, holdings, cash, rng)
+
+
+def bot_rng(seed, year, player_id):
+    """
+    Random generator for one bot's decisions in one year. String seeds hash the same
+    in every process, so results do not depend on which worker runs the bot.
+    """
+    return random.Random(f"{seed}:{year}:{player_id}")
+
+
+def decide_orders(market, jobs, seed=''):
+    """
+    Run each (player_id, strategy_name, holdings, cash) job against the market and
+    return [(player_id, strategy_name, orders, seconds, error)]. A strategy that raises
+    places no orders, and error describes the exception for the caller to log, as
+    output from a worker process goes nowhere.
+    """
+    results = []
+    for player_id, strategy_name, holdings, cash in jobs:
+        start = time.perf_counter()
+        error = None
+        try:
+            orders = AI_STRATEGIES[strategy_name](market, holdings, cash, bot_rng(seed, market.year, player_id))
+        except Exception as e:
+            orders, error = [], f"{type(e).__name__}: {e}"
+        results.append((player_id, strategy_name, orders, time.perf_counter() - start, error))
+    return results
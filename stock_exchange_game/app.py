@@ -1,27 +1,50 @@
-from flask import Flask, request, jsonify, render_template, redirect, url_for, session, send_from_directory, current_app, send_file, flash, get_flashed_messages
+from flask import Flask, Response, request, jsonify, render_template, redirect, url_for, session, send_from_directory, current_app, send_file, flash, get_flashed_messages, g
 from flask_sqlalchemy import SQLAlchemy
 from flask_session import Session
-from sqlalchemy import create_engine, text, inspect, delete
+from flask_migrate import Migrate, upgrade
+from sqlalchemy import create_engine, text, inspect, delete, insert, select, update, bindparam, event, MetaData
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.orm import scoped_session, sessionmaker
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
-from apscheduler.schedulers import SchedulerAlreadyRunningError
-from apscheduler.schedulers.base import SchedulerNotRunningError
 from datetime import datetime, timedelta, timezone
 from flask_cors import CORS
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.exceptions import BadRequest
 from bcrypt import gensalt, hashpw
 from dotenv import load_dotenv
-from apscheduler.jobstores.base import JobLookupError
 from redis import StrictRedis
+from cachelib import SimpleCache
 import redis
+import numpy as np
 import os
+import re
+import json
+import math
+import socket
+import queue
 import random
+import threading
+import time
+import atexit
+import multiprocessing
+import cProfile
+import pstats
+import io
+import gzip
+import hashlib
+import itertools
 import bcrypt
 import jwt
 import logging
-from functools import wraps
+from functools import wraps, lru_cache
+from collections import Counter, defaultdict, deque, namedtuple
+from contextlib import contextmanager
+from bisect import bisect_left, bisect_right, insort
+from types import MappingProxyType
+from concurrent.futures import ProcessPoolExecutor
+
+from ai_strategies import AI_STRATEGIES, decide_orders, Holding, MarketSnapshot, Order
 
 import secrets
 
@@ -52,8 +75,18 @@ if db_path.startswith("postgres://"):
 app.config['SQLALCHEMY_DATABASE_URI'] = db_path
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SESSION_TYPE'] = 'sqlalchemy'
+
+# Sessions only carry the admin login. SESSION_BACKEND picks where they are kept:
+#   cookie     - in the signed session cookie, no server storage (default)
+#   memory     - an in-process store with a TTL, for a single worker
+#   redis      - Redis at REDIS_URL, which expires them itself
+#   sqlalchemy - the sessions table in the game database
+# Sessions are only written when they change, and the memory and sqlalchemy stores are
+# swept of expired sessions every SESSION_SWEEP_SECONDS.
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'cookie')
+SESSION_SWEEP_SECONDS = float(os.getenv('SESSION_SWEEP_SECONDS', 600))
 app.config['SESSION_PERMANENT'] = False
+app.config['SESSION_REFRESH_EACH_REQUEST'] = False
 app.config['SESSION_USE_SIGNER'] = True
 app.config['SESSION_COOKIE_NAME'] = 'session'
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
@@ -63,28 +96,91 @@ app.config['SESSION_COOKIE_HTTPONLY'] = True  # Prevent JavaScript access to coo
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(minutes=240)  # or whatever is appropriate
 
 # Initialize the database
-db = SQLAlchemy()
+# Constraints get predictable names so migrations can drop them again, which SQLite
+# needs because it can only alter a table by copying it (render_as_batch).
+db = SQLAlchemy(metadata=MetaData(naming_convention={
+    'ix': 'ix_%(column_0_label)s',
+    'uq': 'uq_%(table_name)s_%(column_0_name)s',
+    'ck': 'ck_%(table_name)s_%(constraint_name)s',
+    'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s',
+    'pk': 'pk_%(table_name)s'
+}))
 db.init_app(app)
+MIGRATIONS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+migrate = Migrate(app, db, directory=MIGRATIONS_DIRECTORY, render_as_batch=True)
 
 
-# Set the SQLAlchemy instance to store session data
-app.config['SESSION_SQLALCHEMY'] = db
 
-# Initialize the session with the FlaskSession object
-server_session=Session(app)
 
-# Initialize the scheduler
-scheduler = BackgroundScheduler()
-scheduler_running = False  # New flag to track if the scheduler is running
-scheduler_shutting_down = False  # Define and initialize the variable
-scheduler.add_jobstore('sqlalchemy', url=app.config['SQLALCHEMY_DATABASE_URI'])
+class SessionCache(SimpleCache):
+    """
+    SimpleCache that can be swept of expired entries on a schedule. It keeps the keys
+    it was given, so sweeping only needs SimpleCache's public methods.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.keys = set()
+        self.keys_lock = threading.RLock()  # held from has() to delete(), so a refreshed session is kept
+
+    def set(self, key, value, timeout=None):
+        with self.keys_lock:
+            self.keys.add(key)
+            return super().set(key, value, timeout)
+
+    def add(self, key, value, timeout=None):
+        with self.keys_lock:
+            added = super().add(key, value, timeout)
+            if added:
+                self.keys.add(key)
+            return added
+
+    def delete(self, key):
+        with self.keys_lock:
+            self.keys.discard(key)
+            return super().delete(key)
+
+    def clear(self):
+        with self.keys_lock:
+            self.keys.clear()
+            return super().clear()
+
+    def sweep(self):
+        removed = 0
+        for key in list(self.keys):
+            with self.keys_lock:
+                # Keys SimpleCache pruned itself are no longer there to delete
+                if not self.has(key) and self.delete(key):
+                    removed += 1
+        return removed
+
+
+if SESSION_BACKEND == 'memory':
+    app.config['SESSION_TYPE'] = 'cachelib'
+    app.config['SESSION_CACHELIB'] = SessionCache(
+        threshold=10_000, default_timeout=int(app.config['PERMANENT_SESSION_LIFETIME'].total_seconds())
+    )
+elif SESSION_BACKEND == 'redis':
+    app.config['SESSION_TYPE'] = 'redis'
+    app.config['SESSION_REDIS'] = StrictRedis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379'))
+elif SESSION_BACKEND == 'sqlalchemy':
+    app.config['SESSION_TYPE'] = 'sqlalchemy'
+    app.config['SESSION_SQLALCHEMY'] = db
+elif SESSION_BACKEND != 'cookie':
+    raise ValueError(f"Unknown SESSION_BACKEND {SESSION_BACKEND!r}")
+
+# Flask's own signed-cookie sessions need no extension
+server_session = Session(app) if SESSION_BACKEND != 'cookie' else None
 
 # Global Flags for New Features
 supply_demand_enabled = True  # Toggle for supply-demand mechanics
 ai_players_enabled = True  # Toggle for AI players
 
 # AI Player Names and Strategies
-AI_PLAYER_NAMES = ["Bot 1", "Bot 2", "Bot 3", "Bot 4", "Bot 5"]
+# Bots are assigned strategies in turn; AI_BOT_COUNT adds more bots beyond the original five.
+AI_BOT_STRATEGIES = ["basic_buyer", "top_movers", "random_trader", "value_investor", "fully_random"]
+AI_BOT_COUNT = int(os.getenv('AI_BOT_COUNT', len(AI_BOT_STRATEGIES)))
+AI_BOTS = {f"Bot {i + 1}": AI_BOT_STRATEGIES[i % len(AI_BOT_STRATEGIES)] for i in range(AI_BOT_COUNT)}
+AI_PLAYER_NAMES = list(AI_BOTS)
 
 # Constants for Market Cap Scaling
 DEFAULT_MARKET_CAP = 1_000  # Default market capitalization value for all stocks
@@ -149,25 +245,42 @@ def set_csp_header(response):
     return response
 
 # Define models
+# A stock's name and category are held once in StockMaster; Stock holds one row per stock
+# per year. Everything that refers to a stock does so by StockMaster.stock_id.
+class StockMaster(db.Model):
+    stock_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(50), nullable=False)
+    category = db.Column(db.String(50), nullable=False)
+
+
 class Stock(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('stock_id', 'year', name='uq_stock_stock_id_year'),
+        db.Index('ix_stock_year', 'year'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)  
-    stock_id = db.Column(db.Integer, nullable=False)  
+    stock_id = db.Column(db.Integer, db.ForeignKey('stock_master.stock_id'), nullable=False)
     version = db.Column(db.Integer, nullable=False, default=0)
-    name = db.Column(db.String(50), nullable=False)
     year = db.Column(db.Integer, nullable=False)
     price = db.Column(db.Float, nullable=False)
-    category = db.Column(db.String(50), nullable=False)
     market_cap = db.Column(db.Float, nullable=False, default=1_000) 
     adjusted_price = db.Column(db.Float, nullable=True)  # New column for adjusted price
 
+    master = db.relationship('StockMaster', lazy='joined', innerjoin=True)
+    name = association_proxy('master', 'name')
+    category = association_proxy('master', 'category')
+
 
 class SupplyDemand(db.Model):
+    __table_args__ = (db.Index('ix_supply_demand_year_stock_id', 'year', 'stock_id'),)
+
     supply_demand_id = db.Column(db.Integer, primary_key=True)  # Unique ID for each record
-    stock_id = db.Column(db.Integer, db.ForeignKey('stock.stock_id'), nullable=False)  # Related stock
+    stock_id = db.Column(db.Integer, db.ForeignKey('stock_master.stock_id'), nullable=False)  # Related stock
     year = db.Column(db.Integer, nullable=False)  # Year for the modifier
     demand_modifier = db.Column(db.Float, nullable=False, default=1.0)  # Modifier for demand scaling
 
-    stock = db.relationship('Stock', backref=db.backref('supply_demand', lazy=True))
+    stock = db.relationship('StockMaster', backref=db.backref('supply_demand', lazy=True))
 
 class MarketDynamics(db.Model):
     event_id = db.Column(db.Integer, primary_key=True)  # Unique ID for each market event
@@ -182,6 +295,9 @@ class Game(db.Model):
     password = db.Column(db.String(50), nullable=False)
     current_year = db.Column(db.Integer, default=1900)
     game_running = db.Column(db.Boolean, default=False)
+    state_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Bumped by announce_game_state
+    trade_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Bumped when teams trade or join
+    ticks_paused = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())  # Set by /admin/ticks/pause
 
 class Player(db.Model):
     player_id = db.Column(db.Integer, primary_key=True)
@@ -189,17 +305,44 @@ class Player(db.Model):
     balance = db.Column(db.Float, nullable=False, default=1000.0)
     stocks_owned = db.Column(db.Integer, nullable=False, default=0)
     portfolio_value = db.Column(db.Float, nullable=False, default=0.0)
+    trade_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # game.trade_version that last re-valued the player
 
 class WatchList(db.Model):
+    __table_args__ = (db.Index('ix_watch_list_stock_id_value_alert', 'stock_id', 'value_alert'),)
+
     watchlist_id = db.Column(db.Integer, primary_key=True)
     player_id = db.Column(db.Integer, db.ForeignKey('player.player_id'), nullable=False)
-    stock_id = db.Column(db.Integer, db.ForeignKey('stock.stock_id'), nullable=False)
+    stock_id = db.Column(db.Integer, db.ForeignKey('stock_master.stock_id'), nullable=False)
     birth_alert = db.Column(db.Boolean, default=False)
     value_alert = db.Column(db.Float, nullable=True)
     value_alert_enabled = db.Column(db.Boolean, default=False)
 
     player = db.relationship('Player', backref=db.backref('watchlist', lazy=True))
-    stock = db.relationship('Stock', backref=db.backref('watchlist', lazy=True), uselist=True)
+    stock = db.relationship('StockMaster', backref=db.backref('watchlist', lazy=True))
+
+class PlayerAlert(db.Model):
+    __table_args__ = (
+        db.Index('ix_player_alert_player_id_alert_id', 'player_id', 'alert_id'),
+        {'sqlite_autoincrement': True}  # ids are the clients' ?since= cursors, never reuse them
+    )
+
+    alert_id = db.Column(db.Integer, primary_key=True)
+    player_id = db.Column(db.Integer, db.ForeignKey('player.player_id'), nullable=False)
+    stock_id = db.Column(db.Integer, db.ForeignKey('stock_master.stock_id'), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    alert_type = db.Column(db.String(5), nullable=False)  # 'birth' or 'value'
+    threshold = db.Column(db.Float, nullable=True)
+    message = db.Column(db.String(200), nullable=False)
+
+    def to_dict(self):
+        return {
+            'id': self.alert_id,
+            'year': self.year,
+            'stock_id': self.stock_id,
+            'type': self.alert_type,
+            'threshold': self.threshold,
+            'message': self.message
+        }
 
 class HighScore(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -207,22 +350,26 @@ class HighScore(db.Model):
     total_value = db.Column(db.Float, nullable=False)
 
 class Portfolio(db.Model):
+    __table_args__ = (db.Index('ix_portfolio_player_id_stock_id', 'player_id', 'stock_id'),)
+
     portfolio_id = db.Column(db.Integer, primary_key=True)
     player_id = db.Column(db.Integer, db.ForeignKey('player.player_id'), nullable=False)
-    stock_id = db.Column(db.Integer, db.ForeignKey('stock.stock_id'), nullable=False)
+    stock_id = db.Column(db.Integer, db.ForeignKey('stock_master.stock_id'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
     purchase_price = db.Column(db.Float, nullable=False)
     year_purchased = db.Column(db.Integer, nullable=False)  # New field
 
     player = db.relationship('Player', backref=db.backref('portfolio', lazy='joined'))
-    stock = db.relationship('Stock', backref=db.backref('portfolio', lazy='joined'), uselist=True)
+    stock = db.relationship('StockMaster', backref=db.backref('portfolio', lazy=True))
 
 
 class CompletedSale(db.Model):
+    __table_args__ = (db.Index('ix_completed_sale_sale_year_stock_id', 'sale_year', 'stock_id'),)
+
     sale_id = db.Column(db.Integer, primary_key=True)
     player_id = db.Column(db.Integer, db.ForeignKey('player.player_id'), nullable=False)
     stock_name = db.Column(db.String(50), nullable=False)
-    stock_id = db.Column(db.Integer, db.ForeignKey('stock.stock_id'), nullable=False)
+    stock_id = db.Column(db.Integer, db.ForeignKey('stock_master.stock_id'), nullable=False)
     price_purchased = db.Column(db.Float, nullable=False)
     quantity_sold = db.Column(db.Integer, nullable=False)
     price_sold = db.Column(db.Float, nullable=False)
@@ -232,8 +379,42 @@ class CompletedSale(db.Model):
 
     player = db.relationship('Player', backref=db.backref('completed_sales', lazy=True))
 
+class StandingOrder(db.Model):
+    order_id = db.Column(db.Integer, primary_key=True)
+    player_id = db.Column(db.Integer, db.ForeignKey('player.player_id'), nullable=False, index=True)
+    stock_id = db.Column(db.Integer, db.ForeignKey('stock_master.stock_id'), nullable=False)
+    side = db.Column(db.String(4), nullable=False)  # 'buy' or 'sell'
+    order_type = db.Column(db.String(5), nullable=False)  # 'limit' or 'stop'
+    trigger_price = db.Column(db.Float, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='pending', index=True)  # pending, filled, rejected, cancelled
+    placed_year = db.Column(db.Integer, nullable=False)
+    filled_year = db.Column(db.Integer, nullable=True)
+    fill_price = db.Column(db.Float, nullable=True)
+
+    def to_dict(self):
+        return {
+            'order_id': self.order_id,
+            'stock_id': self.stock_id,
+            'side': self.side,
+            'type': self.order_type,
+            'price': self.trigger_price,
+            'quantity': self.quantity,
+            'status': self.status,
+            'placed_year': self.placed_year,
+            'filled_year': self.filled_year,
+            'fill_price': self.fill_price
+        }
+
+class TickLease(db.Model):
+    name = db.Column(db.String(20), primary_key=True)
+    holder = db.Column(db.String(100), nullable=True)
+    expires_at = db.Column(db.Float, nullable=False, default=0)  # Unix time
+    term = db.Column(db.Integer, nullable=False, default=0)  # Incremented on every change of leader
+
 class HistoricalEvent(db.Model):
     __tablename__ = 'historical_events_feed'
+    __table_args__ = (db.Index('ix_historical_events_feed_year_stock_id', 'year', 'stock_id'),)
 
     id = db.Column(db.Integer, primary_key=True)
     stock_id = db.Column(db.Integer)
@@ -253,10 +434,6 @@ class HistoricalEvent(db.Model):
             'detail': self.detail
         }
 
-# Initialize Scheduler with job store
-jobstores = {'default': SQLAlchemyJobStore(url='sqlite:///jobs.sqlite')}
-scheduler = BackgroundScheduler(jobstores=jobstores)
-
 # Global variable to indicate if the game is running
 game_running = False
 
@@ -268,795 +445,2888 @@ time_intervals = {
 
 
 
-def start_year_updates():
-    global scheduler_running
-
-    # Handle scheduler shutdown or restart conditions
-    if scheduler_shutting_down:
-        print("Scheduler is shutting down, not scheduling new jobs.")
-        return
-
-    # Determine interval and next run time
-    interval = time_intervals.get(current_year, 60)  # Default to 60 seconds
-    next_run_time = datetime.now() + timedelta(seconds=interval)
-    print(f"Scheduling next year update. Next run at {next_run_time} with interval {interval} seconds.")
-
-    try:
-        # Start scheduler if not already running
-        if not scheduler_running:
-            try:
-                scheduler.start()
-                scheduler_running = True
-                print("Scheduler started successfully.")
-            except SchedulerAlreadyRunningError:
-                print("Scheduler already running.")
-            except Exception as e:
-                print(f"Error starting scheduler: {e}")
-                scheduler_running = False  # Mark scheduler as not running if failed
-
-        # Schedule or update the 'year_update_job'
-        if scheduler_running:
-            try:
-                scheduler.add_job(
-                    update_year,
-                    'interval',  # Repeatedly execute at defined intervals
-                    seconds=interval,
-                    id='year_update_job',
-                    replace_existing=True
-                )
-                print(f"Scheduled job 'year_update_job' with interval {interval} seconds.")
-            except Exception as e:
-                print(f"Error adding job to scheduler: {e}")
-        else:
-            print("Scheduler is not running, skipping job scheduling.")
-
-        # Log all scheduled jobs for debugging
-        check_scheduled_jobs()
+# Session sweeping
+session_sweep_stats = {'backend': SESSION_BACKEND, 'sweeps': 0, 'removed': 0, 'last_sweep': None}
+session_sweeper = None
 
-    except Exception as overall_error:
-        print(f"Unexpected error during start_year_updates: {overall_error}")
 
-def check_scheduled_jobs():
-    jobs = scheduler.get_jobs()
-    if not jobs:
-        print("No jobs are currently scheduled.")
+def sweep_expired_sessions():
+    """
+    Delete expired sessions from the memory or sqlalchemy store. Returns how many went.
+    """
+    if SESSION_BACKEND == 'memory':
+        removed = app.config['SESSION_CACHELIB'].sweep()
+    elif SESSION_BACKEND == 'sqlalchemy':
+        model = app.session_interface.sql_session_model
+        with app.app_context():
+            removed = db.session.query(model).filter(model.expiry <= datetime.utcnow()).delete(synchronize_session=False)
+            db.session.commit()
     else:
-        for job in jobs:
-            try:
-                print(f"Job '{job.id}' - next run: {getattr(job, 'next_run_time', 'Unknown')} (trigger: {job.trigger})")
-            except AttributeError as e:
-                print(f"Error accessing job details: {e}")
+        return 0
+    session_sweep_stats['sweeps'] += 1
+    session_sweep_stats['removed'] += removed
+    session_sweep_stats['last_sweep'] = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    return removed
 
 
+def run_session_sweeper():
+    while True:
+        time.sleep(SESSION_SWEEP_SECONDS)
+        try:
+            removed = sweep_expired_sessions()
+            if removed:
+                print(f"Swept {removed} expired sessions.")
+        except Exception as e:
+            app.logger.error(f"Session sweep failed: {e}")
 
-def get_adjusted_stock_price(stock, year):
-    try:
-        base_price = stock.price
-        if base_price < 8:
-            return base_price
-
-        # Check if the stock is owned by any player
-        stock_ownership_count = (
-            db.session.query(db.func.sum(Portfolio.quantity))
-            .filter(Portfolio.stock_id == stock.stock_id)
-            .scalar() or 0
-)
-
-        # Market cap and sales logic
-        market_cap = stock.market_cap or 1000
-        total_sold = (
-            db.session.query(db.func.sum(CompletedSale.quantity_sold))
-            .filter(CompletedSale.stock_id == stock.stock_id, CompletedSale.sale_year == year)
-            .scalar() or 0
-        )
-        selling_ratio = total_sold / market_cap
-        selling_multiplier = max(1.0 - (selling_ratio * 0.1), 0.5)
-
-        # Demand modifier
-        supply_demand = db.session.query(SupplyDemand).filter_by(stock_id=stock.stock_id, year=year).first()
-        demand_modifier = supply_demand.demand_modifier if supply_demand else 1.0
-
-        # Price change factor
-        market_dynamics = db.session.query(MarketDynamics).filter_by(year=year).all()
-        price_change_factor = 1.0
-        for event in market_dynamics:
-            if event.sector is None or event.sector.lower() == stock.category.lower():
-                price_change_factor *= event.price_change_factor
-
-        adjusted_price = base_price * selling_multiplier * demand_modifier * price_change_factor
-        lower_bound, upper_bound = max(base_price - 10, 0), base_price + 10
-        adjusted_price = max(min(adjusted_price, upper_bound), lower_bound)
-
-        # Update adjusted price in the database
-        stock.adjusted_price = adjusted_price
-        db.session.commit()
-
-        return adjusted_price
-
-    except Exception as e:
-        print(f"Error adjusting stock {stock.stock_id}: {e}")
-        return stock.price
 
+def start_session_sweeper():
+    global session_sweeper
+    if session_sweeper is None and SESSION_BACKEND in ('memory', 'sqlalchemy'):
+        session_sweeper = threading.Thread(target=run_session_sweeper, name='session-sweeper', daemon=True)
+        session_sweeper.start()
 
 
-# AI Basic Buyer
-def ai_basic_buyer(player, current_year):
-    try:
-        stocks = db.session.query(Stock).filter(Stock.year == current_year).all()
-        print(f"[DEBUG] Found {len(stocks)} stocks for year {current_year}.")
-        owned_stocks = {item.stock_id: item for item in player.portfolio}
-        print(f"[DEBUG] Player {player.name} owns stocks: {list(owned_stocks.keys())}")
+# Tick scheduler
+# Runs update_year on its own thread, holding each year for its time_intervals entry.
+# Every deadline is the previous deadline plus the new year's interval, so the time
+# update_year takes is absorbed instead of added and the game does not drift. A tick
+# that finishes after the next deadline counts as an overrun, and the one after it is
+# scheduled from when it finished rather than fired straight away.
+TICK_HISTORY_SIZE = 100
 
-        # Buy logic
-        for stock in stocks:
-            adjusted_price = get_active_price(stock)
-            if adjusted_price >= 8 and stock.stock_id not in owned_stocks:
-                quantity = 3
-                total_cost = adjusted_price * quantity
-                if player.balance >= total_cost:
-                    player.balance -= total_cost
-                    portfolio_item = db.session.query(Portfolio).filter_by(
-                        stock_id=stock.stock_id, player_id=player.player_id
-                    ).first()
-
-                    if portfolio_item:
-                        portfolio_item.quantity += quantity
-                    else:
-                        portfolio_item = Portfolio(
-                            player_id=player.player_id,
-                            stock_id=stock.stock_id,
-                            quantity=quantity,
-                            purchase_price=adjusted_price,
-                            year_purchased=current_year
-                        )
-                        db.session.add(portfolio_item)
-
-                    owned_stocks[stock.stock_id] = portfolio_item
-
-        # Sell logic
-        for stock_id, portfolio_item in list(owned_stocks.items()):
-            stock = db.session.query(Stock).filter_by(stock_id=stock_id, year=current_year).first()
-            if stock:
-                adjusted_price = get_active_price(stock)
-                if adjusted_price < portfolio_item.purchase_price - 3 or adjusted_price > 65:
-                    total_revenue = adjusted_price * portfolio_item.quantity
-                    profit = total_revenue - (portfolio_item.purchase_price * portfolio_item.quantity)
-                    percentage_return = (profit / (portfolio_item.purchase_price * portfolio_item.quantity)) * 100 if portfolio_item.purchase_price > 0 else 0
-                    player.balance += total_revenue
-
-                    # Record sale
-                    completed_sale = CompletedSale(
-                        player_id=player.player_id,
-                        stock_name=stock.name,
-                        stock_id=stock_id,
-                        price_purchased=portfolio_item.purchase_price,
-                        quantity_sold=portfolio_item.quantity,
-                        price_sold=adjusted_price,
-                        profit=profit,
-                        percentage_return=percentage_return,
-                        sale_year=current_year
-                    )
-                    db.session.add(completed_sale)
-                    db.session.delete(portfolio_item)
 
-    except Exception as e:
-        print(f"[ERROR] Exception occurred in ai_basic_buyer: {e}")
-        db.session.rollback()
+class TickScheduler:
+    """
+    Calls tick() once per year. interval_for(year) gives how long a year lasts and
+    finished() says when to stop. Deadlines use time.monotonic().
+    """
+    def __init__(self, tick, interval_for, finished):
+        self.tick = tick
+        self.interval_for = interval_for
+        self.finished = finished
+        self.condition = threading.Condition()
+        self.thread = None
+        self.running = False
+        self.paused = False
+        self.deadline = None
+        self.remaining = None
+        self.fast_forward_ticks = 0
+        self.ticks = 0
+        self.overruns = 0
+        self.latencies = deque(maxlen=TICK_HISTORY_SIZE)  # seconds each tick took
+        self.jitters = deque(maxlen=TICK_HISTORY_SIZE)    # seconds each tick started after its deadline
+
+    def start(self, year):
+        with self.condition:
+            if self.running:
+                return False
+            self.running = True
+            self.paused = False
+            self.deadline = time.monotonic() + self.interval_for(year)
+            self.thread = threading.Thread(target=self.run, name='tick-scheduler', daemon=True)
+            self.thread.start()
+            return True
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.paused = False
+            self.fast_forward_ticks = 0
+            self.condition.notify_all()
+            thread = self.thread
+        if thread and thread is not threading.current_thread():
+            thread.join(timeout=5)
+
+    def pause(self):
+        with self.condition:
+            if self.running and not self.paused:
+                self.paused = True
+                self.remaining = max(0.0, self.deadline - time.monotonic())
+                self.condition.notify_all()
+
+    def resume(self):
+        with self.condition:
+            if self.running and self.paused:
+                self.paused = False
+                self.deadline = time.monotonic() + self.remaining
+                self.condition.notify_all()
+
+    def fast_forward(self, years=1):
+        """
+        Run the next years ticks now, then carry on from the new year's full interval.
+        """
+        with self.condition:
+            if self.running:
+                self.fast_forward_ticks += years
+                self.condition.notify_all()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and not self.fast_forward_ticks and (self.paused or time.monotonic() < self.deadline):
+                    self.condition.wait(None if self.paused else self.deadline - time.monotonic())
+                if not self.running:
+                    return
+                fast_forward = self.fast_forward_ticks > 0
+                if fast_forward:
+                    self.fast_forward_ticks -= 1
+                scheduled = self.deadline
+
+            started = time.monotonic()
+            try:
+                year = self.tick()
+            except Exception as e:
+                app.logger.error(f"Tick failed: {e}")
+                year = None
+            finished = time.monotonic()
+
+            with self.condition:
+                self.ticks += 1
+                self.latencies.append(finished - started)
+                if not fast_forward:
+                    self.jitters.append(started - scheduled)
+                if year is None or self.finished(year):
+                    self.running = False
+                    return
+                interval = self.interval_for(year)
+                if fast_forward or self.paused:
+                    self.deadline = finished + interval
+                    self.remaining = interval
+                else:
+                    self.deadline = scheduled + interval
+                    if self.deadline < finished:
+                        self.overruns += 1
+                        self.deadline = finished
+
+    def stats(self):
+        with self.condition:
+            latencies, jitters = list(self.latencies), list(self.jitters)
+            if self.paused:
+                next_tick = self.remaining
+            elif self.running:
+                next_tick = max(0.0, self.deadline - time.monotonic())
+            else:
+                next_tick = None
+            return {
+                'running': self.running,
+                'paused': self.paused,
+                'seconds_to_next_tick': round(next_tick, 3) if next_tick is not None else None,
+                'ticks': self.ticks,
+                'overruns': self.overruns,
+                'latency_ms': {
+                    'last': round(latencies[-1] * 1000, 2) if latencies else None,
+                    'mean': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+                    'max': round(max(latencies) * 1000, 2) if latencies else None,
+                },
+                'jitter_ms': {
+                    'mean': round(sum(jitters) / len(jitters) * 1000, 2) if jitters else None,
+                    'max': round(max(jitters) * 1000, 2) if jitters else None,
+                }
+            }
+
+
+def run_scheduled_tick():
+    """
+    Run one tick and return the year the game is now in, or None if this process has
+    lost the tick lease. A failed tick is retried after the year's interval.
+    """
+    if not tick_leader.renew():
+        app.logger.debug("Tick lease lost, stopping the tick scheduler.")
+        return None
+    update_year()
+    return current_year
 
 
-# AI Top Movers
-def ai_top_movers(player, current_year):
-    try:
-        stocks = db.session.query(Stock).filter(Stock.year == current_year).all()
-        owned_stocks = {item.stock_id: item for item in player.portfolio}
-        stock_changes = []
+tick_scheduler = TickScheduler(
+    tick=run_scheduled_tick,
+    interval_for=lambda year: time_intervals.get(year, 60),  # Default to 60 seconds
+    finished=lambda year: year >= 2024
+)
 
-        # Calculate price changes
-        for stock in stocks:
-            adjusted_price = get_active_price(stock)
-            previous_price = db.session.query(Stock.price).filter_by(
-                stock_id=stock.stock_id, year=current_year - 1
-            ).scalar() or adjusted_price
-            stock_changes.append((stock, adjusted_price - previous_price))
 
-        stock_changes_sorted = sorted(stock_changes, key=lambda x: x[1], reverse=True)
-        top_movers = stock_changes_sorted[:5]
-        biggest_losers = stock_changes_sorted[-5:]
+# Tick leader
+# Under gunicorn every worker imports the app, but only one of them may run ticks. The
+# workers compete for a lease row in tick_lease: a conditional UPDATE takes it over when
+# it has expired and the holder renews it every third of the lease. Whichever worker
+# holds it runs tick_scheduler while game.game_running is set, and keeps it paused while
+# game.ticks_paused is set, so /start_game, /stop_game and pausing work from any worker. If the leader dies another worker takes over once the
+# lease expires, at most TICK_LEASE_SECONDS later, and a clean shutdown releases it at
+# once. Each tick renews the lease first, and update_year only advances the year it
+# started from, so a stale leader cannot advance the game a second time.
+TICK_LEASE_NAME = 'ticks'
+TICK_LEASE_SECONDS = float(os.getenv('TICK_LEASE_SECONDS', 15))
+TICK_LEADER_ELECTION = os.getenv('TICK_LEADER_ELECTION', 'True') == 'True'
 
-        # Buy top movers
-        for stock, _ in top_movers:
-            adjusted_price = get_active_price(stock)
-            if adjusted_price >= 8 and stock.stock_id not in owned_stocks:
-                quantity = 5
-                total_cost = adjusted_price * quantity
-                if player.balance >= total_cost:
-                    player.balance -= total_cost
-                    portfolio_item = db.session.query(Portfolio).filter_by(
-                        stock_id=stock.stock_id, player_id=player.player_id
-                    ).first()
-
-                    if portfolio_item:
-                        portfolio_item.quantity += quantity
-                    else:
-                        portfolio_item = Portfolio(
-                            player_id=player.player_id,
-                            stock_id=stock.stock_id,
-                            quantity=quantity,
-                            purchase_price=adjusted_price,
-                            year_purchased=current_year
-                        )
-                        db.session.add(portfolio_item)
-
-                    owned_stocks[stock.stock_id] = portfolio_item
-
-        # Sell biggest losers
-        portfolio_item = db.session.query(Portfolio).filter_by(
-    stock_id=stock.stock_id, player_id=player.player_id).first()
-
-        if portfolio_item:
-                adjusted_price = get_active_price(stock)
-                total_revenue = adjusted_price * portfolio_item.quantity
-                profit = total_revenue - (portfolio_item.purchase_price * portfolio_item.quantity)
-                percentage_return = (profit / (portfolio_item.purchase_price * portfolio_item.quantity)) * 100 if portfolio_item.purchase_price > 0 else 0
-                player.balance += total_revenue
 
-                # Record sale
-                completed_sale = CompletedSale(
-                    player_id=player.player_id,
-                    stock_name=stock.name,
-                    stock_id=stock.stock_id,
-                    price_purchased=portfolio_item.purchase_price,
-                    quantity_sold=portfolio_item.quantity,
-                    price_sold=adjusted_price,
-                    profit=profit,
-                    percentage_return=percentage_return,
-                    sale_year=current_year
+class TickLeader:
+    """
+    Holds or competes for the tick lease and starts or stops tick_scheduler to match.
+    With election disabled this process always leads, as a single worker did before.
+    """
+    def __init__(self, scheduler, lease_seconds, enabled=True):
+        self.scheduler = scheduler
+        self.lease_seconds = lease_seconds
+        self.enabled = enabled
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"
+        self.leader = False
+        self.term = None
+        self.acquired = 0
+        self.lost = 0
+        self.wake_event = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        with self.lock:
+            if self.thread is None and self.enabled:
+                self.thread = threading.Thread(target=self.run, name='tick-leader', daemon=True)
+                self.thread.start()
+                atexit.register(self.release)
+
+    def wake(self):
+        """
+        Check the lease and the game state now rather than at the next renewal.
+        """
+        self.wake_event.set()
+
+    def renew(self):
+        """
+        Take or extend the lease. Returns whether this process holds it.
+        """
+        if not self.enabled:
+            return True
+        now = time.time()
+        with app.app_context():
+            try:
+                result = db.session.execute(
+                    update(TickLease)
+                    .where(TickLease.name == TICK_LEASE_NAME)
+                    .where((TickLease.holder == self.worker_id) | (TickLease.expires_at < now))
+                    .values(holder=self.worker_id, expires_at=now + self.lease_seconds,
+                            term=db.case((TickLease.holder == self.worker_id, TickLease.term),
+                                         else_=TickLease.term + 1))
                 )
-                db.session.add(completed_sale)
-                db.session.delete(portfolio_item)
-                print(f"[DEBUG] Deleted portfolio item for stock {stock.name} (ID: {stock.stock_id}).")
-        else:
-                print(f"[DEBUG] Deleted portfolio item for stock {stock.name} (ID: {stock.stock_id}).")
-    except Exception as e:
-        print(f"[ERROR] Exception occurred in ai_top_movers: {e}")
-        db.session.rollback()
-
+                if result.rowcount == 0 and not db.session.get(TickLease, TICK_LEASE_NAME):
+                    db.session.add(TickLease(name=TICK_LEASE_NAME, holder=self.worker_id,
+                                             expires_at=now + self.lease_seconds, term=1))
+                    db.session.flush()
+                    acquired = True
+                else:
+                    acquired = result.rowcount == 1
+                term = db.session.query(TickLease.term).filter_by(name=TICK_LEASE_NAME).scalar() if acquired else None
+                db.session.commit()
+            except IntegrityError:
+                # Another worker created the row first
+                db.session.rollback()
+                acquired, term = False, None
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"Tick lease renewal failed: {e}")
+                acquired, term = False, None
+
+        if acquired and not self.leader:
+            self.acquired += 1
+            app.logger.debug(f"Worker {self.worker_id} is now the tick leader (term {term}).")
+        elif self.leader and not acquired:
+            self.lost += 1
+            app.logger.debug(f"Worker {self.worker_id} is no longer the tick leader.")
+        self.leader, self.term = acquired, term
+        return acquired
+
+    def release(self):
+        if not self.enabled or not self.leader:
+            return
+        self.scheduler.stop()
+        with app.app_context():
+            try:
+                db.session.execute(
+                    update(TickLease)
+                    .where(TickLease.name == TICK_LEASE_NAME, TickLease.holder == self.worker_id)
+                    .values(expires_at=0)
+                )
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"Tick lease release failed: {e}")
+        self.leader = False
+
+    def sync(self):
+        """
+        Renew the lease, then run the scheduler if this process leads a running game,
+        paused or not as the game says.
+        """
+        leader = self.renew()
+        with app.app_context():
+            game = db.session.query(Game.current_year, Game.game_running, Game.ticks_paused).first()
+        running = bool(game and game.game_running and game.current_year < 2024)
+        if leader and running and not self.scheduler.running:
+            interval = time_intervals.get(game.current_year, 60)
+            if self.scheduler.start(game.current_year):
+                print(f"Tick scheduler started. Year {game.current_year} lasts {interval} seconds.")
+        elif (not leader or not running) and self.scheduler.running:
+            self.scheduler.stop()
+            print("Tick scheduler stopped.")
+        if leader and running:
+            if game.ticks_paused:
+                self.scheduler.pause()
+            else:
+                self.scheduler.resume()
 
-def ai_random_trader(player, current_year):
-    try:
-        # Fetch all stocks for the current year
-        stocks = db.session.query(Stock).filter(Stock.year == current_year).all()
+    def run(self):
+        while True:
+            try:
+                self.sync()
+            except Exception as e:
+                app.logger.error(f"Tick leader check failed: {e}")
+            self.wake_event.wait(self.lease_seconds / 3)
+            self.wake_event.clear()
+
+    def stats(self):
+        lease = None
+        if self.enabled:
+            with app.app_context():
+                row = db.session.get(TickLease, TICK_LEASE_NAME)
+                if row:
+                    lease = {'holder': row.holder, 'term': row.term,
+                             'expires_in': round(row.expires_at - time.time(), 3)}
+        return {
+            'enabled': self.enabled,
+            'worker_id': self.worker_id,
+            'leader': self.leader,
+            'term': self.term,
+            'acquired': self.acquired,
+            'lost': self.lost,
+            'lease_seconds': self.lease_seconds,
+            'lease': lease
+        }
 
-        # Map owned stocks for the player
-        owned_stocks = {item.stock_id: item for item in player.portfolio}
 
-        # List of actions
-        actions = ["buy", "sell"]
+tick_leader = TickLeader(tick_scheduler, TICK_LEASE_SECONDS, TICK_LEADER_ELECTION)
 
-        for _ in range(10):  # Perform 10 random actions
-            action = random.choice(actions)
 
-            if action == "buy":
-                stock = random.choice(stocks)
-                adjusted_price = get_active_price(stock)
+def start_year_updates():
+    """
+    Start ticking from the current year. With leader election the game only starts in
+    whichever worker holds the tick lease, possibly another one.
+    """
+    if tick_leader.enabled:
+        tick_leader.start()
+        tick_leader.wake()
+        return
+    interval = time_intervals.get(current_year, 60)
+    if tick_scheduler.start(current_year):
+        print(f"Tick scheduler started. Year {current_year} lasts {interval} seconds.")
+    else:
+        print("Tick scheduler already running.")
 
-                if adjusted_price >= 8 and stock.stock_id not in owned_stocks:
-                    quantity = random.randint(1, 5)
-                    total_cost = adjusted_price * quantity
-                    if player.balance >= total_cost:
-                        player.balance -= total_cost
-
-                        # Check if portfolio item already exists
-                        portfolio_item = db.session.query(Portfolio).filter_by(
-                            stock_id=stock.stock_id, player_id=player.player_id
-                        ).first()
-
-                        if portfolio_item:
-                            portfolio_item.quantity += quantity
-                            print(f"[DEBUG] Updated portfolio for stock {stock.name} (ID: {stock.stock_id}): New quantity {portfolio_item.quantity}.")
-                        else:
-                            # Create a new portfolio item
-                            portfolio_item = Portfolio(
-                                player_id=player.player_id,
-                                stock_id=stock.stock_id,
-                                quantity=quantity,
-                                purchase_price=adjusted_price,
-                                year_purchased=current_year
-                            )
-                            db.session.add(portfolio_item)
-                            print(f"[DEBUG] Created new portfolio item for stock {stock.name} (ID: {stock.stock_id}): Quantity {quantity}, Price {adjusted_price}.")
-
-                        owned_stocks[stock.stock_id] = portfolio_item  # Update owned_stocks
-
-            elif action == "sell" and owned_stocks:
-                portfolio_item = random.choice(list(owned_stocks.values()))
-                stock = db.session.query(Stock).filter_by(stock_id=portfolio_item.stock_id, year=current_year).first()
-
-                if stock:
-                    adjusted_price = get_active_price(stock)
-                    total_revenue = adjusted_price * portfolio_item.quantity
-                    profit = total_revenue - (portfolio_item.purchase_price * portfolio_item.quantity)
-                    percentage_return = (
-                        (profit / (portfolio_item.purchase_price * portfolio_item.quantity)) * 100
-                        if portfolio_item.purchase_price > 0 else 0
-                    )
-                    player.balance += total_revenue
-
-                    # Record sale
-                    completed_sale = CompletedSale(
-                        player_id=player.player_id,
-                        stock_name=stock.name,
-                        stock_id=stock.stock_id,
-                        price_purchased=portfolio_item.purchase_price,
-                        quantity_sold=portfolio_item.quantity,
-                        price_sold=adjusted_price,
-                        profit=profit,
-                        percentage_return=percentage_return,
-                        sale_year=current_year
-                    )
-                    db.session.add(completed_sale)
-                    db.session.delete(portfolio_item)
-                    owned_stocks.pop(portfolio_item.stock_id)  # Remove from owned_stocks
-                    print(f"[DEBUG] Sold stock {stock.name} (ID: {stock.stock_id}) for Player {player.name}. Total revenue: {total_revenue}.")
 
-    except Exception as e:
-        print(f"[ERROR] Exception occurred in ai_random_trader: {e}")
-        db.session.rollback()
 
+# Game state
+# Request handlers read the module globals current_year and game_running, so they cost
+# nothing per request. Every worker keeps them in step with the game row: whoever changes
+# the game bumps game.state_version and announces it, and each worker's watcher applies
+# any newer version it sees. With REDIS_URL set, announcements go over Redis pub/sub and
+# arrive within milliseconds; without it, or if a message is missed, the watcher polls
+# the version every GAME_STATE_POLL_SECONDS. Applying a version also drops the caches
+# built for the old state, and after a tick republishes it to this worker's streams.
+GAME_STATE_CHANNEL = 'game_state'
+GAME_STATE_REDIS_URL = os.getenv('REDIS_URL')
+GAME_STATE_POLL_SECONDS = float(os.getenv('GAME_STATE_POLL_SECONDS', 1 if GAME_STATE_REDIS_URL else 0.1))
+GAME_STATE_SYNC = os.getenv('GAME_STATE_SYNC', 'True') == 'True'
 
 
+class RedisGameStateChannel:
+    """
+    Game state announcements over Redis pub/sub.
+    """
+    def __init__(self, url):
+        self.client = StrictRedis.from_url(url)
+        self.pubsub = None
 
-def ai_value_investor(player, current_year):
-    try:
-        # Fetch all stocks for the current year
-        stocks = db.session.query(Stock).filter(Stock.year == current_year).all()
-        owned_stocks = {item.stock_id: item for item in player.portfolio}
-
-        # Buy stocks under 15
-        affordable_stocks = [stock for stock in stocks if 8 <= get_active_price(stock) < 15]
-        random.shuffle(affordable_stocks)  # Randomize the affordable stocks
-        for stock in affordable_stocks[:5]:  # Limit to top 5 affordable stocks
-            adjusted_price = get_active_price(stock)
-            if stock.stock_id not in owned_stocks:
-                quantity = 5
-                total_cost = adjusted_price * quantity
-                if player.balance >= total_cost:
-                    player.balance -= total_cost
-
-                    # Check if portfolio item already exists
-                    portfolio_item = db.session.query(Portfolio).filter_by(
-                        stock_id=stock.stock_id, player_id=player.player_id
-                    ).first()
-
-                    if portfolio_item:
-                        portfolio_item.quantity += quantity
-                        print(f"[DEBUG] Updated portfolio for stock {stock.name} (ID: {stock.stock_id}): New quantity {portfolio_item.quantity}.")
-                    else:
-                        # Create a new portfolio item
-                        portfolio_item = Portfolio(
-                            player_id=player.player_id,
-                            stock_id=stock.stock_id,
-                            quantity=quantity,
-                            purchase_price=adjusted_price,
-                            year_purchased=current_year
-                        )
-                        db.session.add(portfolio_item)
-                        print(f"[DEBUG] Created new portfolio item for stock {stock.name} (ID: {stock.stock_id}): Quantity {quantity}, Price {adjusted_price}.")
-
-                    owned_stocks[stock.stock_id] = portfolio_item  # Update owned_stocks
-
-        # Sell stocks above 60
-        for stock_id, portfolio_item in list(owned_stocks.items()):  # Use list() to avoid modifying during iteration
-            stock = db.session.query(Stock).filter_by(stock_id=stock_id, year=current_year).first()
-            if stock:
-                adjusted_price = get_active_price(stock)
-                if adjusted_price > 60:
-                    total_revenue = adjusted_price * portfolio_item.quantity
-                    profit = total_revenue - (portfolio_item.purchase_price * portfolio_item.quantity)
-                    percentage_return = (
-                        (profit / (portfolio_item.purchase_price * portfolio_item.quantity)) * 100
-                        if portfolio_item.purchase_price > 0 else 0
-                    )
-                    player.balance += total_revenue
-
-                    # Record sale
-                    completed_sale = CompletedSale(
-                        player_id=player.player_id,
-                        stock_name=stock.name,
-                        stock_id=stock_id,
-                        price_purchased=portfolio_item.purchase_price,
-                        quantity_sold=portfolio_item.quantity,
-                        price_sold=adjusted_price,
-                        profit=profit,
-                        percentage_return=percentage_return,
-                        sale_year=current_year
-                    )
-                    db.session.add(completed_sale)
-                    db.session.delete(portfolio_item)  # Remove the portfolio item
-                    owned_stocks.pop(stock_id)  # Remove from owned_stocks
-                    print(f"[DEBUG] Sold stock {stock.name} (ID: {stock_id}) for Player {player.name}. Total revenue: {total_revenue}.")
-                else:
-                    print(f"[DEBUG] Stock {stock.name} (ID: {stock_id}) not sold. Price {adjusted_price} ≤ 60.")
+    def publish(self, message):
+        self.client.publish(GAME_STATE_CHANNEL, json.dumps(message))
 
-    except Exception as e:
-        print(f"[ERROR] Exception occurred in ai_value_investor: {e}")
-        db.session.rollback()
+    def listen(self, timeout):
+        """
+        Wait up to timeout seconds for an announcement. Returns it, or None.
+        """
+        if self.pubsub is None:
+            self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            self.pubsub.subscribe(GAME_STATE_CHANNEL)
+        message = self.pubsub.get_message(timeout=timeout)
+        return json.loads(message['data']) if message else None
 
 
+class GameState:
+    """
+    This worker's copy of game.current_year, game.game_running, game.state_version and
+    game.trade_version.
+    """
+    def __init__(self, channel, poll_seconds, enabled=True):
+        self.channel = channel
+        self.poll_seconds = poll_seconds
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.version = None
+        self.read_version = None  # the version this worker's caches reflect, for read ETags
+        self.trade_version = None
+        self.thread = None
+        self.applied = 0
+        self.last_lag = None
+        self.max_lag = None
+
+    def start(self):
+        """
+        Load the game state, then follow it on a background thread.
+        """
+        with self.lock:
+            if self.thread is not None or not self.enabled:
+                return
+            self.thread = threading.Thread(target=self.run, name='game-state', daemon=True)
+        self.poll()
+        self.thread.start()
+
+    def announce(self, version, year, running, trade_version=None):
+        """
+        Record a version this worker committed itself and tell the others.
+        """
+        with self.lock:
+            if self.version is None or version > self.version:
+                self.version = version
+                self.read_version = version
+                self.trade_version = trade_version
+        if self.channel:
+            try:
+                self.channel.publish({'version': version, 'current_year': year, 'game_running': running,
+                                      'trade_version': trade_version, 'published_at': time.time()})
+            except redis.RedisError as e:
+                app.logger.error(f"Game state announcement failed: {e}")
+
+    def apply(self, version, year, running, published_at=None, trade_version=None):
+        """
+        Adopt a newer game state and drop the caches built for the old one.
+        """
+        global current_year, game_running
+
+        with self.lock:
+            if self.version is not None and version <= self.version:
+                return False
+            first = self.version is None
+            traded = trade_version is not None and trade_version != self.trade_version
+            previous_trade_version = self.trade_version
+            self.version = version
+            if trade_version is not None:
+                self.trade_version = trade_version
+            ticked = running and game_running and year == current_year + 1
+            same_year = (year, running) == (current_year, game_running)
+            current_year, game_running = year, running
+        self.applied += 1
+        if published_at is not None:
+            self.last_lag = time.time() - published_at
+            self.max_lag = max(self.max_lag or 0, self.last_lag)
+        if first:
+            self.read_version = version
+            return True
+
+        if same_year and traded:
+            # Another worker filled a trade or added a team: the year's adjusted prices moved,
+            # and so did the net worths of the players the trades stamped since the last one seen
+            price_matrix.mark_stale([year])
+            invalidate_price_snapshots(year)
+            if player_leaderboard.year == year:
+                with app.app_context():
+                    traded_players = [row.player_id for row in db.session.query(Player.player_id)
+                                      .filter(Player.trade_version > previous_trade_version)]
+                    refresh_leaderboard_players(traded_players, year)
+            self.read_version = version
+            return True
+
+        invalidate_price_snapshots()
+        # Another worker may have repriced these years since this one loaded them
+        price_matrix.mark_stale([year - 1, year] if ticked else None)
+        if ticked:
+            # The leader has already built the new year and its alerts, this worker's streams still need them
+            with app.app_context():
+                publish_tick(year)
+                publish_alerts()
+        else:
+            player_leaderboard.clear()
+            clear_alerts()
+            # The game was started, stopped or paused elsewhere, the tick leader follows it now
+            tick_leader.wake()
+        self.read_version = version
+        return True
+
+    def poll(self):
+        with app.app_context():
+            game = db.session.query(Game.current_year, Game.game_running, Game.state_version, Game.trade_version).first()
+        if game:
+            self.apply(game.state_version, game.current_year, bool(game.game_running), trade_version=game.trade_version)
 
-# AI Fully Random
-def ai_fully_random(player, current_year):
-    try:
-        stocks = db.session.query(Stock).filter(Stock.year == current_year).all()
-        owned_stocks = {item.stock_id: item for item in player.portfolio}
-        actions = ["buy", "sell"]
-
-        for _ in range(10):  # Perform 10 random actions
-            action = random.choice(actions)
-            
-            if action == "buy":
-                stock = random.choice(stocks)
-                adjusted_price = get_active_price(stock)
-                if adjusted_price >= 8 and stock.stock_id not in owned_stocks:
-                    quantity = random.randint(1, 5)
-                    total_cost = adjusted_price * quantity
-                    if player.balance >= total_cost:
-                        player.balance -= total_cost
-                        portfolio_item = db.session.query(Portfolio).filter_by(
-                            stock_id=stock.stock_id, player_id=player.player_id
-                        ).first()
-
-                        if portfolio_item:
-                            portfolio_item.quantity += quantity
-                            print(f"[DEBUG] Updated portfolio for stock {stock.name} (ID: {stock.stock_id}): New quantity {portfolio_item.quantity}.")
-                        else:
-                            portfolio_item = Portfolio(
-                                player_id=player.player_id,
-                                stock_id=stock.stock_id,
-                                quantity=quantity,
-                                purchase_price=adjusted_price,
-                                year_purchased=current_year
-                            )
-                            db.session.add(portfolio_item)
-                            print(f"[DEBUG] Created new portfolio item for stock {stock.name} (ID: {stock.stock_id}): Quantity {quantity}, Price {adjusted_price}.")
-
-                        owned_stocks[stock.stock_id] = portfolio_item  # Update owned_stocks
-
-            elif action == "sell" and owned_stocks:
-                portfolio_item = random.choice(list(owned_stocks.values()))
-                stock = db.session.query(Stock).filter_by(stock_id=portfolio_item.stock_id, year=current_year).first()
-
-                if stock:
-                    adjusted_price = get_active_price(stock)
-                    total_revenue = adjusted_price * portfolio_item.quantity
-                    profit = total_revenue - (portfolio_item.purchase_price * portfolio_item.quantity)
-                    percentage_return = (profit / (portfolio_item.purchase_price * portfolio_item.quantity)) * 100 if portfolio_item.purchase_price > 0 else 0
-                    player.balance += total_revenue
-
-                    # Record sale
-                    completed_sale = CompletedSale(
-                        player_id=player.player_id,
-                        stock_name=stock.name,
-                        stock_id=portfolio_item.stock_id,
-                        price_purchased=portfolio_item.purchase_price,
-                        quantity_sold=portfolio_item.quantity,
-                        price_sold=adjusted_price,
-                        profit=profit,
-                        percentage_return=percentage_return,
-                        sale_year=current_year
-                    )
-                    db.session.add(completed_sale)
-                    db.session.delete(portfolio_item)
-                    owned_stocks.pop(portfolio_item.stock_id)  # Remove from owned_stocks
-                    print(f"[DEBUG] Sold stock {stock.name} (ID: {stock.stock_id}) for Player {player.name}. Total revenue: {total_revenue}.")
+    def run(self):
+        while True:
+            message = None
+            if self.channel:
+                try:
+                    message = self.channel.listen(self.poll_seconds)
+                except redis.RedisError as e:
+                    app.logger.error(f"Game state channel failed, polling instead: {e}")
+                    self.channel.pubsub = None
+                    time.sleep(self.poll_seconds)
+            else:
+                time.sleep(self.poll_seconds)
+            try:
+                if message:
+                    self.apply(message['version'], message['current_year'], message['game_running'],
+                               message.get('published_at'), message.get('trade_version'))
                 else:
-                    print(f"[WARNING] Could not find stock data for portfolio item ID: {portfolio_item.stock_id}. Skipping.")
+                    self.poll()
+            except Exception as e:
+                app.logger.error(f"Game state sync failed: {e}")
 
-    except Exception as e:
-        print(f"[ERROR] Exception occurred in ai_fully_random: {e}")
-        db.session.rollback()
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'channel': 'redis' if self.channel else 'database polling',
+            'poll_seconds': self.poll_seconds,
+            'version': self.version,
+            'trade_version': self.trade_version,
+            'current_year': current_year,
+            'game_running': game_running,
+            'versions_applied': self.applied,
+            'last_lag_ms': round(self.last_lag * 1000, 2) if self.last_lag is not None else None,
+            'max_lag_ms': round(self.max_lag * 1000, 2) if self.max_lag is not None else None
+        }
 
 
+game_state = GameState(
+    RedisGameStateChannel(GAME_STATE_REDIS_URL) if GAME_STATE_REDIS_URL else None,
+    GAME_STATE_POLL_SECONDS,
+    GAME_STATE_SYNC
+)
 
-def simulate_ai_player_actions(current_year):
+
+def announce_game_state(players=None):
     """
-    Simulate AI player actions for the given year.
+    Bump game.state_version and tell every worker to reload the game state. Call after
+    committing a change to the game row or to the players. For a trade or a new team,
+    pass the ids of the players whose net worth changed: game.trade_version is bumped
+    too and stamped on those players, and the other workers then only drop the current
+    year's prices and re-value those players. Call it once this worker's own caches are
+    up to date.
     """
-    players = db.session.query(Player).filter(Player.name.in_(AI_PLAYER_NAMES)).all()
-
-    for player in players:
-        if player.name == "Bot 1":
-            ai_basic_buyer(player, current_year)
-        elif player.name == "Bot 2":
-            ai_top_movers(player, current_year)
-        elif player.name == "Bot 3":
-            ai_random_trader(player, current_year)
-        elif player.name == "Bot 4":
-            ai_value_investor(player, current_year)
-        elif player.name == "Bot 5":
-            ai_fully_random(player, current_year)
-
+    values = {'state_version': Game.state_version + 1}
+    if players is not None:
+        values['trade_version'] = Game.trade_version + 1
+    db.session.execute(update(Game).values(**values))
+    if players:
+        db.session.execute(
+            update(Player).where(Player.player_id.in_(players))
+            .values(trade_version=select(Game.trade_version).scalar_subquery())
+        )
     db.session.commit()
+    game = db.session.query(Game.current_year, Game.game_running, Game.state_version, Game.trade_version).first()
+    game_state.announce(game.state_version, game.current_year, bool(game.game_running), game.trade_version)
 
 
-def update_year():
-    global current_year
-
-    with app.app_context():
-        game = db.session.query(Game).first()
-        if not game:
-            print("No active game found.")
-            return
-        if game.current_year >= 2024:
-            print("Game has reached the end year.")
-            return
+def apply_price_adjustments(base_price, market_cap, total_sold, demand_modifier, price_change_factor):
+    """
+    Apply the selling multiplier, demand modifier and market factors to a base price,
+    clamped to within 10 of the base price.
+    """
+    if base_price < 8:
+        return base_price
 
-        print(f"Executing 'update_year'. Current year: {game.current_year}")
-        current_year = game.current_year
+    market_cap = market_cap or 1000
+    selling_ratio = total_sold / market_cap
+    selling_multiplier = max(1.0 - (selling_ratio * 0.1), 0.5)
 
-        try:
-            # Fetch all stocks for the current year
-            stocks = db.session.query(Stock).filter_by(year=game.current_year).all()
-            if not stocks:
-                print(f"No stocks found for year {game.current_year}.")
-                return
+    adjusted_price = base_price * selling_multiplier * demand_modifier * price_change_factor
+    lower_bound, upper_bound = max(base_price - 10, 0), base_price + 10
+    return max(min(adjusted_price, upper_bound), lower_bound)
 
-            for stock in stocks:
-                if stock is None:
-                    print(f"Error: Stock is None for year {game.current_year}. Skipping.")
-                    continue
-                    # Calculate adjusted price and update adjusted_price column
-                try:
-                    adjusted_price = get_adjusted_stock_price(stock, game.current_year)
-                    if adjusted_price is not None:
-                            stock.adjusted_price = adjusted_price
-                    else:
-                            print(f"Adjusted price for stock {stock.stock_id} is None. Skipping update.")
-                except Exception as stock_error:
-                        print(f"Error updating stock {stock.stock_id if stock else 'Unknown'}: {stock_error}")
-                        db.session.rollback()
 
-            # Simulate AI player actions
-            simulate_ai_player_actions(current_year)
+def calculate_adjusted_prices(stocks, year):
+    """
+    Compute adjusted prices for a whole year's stocks from grouped aggregates.
+    Returns a dict of Stock.id -> adjusted price.
+    """
+    total_sold_by_stock = dict(
+        db.session.query(CompletedSale.stock_id, db.func.sum(CompletedSale.quantity_sold))
+        .filter(CompletedSale.sale_year == year)
+        .group_by(CompletedSale.stock_id)
+        .all()
+    )
 
-            # Update AI players' portfolio values
-            for player in db.session.query(Player).filter(Player.name.in_(AI_PLAYER_NAMES)).all():
-                player.portfolio_value = calculate_portfolio_value(player.player_id, current_year)
+    # First modifier per stock wins, as with filter_by(...).first()
+    demand_modifiers = {}
+    for row in db.session.query(SupplyDemand).filter_by(year=year).order_by(SupplyDemand.supply_demand_id):
+        demand_modifiers.setdefault(row.stock_id, row.demand_modifier)
 
-            # Increment the game year
-            game.current_year += 1
-            current_year = game.current_year  # Sync global variable
-            db.session.commit()
-            print(f"Year updated to {game.current_year}.")
+    market_dynamics = db.session.query(MarketDynamics).filter_by(year=year).order_by(MarketDynamics.event_id).all()
+    price_change_factors = {}
 
+    adjusted_prices = {}
+    for stock in stocks:
+        try:
+            category = stock.category.lower()
+            if category not in price_change_factors:
+                price_change_factor = 1.0
+                for event in market_dynamics:
+                    if event.sector is None or event.sector.lower() == category:
+                        price_change_factor *= event.price_change_factor
+                price_change_factors[category] = price_change_factor
+
+            adjusted_prices[stock.id] = apply_price_adjustments(
+                stock.price,
+                stock.market_cap,
+                total_sold_by_stock.get(stock.stock_id) or 0,
+                demand_modifiers.get(stock.stock_id, 1.0),
+                price_change_factors[category]
+            )
         except Exception as e:
-            app.logger.error(f"An error occurred: {e}")
-            return jsonify({"error": "An unexpected error occurred"}), 500
-            db.session.rollback()
+            print(f"Error adjusting stock {stock.stock_id}: {e}")
+            adjusted_prices[stock.id] = stock.price
 
+    return adjusted_prices
 
 
-def get_active_price(stock):
+def reprice_year(year):
     """
-    Returns the adjusted price if available; otherwise, falls back to the original price.
+    Recalculate and store adjusted prices for every stock in the given year.
+    All rows are written with one bulk update and committed in a single transaction,
+    so readers see either the old market or the fully repriced one.
     """
-    try:
-        return stock.adjusted_price if hasattr(stock, 'adjusted_price') and stock.adjusted_price is not None else stock.price
-    except AttributeError:
-        # Handle the case where the stock object does not have adjusted_price
-        print(f"Error: Stock {stock} does not have 'adjusted_price' attribute.")
-        return stock.price
+    stocks = db.session.query(Stock).filter_by(year=year).all()
+    if not stocks:
+        return {}
 
+    adjusted_prices = calculate_adjusted_prices(stocks, year)
 
+    by_stock_id = {stock.stock_id: adjusted_prices[stock.id] for stock in stocks}
 
-def error_response(message, status_code=400):
-    return jsonify({'status': 'failure', 'message': message}), status_code
-
-def generate_stocks_display(stocks, previous_year_stocks, current_year):
-    """
-    Generate HTML for displaying stock data with adjusted prices.
-    """
-    columns = [25, 25, 25, 25, 25, 30, 15, 20]
-    stock_slices = []
-    start = 0
+    try:
+        db.session.execute(
+            Stock.__table__.update().where(Stock.__table__.c.id == bindparam('row_id')),
+            [{'row_id': row_id, 'adjusted_price': price} for row_id, price in adjusted_prices.items()]
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
 
-    for count in columns:
-        if start < len(stocks):
-            stock_slices.append(stocks[start:start + count])
-            start += count
+    price_matrix.set_adjusted(year, by_stock_id)
+    return adjusted_prices
 
-    column_titles = ["Film & Television", "Business", "Science", "Literature", "Music", "Politics", "Jewish Authorities", "Sport"]
 
-    # Top four categories
-    top_categories = column_titles[:4]
-    top_stock_slices = stock_slices[:4]
 
-    # Bottom four categories
-    bottom_categories = column_titles[4:]
-    bottom_stock_slices = stock_slices[4:]
+# AI players
+# Strategies live in ai_strategies.py as pure functions of (market, holdings, cash, rng).
+# The engine builds one market snapshot per tick, gets every bot's orders (in a process
+# pool when AI_WORKERS > 1), applies them to each bot's book in memory and persists all
+# bots' trades in one transaction.
+AI_WORKERS = int(os.getenv('AI_WORKERS', 1))
+AI_PARALLEL_MIN_BOTS = int(os.getenv('AI_PARALLEL_MIN_BOTS', 50))
+AI_SEED = os.getenv('AI_SEED', '')
+ai_executor = None
+ai_executor_lock = threading.Lock()
 
-    # HTML for top categories
-    top_stocks_display = '<table id="topStocksDisplay" style="width: 100%; border-collapse: collapse;"><thead><tr>'
-    for title in top_categories:
-        top_stocks_display += f'<th colspan="3" class="category-title" style="text-align: center;">{title}</th>'
-    top_stocks_display += '</tr><tr>'
-    for _ in top_categories:
-        top_stocks_display += '<th class="label">Stock</th>'
-        top_stocks_display += '<th class="label">Price</th>'
-        top_stocks_display += '<th class="label">Change</th>'
-    top_stocks_display += '</tr></thead><tbody>'
-
-    max_rows = max(columns[:4])
-    for row in range(max_rows):
-        top_stocks_display += '<tr>'
-        for col in range(len(top_categories)):
-            if row < len(top_stock_slices[col]):
-                stock = top_stock_slices[col][row]
-                adjusted_price = get_active_price(stock)
-                prev_price = previous_year_stocks.get(stock.name, adjusted_price)
-                change = adjusted_price - prev_price
-                percentage_change = (change / prev_price) * 100 if prev_price != 0 else 0
-                color = 'green' if change > 0 else 'red' if change < 0 else 'black'
 
-                stock_style = '<strong>' if adjusted_price > 0 else '<i class="unavailable">'
-                end_stock_style = '</strong>' if adjusted_price > 0 else '</i>'
+def build_market_snapshot(year):
+    """
+    Compact, picklable view of the year's prices for the strategies.
+    previous_prices holds the previous year's raw price.
+    """
+    snapshot = get_price_snapshot(year)
+    return MarketSnapshot(
+        year=year,
+        stock_ids=tuple(stock.stock_id for stock in snapshot.stocks),
+        prices={stock.stock_id: get_active_price(stock) for stock in snapshot.stocks},
+        previous_prices={stock.stock_id: stock.previous_base_price for stock in snapshot.stocks},
+        names={stock.stock_id: stock.name for stock in snapshot.stocks}
+    )
 
-                top_stocks_display += f'<td style="border: none;">{stock_style}{stock.name}{end_stock_style}</td>'
-                top_stocks_display += f'<td style="border: none;">{stock_style}£{int(adjusted_price)}{end_stock_style}</td>'
-                change_display = f'{change:+.0f} ({percentage_change:.1f}%)' if adjusted_price > 0 else '<i class="unavailable">N/A</i>'
-                top_stocks_display += f'<td style="color: {color}; border: none;">{change_display}</td>'
-            else:
-                top_stocks_display += '<td style="border: none;"></td><td style="border: none;"></td><td style="border: none;"></td>'
-        top_stocks_display += '</tr>'
-    top_stocks_display += '</tbody></table>'
-
-    # HTML for bottom categories
-    bottom_stocks_display = '<table id="bottomStocksDisplay" style="width: 100%; border-collapse: collapse; margin-top: 20px;"><thead><tr>'
-    for title in bottom_categories:
-        bottom_stocks_display += f'<th colspan="3" class="category-title" style="text-align: center;">{title}</th>'
-    bottom_stocks_display += '</tr><tr>'
-    for _ in bottom_categories:
-        bottom_stocks_display += '<th class="label">Stock</th>'
-        bottom_stocks_display += '<th class="label">Price</th>'
-        bottom_stocks_display += '<th class="label">Change</th>'
-    bottom_stocks_display += '</tr></thead><tbody>'
-
-    max_rows = max(columns[4:])
-    for row in range(max_rows):
-        bottom_stocks_display += '<tr>'
-        for col in range(len(bottom_categories)):
-            if row < len(bottom_stock_slices[col]):
-                stock = bottom_stock_slices[col][row]
-                adjusted_price = get_active_price(stock)
-                prev_price = previous_year_stocks.get(stock.name, adjusted_price)
-                change = adjusted_price - prev_price
-                percentage_change = (change / prev_price) * 100 if prev_price != 0 else 0
-                color = 'green' if change > 0 else 'red' if change < 0 else 'black'
 
-                stock_style = '<strong>' if adjusted_price > 0 else '<i class="unavailable">'
-                end_stock_style = '</strong>' if adjusted_price > 0 else '</i>'
+def get_ai_executor():
+    """
+    Return the shared process pool, or None when bots run in-process.
+    Workers are spawned rather than forked so they never inherit the scheduler
+    thread or open database connections.
+    """
+    global ai_executor
+    if AI_WORKERS <= 1:
+        return None
+    with ai_executor_lock:
+        if ai_executor is None:
+            ai_executor = ProcessPoolExecutor(max_workers=AI_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+            atexit.register(ai_executor.shutdown, wait=False, cancel_futures=True)
+        return ai_executor
 
-                bottom_stocks_display += f'<td style="border: none;">{stock_style}{stock.name}{end_stock_style}</td>'
-                bottom_stocks_display += f'<td style="border: none;">{stock_style}£{int(adjusted_price)}{end_stock_style}</td>'
-                change_display = f'{change:+.0f} ({percentage_change:.1f}%)' if adjusted_price > 0 else '<i class="unavailable">N/A</i>'
-                bottom_stocks_display += f'<td style="color: {color}; border: none;">{change_display}</td>'
-            else:
-                bottom_stocks_display += '<td style="border: none;"></td><td style="border: none;"></td><td style="border: none;"></td>'
-        bottom_stocks_display += '</tr>'
-    bottom_stocks_display += '</tbody></table>'
 
-    return top_stocks_display + bottom_stocks_display
+def configure_ai_workers(workers):
+    """
+    Change the number of AI worker processes, replacing any existing pool.
+    """
+    global AI_WORKERS, ai_executor
+    with ai_executor_lock:
+        if ai_executor is not None:
+            ai_executor.shutdown(wait=True)
+            ai_executor = None
+        AI_WORKERS = workers
 
 
-def get_previous_year_stocks(year):
+def plan_ai_orders(market, jobs):
     """
-    Fetch the stocks from the previous year as a dictionary of stock name to price.
+    Run every (player_id, strategy_name, holdings, cash) job and return
+    [(player_id, strategy_name, orders, seconds, error)] in job order. Each bot is seeded
+    from (AI_SEED, year, player_id), so the orders do not depend on the worker count.
     """
-    previous_year = year - 1
-    return {
-        stock.name: get_active_price(stock)
-        for stock in db.session.query(Stock).filter(Stock.year == previous_year).all()
-    }
+    executor = get_ai_executor()
+    if executor is None or len(jobs) < AI_PARALLEL_MIN_BOTS:
+        return decide_orders(market, jobs, AI_SEED)
+
+    chunk_size = max(1, -(-len(jobs) // (AI_WORKERS * 4)))
+    futures = [
+        executor.submit(decide_orders, market, jobs[index:index + chunk_size], AI_SEED)
+        for index in range(0, len(jobs), chunk_size)
+    ]
+    results = []
+    for future in futures:
+        results.extend(future.result())
+    return results
 
 
-def generate_player_table(current_year):
+class BotBook:
     """
-    Generate a table of players with their total portfolio value for the given year.
+    A team's cash and holdings for one tick, for bots and for standing orders. Orders
+    are checked and applied in memory, then written back with the other teams' changes.
     """
-    try:
-        players = db.session.query(Player).all()
-        player_table = []
+    def __init__(self, player_id, cash, holdings):
+        self.player_id = player_id
+        self.starting_cash = cash
+        self.cash = cash
+        # stock_id -> [portfolio_id, quantity, purchase_price, starting (quantity, purchase_price)]
+        self.holdings = {
+            row.stock_id: [row.portfolio_id, row.quantity, row.purchase_price, (row.quantity, row.purchase_price)]
+            for row in holdings
+        }
+        self.sales = []
+        self.filled = 0
 
-        for player in players:
-            # Calculate portfolio value for the current year
-            portfolio_value = calculate_portfolio_value(player.player_id, current_year)
-            total_value = (player.balance or 0) + (portfolio_value or 0)
+    def view(self):
+        return {
+            stock_id: Holding(quantity, purchase_price)
+            for stock_id, (_, quantity, purchase_price, _) in self.holdings.items() if quantity > 0
+        }
 
-            player_table.append({
-                'player_id': player.player_id,
-                'name': player.name,
-                'total_value': round(total_value, 1),
-            })
+    def apply(self, order, market):
+        price = market.prices.get(order.stock_id)
+        if price is None or order.quantity == 0:
+            return False
+
+        if order.quantity > 0:
+            total_cost = price * order.quantity
+            if price <= 0 or self.cash < total_cost:
+                return False
+            self.cash -= total_cost
+            holding = self.holdings.get(order.stock_id)
+            if holding and holding[1] > 0:
+                holding[1] += order.quantity
+            elif holding:
+                holding[1], holding[2] = order.quantity, price
+            else:
+                self.holdings[order.stock_id] = [None, order.quantity, price, None]
+        else:
+            quantity = -order.quantity
+            holding = self.holdings.get(order.stock_id)
+            if not holding or holding[1] < quantity:
+                return False
+            purchase_price = holding[2]
+            total_revenue = price * quantity
+            profit = total_revenue - (purchase_price * quantity)
+            self.cash += total_revenue
+            holding[1] -= quantity
+            self.sales.append(dict(
+                player_id=self.player_id,
+                stock_name=market.names[order.stock_id],
+                stock_id=order.stock_id,
+                price_purchased=purchase_price,
+                quantity_sold=quantity,
+                price_sold=price,
+                profit=profit,
+                percentage_return=(profit / (purchase_price * quantity)) * 100 if purchase_price > 0 else 0,
+                sale_year=market.year
+            ))
 
-        # Sort players by total value in descending order
-        return sorted(player_table, key=lambda x: x['total_value'], reverse=True)
-    except Exception as e:
-        print(f"Error generating player table: {e}")
-        return []
+        self.filled += 1
+        return True
 
 
-def calculate_portfolio_value(player_id, current_year):
-    portfolio = db.session.query(Portfolio).filter_by(player_id=player_id).all()
-    total_value = 0
-    for item in portfolio:
-        stock = db.session.query(Stock).filter_by(stock_id=item.stock_id, year=current_year).first()
-        if stock:
-            adjusted_price = get_active_price(stock)
-            total_value += item.quantity * adjusted_price
-    return round(total_value, 2)
+def persist_bot_books(books, year):
+    """
+    Write every book's balance, holdings and sales with bulk statements in one transaction.
+    Balances and quantities are written as increments, so a player's own trades made
+    during the tick are kept.
+    """
+    balances, inserts, updates, deletes, sales = [], [], [], [], []
+    for book in books:
+        if book.cash != book.starting_cash:
+            balances.append({'row_id': book.player_id, 'change': book.cash - book.starting_cash})
+        sales.extend(book.sales)
+        for stock_id, (portfolio_id, quantity, purchase_price, starting) in book.holdings.items():
+            if portfolio_id is None:
+                if quantity > 0:
+                    inserts.append(dict(player_id=book.player_id, stock_id=stock_id, quantity=quantity,
+                                        purchase_price=purchase_price, year_purchased=year))
+            elif (quantity, purchase_price) != starting:
+                updates.append({'row_id': portfolio_id, 'change': quantity - starting[0], 'purchase_price': purchase_price})
+                if quantity == 0:
+                    deletes.append(portfolio_id)
+
+    player_table, portfolio_table = Player.__table__, Portfolio.__table__
+    try:
+        if balances:
+            db.session.execute(
+                player_table.update()
+                .where(player_table.c.player_id == bindparam('row_id'))
+                .values(balance=player_table.c.balance + bindparam('change')),
+                balances
+            )
+        if updates:
+            db.session.execute(
+                portfolio_table.update()
+                .where(portfolio_table.c.portfolio_id == bindparam('row_id'))
+                .values(quantity=portfolio_table.c.quantity + bindparam('change'), purchase_price=bindparam('purchase_price')),
+                updates
+            )
+        if deletes:
+            db.session.execute(
+                portfolio_table.delete().where(portfolio_table.c.portfolio_id.in_(deletes), portfolio_table.c.quantity <= 0)
+            )
+        if inserts:
+            db.session.execute(insert(Portfolio), inserts)
+        if sales:
+            db.session.execute(insert(CompletedSale), sales)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
 
+    return {'inserted': len(inserts), 'updated': len(updates), 'deleted': len(deletes), 'sales': len(sales)}
 
 
+ai_phase_stats = {}
 
-def generate_stocks_display_data(stocks, previous_year_stocks, current_year):
+
+def simulate_ai_player_actions(current_year):
+    """
+    Simulate AI player actions for the given year.
+    """
+    global ai_phase_stats
+
+    phase_start = time.perf_counter()
+    market = build_market_snapshot(current_year)
+    bots = (
+        db.session.query(Player.player_id, Player.name, Player.balance)
+        .filter(Player.name.in_(AI_PLAYER_NAMES))
+        .all()
+    )
+    holdings = defaultdict(list)
+    for row in db.session.query(Portfolio).filter(Portfolio.player_id.in_([bot.player_id for bot in bots])):
+        holdings[row.player_id].append(row)
+
+    books = {}
+    jobs = []
+    for bot in sorted(bots, key=lambda bot: bot.player_id):
+        strategy_name = AI_BOTS.get(bot.name)
+        if strategy_name not in AI_STRATEGIES:
+            print(f"[WARNING] No strategy '{strategy_name}' for {bot.name}. Skipping.")
+            continue
+        book = BotBook(bot.player_id, bot.balance, holdings.get(bot.player_id, []))
+        books[bot.player_id] = book
+        jobs.append((bot.player_id, strategy_name, book.view(), book.cash))
+
+    decide_start = time.perf_counter()
+    strategy_seconds = defaultdict(float)
+    orders_placed = 0
+    errors = 0
+    for player_id, strategy_name, orders, seconds, error in plan_ai_orders(market, jobs):
+        strategy_seconds[strategy_name] += seconds
+        if error:
+            app.logger.error(f"AI strategy {strategy_name} failed for player {player_id}: {error}")
+            errors += 1
+        for order in orders:
+            books[player_id].apply(order, market)
+        orders_placed += len(orders)
+    decide_seconds = time.perf_counter() - decide_start
+
+    books = list(books.values())
+    written = persist_bot_books(books, current_year)
+
+    ai_phase_stats = {
+        'year': current_year,
+        'bots': len(books),
+        'orders': orders_placed,
+        'errors': errors,
+        'filled': sum(book.filled for book in books),
+        'seconds': round(time.perf_counter() - phase_start, 6),
+        'decide_seconds': round(decide_seconds, 6),
+        'workers': AI_WORKERS,
+        'strategy_seconds': {name: round(seconds, 6) for name, seconds in strategy_seconds.items()},
+        **written
+    }
+    app.logger.debug(f"AI phase: {ai_phase_stats['bots']} bots placed {orders_placed} orders in {ai_phase_stats['seconds'] * 1000:.1f} ms.")
+    return ai_phase_stats
+
+
+# Standing orders
+# Limit and stop orders wait in standing_order until a tick's new prices trigger them.
+# Pending orders are grouped by stock and side and kept sorted by trigger price, so each
+# stock's triggered orders are found with a bisect. Triggered orders are applied to their
+# teams' books at the new price, and all fills, sales and order updates are written in
+# one transaction.
+ORDER_SIDES = ('buy', 'sell')
+ORDER_TYPES = ('limit', 'stop')
+# (side, order type, fires when the price is at or below the trigger)
+ORDER_TRIGGERS = (('buy', 'limit', True), ('sell', 'stop', True), ('sell', 'limit', False), ('buy', 'stop', False))
+
+
+class StandingOrderIndex:
+    """
+    Pending orders indexed by (stock_id, side, order_type), sorted by trigger price.
+    """
+    def __init__(self, orders):
+        self.entries = defaultdict(list)
+        for order in orders:
+            self.entries[order.stock_id, order.side, order.order_type].append((order.trigger_price, order.order_id, order))
+        for entries in self.entries.values():
+            entries.sort(key=lambda entry: entry[:2])
+        self.trigger_prices = {key: [entry[0] for entry in entries] for key, entries in self.entries.items()}
+        self.stock_ids = {stock_id for stock_id, _, _ in self.entries}
+
+    def triggered(self, stock_id, price):
+        """
+        Yield the orders the price triggers: buy limits and sell stops whose trigger is
+        at or above the price, sell limits and buy stops whose trigger is at or below it.
+        """
+        for side, order_type, at_or_below in ORDER_TRIGGERS:
+            values = self.trigger_prices.get((stock_id, side, order_type))
+            if not values:
+                continue
+            entries = self.entries[stock_id, side, order_type]
+            matched = entries[bisect_left(values, price):] if at_or_below else entries[:bisect_right(values, price)]
+            for _, _, order in matched:
+                yield order
+
+
+order_phase_stats = {}
+
+
+def match_standing_orders(year):
+    """
+    Fill every pending order triggered by the year's prices. Orders a team can no longer
+    cover are rejected.
+    """
+    global order_phase_stats
+
+    phase_start = time.perf_counter()
+    pending = (
+        db.session.query(StandingOrder.order_id, StandingOrder.player_id, StandingOrder.stock_id, StandingOrder.side,
+                         StandingOrder.order_type, StandingOrder.trigger_price, StandingOrder.quantity)
+        .filter(StandingOrder.status == 'pending')
+        .all()
+    )
+    if not pending:
+        order_phase_stats = {'year': year, 'pending': 0, 'triggered': 0, 'filled': 0, 'rejected': 0,
+                             'seconds': round(time.perf_counter() - phase_start, 6)}
+        return order_phase_stats
+
+    # Trigger and fill at the adjusted prices teams trade at, from the same source as execute_orders
+    index = StandingOrderIndex(pending)
+    priced = price_orders(list(index.stock_ids), year)
+    market = MarketSnapshot(
+        year=year,
+        stock_ids=tuple(priced),
+        prices={stock_id: price for stock_id, (_, price) in priced.items()},
+        previous_prices={},
+        names={stock_id: stock.name for stock_id, (stock, _) in priced.items()}
+    )
+    triggered = []
+    for stock_id in index.stock_ids:
+        price = market.prices.get(stock_id)
+        if price is not None and price > 0:
+            triggered.extend(index.triggered(stock_id, price))
+    # Sells first, so a team's sales can pay for its buys; oldest first within each side
+    triggered.sort(key=lambda order: (order.side != 'sell', order.order_id))
+
+    player_ids = {order.player_id for order in triggered}
+    holdings = defaultdict(list)
+    books = {}
+    if player_ids:
+        for row in db.session.query(Portfolio).filter(Portfolio.player_id.in_(player_ids)):
+            holdings[row.player_id].append(row)
+        for row in db.session.query(Player.player_id, Player.balance).filter(Player.player_id.in_(player_ids)):
+            books[row.player_id] = BotBook(row.player_id, row.balance, holdings.get(row.player_id, []))
+
+    order_updates = []
+    for order in triggered:
+        book = books.get(order.player_id)
+        quantity = order.quantity if order.side == 'buy' else -order.quantity
+        filled = book is not None and book.apply(Order(order.stock_id, quantity), market)
+        order_updates.append({
+            'row_id': order.order_id,
+            'status': 'filled' if filled else 'rejected',
+            'filled_year': year,
+            'fill_price': market.prices[order.stock_id] if filled else None
+        })
+
+    written = {}
+    if order_updates:
+        order_table = StandingOrder.__table__
+        db.session.execute(
+            order_table.update().where(order_table.c.order_id == bindparam('row_id')),
+            order_updates
+        )
+        written = persist_bot_books(list(books.values()), year)
+
+    filled = sum(1 for update in order_updates if update['status'] == 'filled')
+    order_phase_stats = {
+        'year': year,
+        'pending': len(pending),
+        'triggered': len(triggered),
+        'filled': filled,
+        'rejected': len(triggered) - filled,
+        'seconds': round(time.perf_counter() - phase_start, 6),
+        **written
+    }
+    app.logger.debug(f"Standing orders: {filled} of {len(pending)} pending filled, {len(triggered) - filled} rejected.")
+    return order_phase_stats
+
+
+# Tick history
+# update_year records each phase of a tick (load, pricing, ai, valuation, commit, orders,
+# publish) with its wall time, query count, DB time and rows written, using a query scope
+# per phase. The AI phase also carries the decision time per strategy. The last
+# TICK_HISTORY_LENGTH ticks are kept for /admin/ticks, and the next tick can be run under
+# cProfile on request.
+TICK_HISTORY_LENGTH = int(os.getenv('TICK_HISTORY_LENGTH', 50))
+tick_history = deque(maxlen=TICK_HISTORY_LENGTH)
+tick_profile_requested = threading.Event()
+last_tick_profile = {}
+
+
+class TickRecorder:
+    """
+    The phases of one tick as they finish.
+    """
+    def __init__(self):
+        self.year = None
+        self.started_at = time.time()
+        self.started = self.phase_started = time.perf_counter()
+        self.phases = []
+        self.totals = QueryScope()
+        self.scope = query_tracker.open()
+
+    def end_phase(self, name, **detail):
+        now = time.perf_counter()
+        scope = self.scope
+        query_tracker.close(scope)
+        self.phases.append({
+            'name': name,
+            'ms': round((now - self.phase_started) * 1000, 3),
+            'queries': scope.count,
+            'db_ms': round(scope.seconds * 1000, 3),
+            'rows': scope.rows,
+            **detail
+        })
+        self.totals.count += scope.count
+        self.totals.seconds += scope.seconds
+        self.totals.rows += scope.rows
+        self.scope = query_tracker.open()
+        self.phase_started = now
+
+    def timings(self):
+        return {phase['name']: phase['ms'] / 1000 for phase in self.phases}
+
+    def close(self):
+        query_tracker.close(self.scope)
+
+    def record(self, error=None):
+        tick_history.append({
+            'year': self.year,
+            'started_at': datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(timespec='milliseconds'),
+            'ms': round((time.perf_counter() - self.started) * 1000, 3),
+            'queries': self.totals.count,
+            'db_ms': round(self.totals.seconds * 1000, 3),
+            'rows': self.totals.rows,
+            'phases': self.phases,
+            'error': error
+        })
+
+
+def start_tick_profile():
+    if not tick_profile_requested.is_set():
+        return None
+    tick_profile_requested.clear()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def finish_tick_profile(profiler, year):
+    if profiler is None:
+        return
+    profiler.disable()
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(60)
+    last_tick_profile.clear()
+    last_tick_profile.update(year=year, captured_at=datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                             text=output.getvalue())
+
+
+def update_year():
+    global current_year
+
+    with app.app_context():
+        profiler = start_tick_profile()
+        tick = TickRecorder()
+        claimed = False
+        try:
+            game = db.session.query(Game).first()
+            if not game:
+                print("No active game found.")
+                return
+            if not game.game_running:
+                app.logger.debug("The game is stopped, skipping this tick.")
+                return
+            if game.current_year >= 2024:
+                print("Game has reached the end year.")
+                return
+
+            print(f"Executing 'update_year'. Current year: {game.current_year}")
+            current_year = tick.year = game.current_year
+
+            # Make sure the year has stocks before doing any work
+            if not db.session.query(Stock.id).filter_by(year=game.current_year).first():
+                print(f"No stocks found for year {game.current_year}.")
+                return
+
+            # Claim the year before writing anything else. The compare-and-set holds the
+            # database's write lock until the repricing commits with it, so a stale or second
+            # leader finds the year taken, or the game stopped, and writes nothing.
+            claimed = db.session.execute(
+                update(Game).where(Game.game_id == game.game_id, Game.current_year == current_year,
+                                   Game.game_running.is_(True))
+                .values(current_year=current_year + 1)
+            ).rowcount > 0
+            if not claimed:
+                db.session.rollback()
+                app.logger.debug(f"Year {current_year} was already advanced or the game stopped, skipping this tick.")
+                return
+            tick.end_phase('load')
+
+            # Reprice the whole market, committed with the claim
+            reprice_year(game.current_year)
+            invalidate_price_snapshots()
+            tick.end_phase('pricing')
+
+            # Simulate AI player actions
+            ai_stats = simulate_ai_player_actions(current_year)
+            tick.end_phase('ai', bots=ai_stats['bots'], orders=ai_stats['orders'], strategy_ms={
+                name: round(seconds * 1000, 3) for name, seconds in ai_stats['strategy_seconds'].items()
+            })
+
+            # Update AI players' portfolio values
+            bot_ids = [row.player_id for row in db.session.query(Player.player_id).filter(Player.name.in_(AI_PLAYER_NAMES))]
+            valuations = value_portfolios(bot_ids, current_year)
+            if bot_ids:
+                db.session.execute(
+                    Player.__table__.update().where(Player.__table__.c.player_id == bindparam('row_id')),
+                    [{'row_id': player_id, 'portfolio_value': valuations[player_id].total_value} for player_id in bot_ids]
+                )
+            tick.end_phase('valuation')
+
+            # Move this worker to the claimed year
+            db.session.commit()
+            current_year += 1
+            print(f"Year updated to {current_year}.")
+            tick.end_phase('commit')
+
+            # Fill the standing orders the new prices trigger
+            order_stats = match_standing_orders(current_year)
+            tick.end_phase('orders', pending=order_stats.get('pending', 0), filled=order_stats.get('filled', 0))
+
+            # Store the alerts the new prices fire before the other workers look for them
+            alerts_fired = evaluate_watch_list_alerts(current_year)
+            app.logger.debug(f"Watch-list alerts fired: {alerts_fired}")
+            tick.end_phase('alerts', fired=alerts_fired)
+
+            # The year is complete, let the other workers move to it while this one publishes
+            announce_game_state()
+
+            # Build the new year's leaderboard once and push it and the alerts to connected clients
+            rebuild_leaderboard(current_year)
+            publish_tick(current_year)
+            publish_alerts()
+            tick.end_phase('publish')
+
+            tick.record()
+            last_tick_timings.clear()
+            last_tick_timings.update(tick.timings())
+
+        except Exception as e:
+            app.logger.error(f"An error occurred: {e}")
+            db.session.rollback()
+            if claimed:
+                # The claim may have been committed with the repricing, so follow the database
+                try:
+                    current_year = db.session.query(Game.current_year).scalar()
+                    announce_game_state()
+                except Exception as sync_error:
+                    app.logger.error(f"Could not announce the game state after a failed tick: {sync_error}")
+            tick.record(error=str(e))
+            return jsonify({"error": "An unexpected error occurred"}), 500
+
+        finally:
+            tick.close()
+            finish_tick_profile(profiler, tick.year)
+
+
+last_tick_timings = {}
+
+
+def simulate_game(start_year=None, end_year=2024, reset_players=False, on_tick=None):
+    """
+    Fast-forward the game to end_year by calling update_year back to back, without
+    the scheduler. The game is marked running meanwhile, as update_year skips stopped
+    games. Returns years/sec, per-phase timings and the final standings.
+    """
+    global current_year
+
+    with app.app_context():
+        if reset_players:
+            reset_player_data()
+        game = db.session.query(Game).first()
+        if not game:
+            raise RuntimeError("No game found in the database.")
+        if start_year is not None:
+            game.current_year = start_year
+            invalidate_price_snapshots()
+        was_running, game.game_running = game.game_running, True
+        db.session.commit()
+        ensure_ai_players()
+        start_year = current_year = game.current_year
+
+    phase_totals = defaultdict(float)
+    tick_seconds = []
+    year = start_year
+    started = time.perf_counter()
+    try:
+        while year < min(end_year, 2024):
+            tick_start = time.perf_counter()
+            last_tick_timings.clear()
+            update_year()
+            if not last_tick_timings:
+                raise RuntimeError(f"Tick failed in {year}.")
+            tick_seconds.append(time.perf_counter() - tick_start)
+            for phase, seconds in last_tick_timings.items():
+                phase_totals[phase] += seconds
+            year = current_year
+            if on_tick:
+                on_tick(year, tick_seconds[-1], dict(last_tick_timings))
+    finally:
+        with app.app_context():
+            db.session.execute(update(Game).values(game_running=was_running))
+            db.session.commit()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        standings = generate_player_table(year)
+
+    years = len(tick_seconds)
+    return {
+        'start_year': start_year,
+        'end_year': year,
+        'years': years,
+        'seconds': round(elapsed, 4),
+        'years_per_second': round(years / elapsed, 2) if elapsed else None,
+        'slowest_tick_seconds': round(max(tick_seconds), 4) if tick_seconds else None,
+        'phases': {
+            phase: {'total_seconds': round(total, 4), 'mean_ms': round(total / years * 1000, 3)}
+            for phase, total in phase_totals.items()
+        },
+        'standings': standings
+    }
+
+
+def get_active_price(stock):
+    """
+    Returns the adjusted price if available; otherwise, falls back to the original price.
+    """
+    try:
+        return stock.adjusted_price if hasattr(stock, 'adjusted_price') and stock.adjusted_price is not None else stock.price
+    except AttributeError:
+        # Handle the case where the stock object does not have adjusted_price
+        print(f"Error: Stock {stock} does not have 'adjusted_price' attribute.")
+        return stock.price
+
+
+
+# Price matrix
+# Every stock's base and adjusted price for every year, as one dense float64 array of
+# shape (2, stock_id, year - first_year) with NaN where a stock has no row for a year.
+# It is loaded with a single query on first use, or mapped from PRICE_MATRIX_CACHE so
+# gunicorn workers share the pages, and written in place whenever adjusted prices are
+# stored. Columns another worker may have repriced are marked stale and reloaded with
+# one query on their next read. Stock rows are never inserted while the game runs, so
+# reseeding Stock needs the workers restarted.
+PRICE_MATRIX_CACHE = os.getenv('PRICE_MATRIX_CACHE', '')
+
+
+class PriceMatrix:
+    def __init__(self, cache_path=None):
+        self.cache_path = cache_path or None
+        self.lock = threading.RLock()
+        self.prices = None
+        self.first_year = None
+        self.names = None
+        self.categories = None
+        self.category_codes = None
+        self.category_names = []
+        self.stale = None
+        self.generation = 0  # changes whenever base prices may have
+        self.loads = 0
+        self.cache_loads = 0
+        self.column_reloads = 0
+        self.updates = 0
+        self.load_seconds = None
+
+    @property
+    def years(self):
+        return self.prices.shape[2]
+
+    def ensure(self):
+        """
+        Load the matrix if this worker has not yet done so. Needs an app context.
+        """
+        if self.prices is None:
+            with self.lock:
+                if self.prices is None:
+                    self.load()
+        return self
+
+    def fingerprint(self):
+        """
+        Cheap summary of the Stock table's shape and base prices, used to tell whether a
+        cache file still matches it. Adjusted prices change with every trade, so they are
+        re-read when a cache file is mapped instead.
+        """
+        row = db.session.query(
+            db.func.count(Stock.id), db.func.max(Stock.id), db.func.min(Stock.year), db.func.max(Stock.year),
+            db.func.max(Stock.stock_id), db.func.sum(Stock.price)
+        ).one()
+        return list(row)
+
+    def load(self):
+        started = time.perf_counter()
+        fingerprint = self.fingerprint()
+        if not (self.cache_path and self.map_cache(fingerprint)):
+            self.build(fingerprint)
+            if self.cache_path:
+                self.write_cache(fingerprint)
+        self.stale = np.zeros(self.years, dtype=bool)
+        self.generation += 1
+        self.loads += 1
+        self.load_seconds = round(time.perf_counter() - started, 4)
+
+    def build(self, fingerprint):
+        count, _, first_year, last_year, max_stock_id = fingerprint[:5]
+        if not count:
+            first_year, last_year, max_stock_id = current_year, current_year - 1, 0
+
+        rows = db.session.query(Stock.stock_id, Stock.year, Stock.price, Stock.adjusted_price).all()
+        prices = np.full((2, max_stock_id + 1, last_year - first_year + 1), np.nan)
+        self.fill(prices, first_year, rows)
+
+        names = [None] * (max_stock_id + 1)
+        categories = [None] * (max_stock_id + 1)
+        for stock in db.session.query(StockMaster).filter(StockMaster.stock_id <= max_stock_id):
+            names[stock.stock_id] = stock.name
+            categories[stock.stock_id] = stock.category
+
+        self.set_arrays(prices, first_year, names, categories)
+
+    @staticmethod
+    def fill(prices, first_year, rows):
+        if not rows:
+            return
+        stock_ids = np.fromiter((row.stock_id for row in rows), dtype=np.int64, count=len(rows))
+        columns = np.fromiter((row.year for row in rows), dtype=np.int64, count=len(rows)) - first_year
+        prices[0, stock_ids, columns] = np.array([row.price for row in rows], dtype=np.float64)
+        prices[1, stock_ids, columns] = np.array([row.adjusted_price for row in rows], dtype=np.float64)
+
+    def set_arrays(self, prices, first_year, names, categories):
+        self.category_names = sorted({category for category in categories if category is not None})
+        codes = {category: code for code, category in enumerate(self.category_names)}
+        self.category_codes = np.array([codes.get(category, -1) for category in categories], dtype=np.int64)
+        self.names = names
+        self.categories = categories
+        self.first_year = first_year
+        self.prices = prices
+
+    def map_cache(self, fingerprint):
+        """
+        Map the cache file if it was written from the same Stock table. Returns True on success.
+        """
+        try:
+            with open(f'{self.cache_path}.json') as cache_file:
+                meta = json.load(cache_file)
+            prices = np.load(self.cache_path, mmap_mode='r+')
+        except (OSError, ValueError):
+            return False
+
+        cached = meta.get('fingerprint') or []
+        if len(cached) != len(fingerprint) or cached[:-1] != fingerprint[:-1]:
+            return False
+        if (cached[-1] is None) != (fingerprint[-1] is None) or (
+                fingerprint[-1] is not None and not math.isclose(cached[-1], fingerprint[-1], rel_tol=1e-9)):
+            return False
+        if prices.dtype != np.float64 or prices.shape[:2] != (2, len(meta['names'])):
+            return False
+
+        self.set_arrays(prices, meta['first_year'], meta['names'], meta['categories'])
+        self.refresh_adjusted()
+        self.cache_loads += 1
+        return True
+
+    def refresh_adjusted(self):
+        """
+        Replace the adjusted prices with the Stock table's, in one query.
+        """
+        stock_table = Stock.__table__
+        rows = db.session.connection().execute(
+            select(stock_table.c.stock_id, stock_table.c.year, stock_table.c.adjusted_price)
+            .where(stock_table.c.adjusted_price.isnot(None))
+        ).all()
+        adjusted = np.full(self.prices.shape[1:], np.nan)
+        if rows:
+            stock_ids = np.fromiter((row.stock_id for row in rows), dtype=np.int64, count=len(rows))
+            columns = np.fromiter((row.year for row in rows), dtype=np.int64, count=len(rows)) - self.first_year
+            adjusted[stock_ids, columns] = np.fromiter((row.adjusted_price for row in rows), dtype=np.float64,
+                                                       count=len(rows))
+        # Assigned in one go, so workers sharing the mapping never read a cleared layer
+        self.prices[1] = adjusted
+
+    def write_cache(self, fingerprint):
+        """
+        Write the matrix to the cache file and switch to a shared mapping of it.
+        Both files are written in full before either is renamed into place, and the array
+        goes first: metadata naming this fingerprint is only ever next to this array, and
+        a worker that still finds the old metadata rejects its fingerprint.
+        """
+        temporary_array = f'{self.cache_path}.{os.getpid()}.tmp'
+        temporary_meta = f'{self.cache_path}.json.{os.getpid()}.tmp'
+        try:
+            with open(temporary_array, 'wb') as cache_file:
+                np.save(cache_file, self.prices)
+            with open(temporary_meta, 'w') as cache_file:
+                json.dump({
+                    'fingerprint': fingerprint,
+                    'first_year': self.first_year,
+                    'names': self.names,
+                    'categories': self.categories
+                }, cache_file)
+            os.replace(temporary_array, self.cache_path)
+            os.replace(temporary_meta, f'{self.cache_path}.json')
+            self.prices = np.load(self.cache_path, mmap_mode='r+')
+        except OSError as e:
+            print(f"Could not write the price matrix cache {self.cache_path}: {e}")
+
+    def column(self, year):
+        """
+        Return the year's column index, or None when the matrix has no such year.
+        """
+        self.ensure()
+        try:
+            index = int(year) - self.first_year
+        except (TypeError, ValueError):
+            return None
+        if not 0 <= index < self.years:
+            return None
+        if self.stale[index]:
+            self.reload(index)
+        return index
+
+    def reload(self, index):
+        with self.lock:
+            if not self.stale[index]:
+                return
+            year = self.first_year + index
+            rows = (
+                db.session.query(Stock.stock_id, Stock.year, Stock.price, Stock.adjusted_price)
+                .filter(Stock.year == year)
+                .all()
+            )
+            if any(row.stock_id >= self.prices.shape[1] for row in rows):
+                self.load()
+                return
+            self.prices[:, :, index] = np.nan
+            self.fill(self.prices, self.first_year, rows)
+            self.stale[index] = False
+            self.generation += 1
+            self.column_reloads += 1
+
+    def mark_stale(self, years=None):
+        """
+        Have the given years (all years if None) reloaded from the database on their next read.
+        """
+        with self.lock:
+            if self.prices is None:
+                return
+            if years is None:
+                self.stale[:] = True
+                return
+            for year in years:
+                index = year - self.first_year
+                if 0 <= index < self.years:
+                    self.stale[index] = True
+
+    def year_prices(self, year):
+        """
+        Return (base, adjusted) price arrays for the year, indexed by stock_id.
+        """
+        index = self.column(year)
+        if index is None:
+            empty = np.full(self.prices.shape[1], np.nan)
+            return empty, empty
+        return self.prices[0, :, index], self.prices[1, :, index]
+
+    def active_prices(self, year):
+        """
+        Adjusted prices where stored, otherwise base prices, indexed by stock_id.
+        """
+        base, adjusted = self.year_prices(year)
+        return np.where(np.isnan(adjusted), base, adjusted)
+
+    def stock_ids(self, year):
+        base, _ = self.year_prices(year)
+        return np.flatnonzero(~np.isnan(base))
+
+    def active_price(self, stock_id, year, default=None):
+        index = self.column(year)
+        if index is None or not 0 <= stock_id < self.prices.shape[1]:
+            return default
+        base, adjusted = self.prices[:, stock_id, index]
+        if np.isnan(base):
+            return default
+        return float(base if np.isnan(adjusted) else adjusted)
+
+    def base_prices(self, last_year=None):
+        """
+        Return every stock's base prices from first_year up to and including last_year,
+        indexed [stock_id, year - first_year], reloading any stale years first.
+        """
+        self.ensure()
+        end = self.years if last_year is None else max(0, min(self.years, last_year - self.first_year + 1))
+        for index in np.flatnonzero(self.stale[:end]):
+            self.reload(index)
+        return self.prices[0, :, :end]
+
+    def history(self, stock_id, last_year=None):
+        """
+        Return [(year, base price)] for the stock up to and including last_year.
+        """
+        self.ensure()
+        if not 0 <= stock_id < self.prices.shape[1]:
+            return []
+        prices = self.base_prices(last_year)[stock_id]
+        indexes = np.flatnonzero(~np.isnan(prices))
+        return list(zip((indexes + self.first_year).tolist(), prices[indexes].tolist()))
+
+    def set_adjusted(self, year, adjusted_prices):
+        """
+        Write {stock_id: adjusted price} for the year in place, after they have been committed.
+        """
+        if self.prices is None or not adjusted_prices:
+            return
+        index = self.column(year)
+        if index is None:
+            return
+        with self.lock:
+            stock_ids = np.fromiter(adjusted_prices.keys(), dtype=np.int64, count=len(adjusted_prices))
+            self.prices[1, stock_ids, index] = np.fromiter(adjusted_prices.values(), dtype=np.float64, count=len(adjusted_prices))
+            self.updates += 1
+
+    def top_movers(self, year, count=5):
+        """
+        Return the count biggest increases and decreases in active price against the previous year.
+        A stock with no previous price counts as rising from 0. Ties keep stock_id order.
+        """
+        stock_ids = self.stock_ids(year)
+        if not len(stock_ids):
+            return [], []
+        changes = self.active_prices(year)[stock_ids] - np.nan_to_num(self.active_prices(year - 1)[stock_ids])
+        order = np.argsort(-changes, kind='stable')
+
+        def movers(positions):
+            return [
+                {'stock_id': int(stock_ids[position]), 'name': self.names[stock_ids[position]], 'change': float(changes[position])}
+                for position in positions
+            ]
+        return movers(order[:count]), movers(order[-count:])
+
+    def sector_averages(self, year):
+        """
+        Mean active price per category for the year and the previous year, with the change between them.
+        """
+        averages = []
+        for year_prices in (self.active_prices(year), self.active_prices(year - 1)):
+            present = np.flatnonzero(~np.isnan(year_prices) & (self.category_codes >= 0))
+            codes = self.category_codes[present]
+            totals = np.bincount(codes, weights=year_prices[present], minlength=len(self.category_names))
+            counts = np.bincount(codes, minlength=len(self.category_names))
+            averages.append((totals, counts))
+
+        (totals, counts), (previous_totals, previous_counts) = averages
+        sectors = []
+        for code, category in enumerate(self.category_names):
+            if not counts[code]:
+                continue
+            average = totals[code] / counts[code]
+            previous = previous_totals[code] / previous_counts[code] if previous_counts[code] else None
+            sectors.append({
+                'category': category,
+                'stocks': int(counts[code]),
+                'average_price': round(float(average), 2),
+                'previous_average_price': round(float(previous), 2) if previous is not None else None,
+                'change': round(float(average - previous), 2) if previous is not None else None,
+                'percentage_change': round(float((average - previous) / previous * 100), 2) if previous else None
+            })
+        return sectors
+
+    def stats(self):
+        loaded = self.prices is not None
+        return {
+            'loaded': loaded,
+            'mapped': loaded and isinstance(self.prices, np.memmap),
+            'cache_path': self.cache_path,
+            'shape': list(self.prices.shape) if loaded else None,
+            'first_year': self.first_year,
+            'megabytes': round(self.prices.nbytes / 2 ** 20, 3) if loaded else None,
+            'stale_years': int(self.stale.sum()) if loaded else None,
+            'generation': self.generation,
+            'loads': self.loads,
+            'cache_loads': self.cache_loads,
+            'column_reloads': self.column_reloads,
+            'updates': self.updates,
+            'load_seconds': self.load_seconds
+        }
+
+
+price_matrix = PriceMatrix(PRICE_MATRIX_CACHE)
+
+
+# Stock history series
+# Charts read whole price histories, and past base prices never change during a year,
+# so each stock's history up to the current year is converted to a JSON-ready list
+# once and shared by every request until the year or the matrix changes.
+STOCK_HISTORY_MAX_IDS = 250
+
+
+class StockSeriesCache:
+    """
+    Base price lists for the years first_year..last_year, with None where a stock was
+    not listed, built per stock on first use.
+    """
+    def __init__(self, matrix):
+        self.matrix = matrix
+        self.lock = threading.Lock()
+        self.key = None
+        self.first_year = None
+        self.last_year = None
+        self.series = {}
+        self.builds = 0
+        self.hits = 0
+
+    def get(self, stock_ids, last_year):
+        """
+        Return (first_year, last_year, [price list per stock_id]) for stocks the matrix holds.
+        """
+        prices = self.matrix.base_prices(last_year)
+        with self.lock:
+            key = (self.matrix.generation, last_year)
+            if key != self.key:
+                self.key = key
+                self.first_year = self.matrix.first_year
+                self.last_year = self.first_year + prices.shape[1] - 1
+                self.series = {}
+            lists = []
+            for stock_id in stock_ids:
+                series = self.series.get(stock_id)
+                if series is None:
+                    series = [None if math.isnan(price) else price for price in prices[stock_id].tolist()]
+                    self.series[stock_id] = series
+                    self.builds += 1
+                else:
+                    self.hits += 1
+                lists.append(series)
+            return self.first_year, self.last_year, lists
+
+    def stats(self):
+        with self.lock:
+            return {'last_year': self.last_year, 'cached_stocks': len(self.series), 'builds': self.builds, 'hits': self.hits}
+
+
+stock_series_cache = StockSeriesCache(price_matrix)
+
+
+def downsample_indexes(count, points):
+    """
+    Indexes of at most points evenly spaced entries out of count, always keeping the last one.
+    """
+    if not points or count <= points:
+        return range(count), 1
+    step = math.ceil((count - 1) / (points - 1))
+    indexes = list(range(0, count - 1, step))
+    indexes.append(count - 1)
+    return indexes, step
+
+
+# Price snapshot cache
+# Stock prices only change when a year is ticked, set or repriced, so read paths share
+# one immutable snapshot per (game, year) instead of re-querying Stock on every request.
+StockPrice = namedtuple(
+    'StockPrice',
+    ['stock_id', 'name', 'category', 'price', 'adjusted_price', 'previous_price', 'previous_base_price']
+)
+
+
+class PriceSnapshot:
+    """
+    Immutable prices for every stock in one year, in stock_id order.
+    previous_price is the previous year's active price, previous_base_price its raw price.
+    version is unique to each snapshot built, so anything derived from one can be keyed on it.
+    """
+    def __init__(self, game_id, year, stocks):
+        self.game_id = game_id
+        self.year = year
+        self.version = next(price_snapshot_versions)
+        self.stocks = tuple(stocks)
+        self.by_id = MappingProxyType({stock.stock_id: stock for stock in self.stocks})
+
+    def __len__(self):
+        return len(self.stocks)
+
+    def get(self, stock_id):
+        return self.by_id.get(stock_id)
+
+    def active_price(self, stock_id, default=None):
+        stock = self.by_id.get(stock_id)
+        return get_active_price(stock) if stock else default
+
+    def previous_prices_by_name(self):
+        return {stock.name: stock.previous_price for stock in self.stocks if stock.previous_price is not None}
+
+
+price_snapshots = {}
+price_snapshot_versions = itertools.count(1)
+price_snapshot_lock = threading.Lock()
+price_snapshot_counters = {'hits': 0, 'misses': 0, 'invalidations': 0}
+price_snapshot_game_id = None
+
+
+def build_price_snapshot(game_id, year):
+    stock_ids = price_matrix.stock_ids(year)
+    base, adjusted = (prices.tolist() for prices in price_matrix.year_prices(year))
+    previous_base = price_matrix.year_prices(year - 1)[0].tolist()
+    previous_active = price_matrix.active_prices(year - 1).tolist()
+
+    stocks = []
+    for stock_id in stock_ids.tolist():
+        stocks.append(StockPrice(
+            stock_id=stock_id,
+            name=price_matrix.names[stock_id],
+            category=price_matrix.categories[stock_id],
+            price=base[stock_id],
+            adjusted_price=none_if_nan(adjusted[stock_id]),
+            previous_price=none_if_nan(previous_active[stock_id]),
+            previous_base_price=none_if_nan(previous_base[stock_id])
+        ))
+    return PriceSnapshot(game_id, year, stocks)
+
+
+def none_if_nan(value):
+    return None if math.isnan(value) else value
+
+
+def get_price_snapshot(year):
+    """
+    Return the cached price snapshot for the year, building it on a miss.
+    """
+    global price_snapshot_game_id
+
+    if price_snapshot_game_id is None:
+        game = db.session.query(Game).first()
+        price_snapshot_game_id = game.game_id if game else 0
+
+    key = (price_snapshot_game_id, year)
+    snapshot = price_snapshots.get(key)
+    if snapshot is not None:
+        price_snapshot_counters['hits'] += 1
+        return snapshot
+
+    with price_snapshot_lock:
+        snapshot = price_snapshots.get(key)
+        if snapshot is None:
+            price_snapshot_counters['misses'] += 1
+            snapshot = build_price_snapshot(*key)
+            price_snapshots[key] = snapshot
+        else:
+            price_snapshot_counters['hits'] += 1
+    return snapshot
+
+
+def invalidate_price_snapshots(year=None):
+    """
+    Drop cached snapshots. With a year, only that year and the following one
+    (whose previous prices depend on it) are dropped.
+    """
+    global price_snapshot_game_id
+
+    with price_snapshot_lock:
+        if year is None:
+            price_snapshots.clear()
+            price_snapshot_game_id = None
+        else:
+            for key in [key for key in price_snapshots if key[1] in (year, year + 1)]:
+                del price_snapshots[key]
+        price_snapshot_counters['invalidations'] += 1
+
+
+def price_snapshot_stats():
+    lookups = price_snapshot_counters['hits'] + price_snapshot_counters['misses']
+    return {
+        **price_snapshot_counters,
+        'hit_rate': round(price_snapshot_counters['hits'] / lookups, 4) if lookups else None,
+        'cached_years': sorted(key[1] for key in price_snapshots)
+    }
+
+
+
+# Server-sent events
+# update_year publishes once per tick and every /api/stream connection receives it, so
+# clients no longer need to poll. Each connection only holds a small queue and a thread
+# blocked on it, which is why the Procfile runs gunicorn with gthread workers. Every
+# open stream ties up one of the worker's threads, so streams are capped below the
+# thread count and the remaining threads stay free for ordinary requests.
+STREAM_HEARTBEAT_SECONDS = 15
+STREAM_QUEUE_SIZE = 32
+STREAM_MAX_CONNECTIONS = int(os.getenv('STREAM_MAX_CONNECTIONS', 448))
+
+
+class StreamBroker:
+    """
+    Fans published events out to subscribers. Events published with a player_id
+    only go to that player's connections; everything else goes to every connection.
+    """
+    def __init__(self, queue_size=STREAM_QUEUE_SIZE, max_connections=STREAM_MAX_CONNECTIONS):
+        self.queue_size = queue_size
+        self.max_connections = max_connections
+        self.lock = threading.Lock()
+        self.subscribers = {}
+        self.event_id = 0
+        self.published = 0
+        self.dropped = 0
+        self.refused = 0
+
+    def subscribe(self, player_id=None):
+        """
+        Return a new subscriber queue, or None when max_connections are already open.
+        """
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self.lock:
+            if len(self.subscribers) >= self.max_connections:
+                self.refused += 1
+                return None
+            self.subscribers[subscriber] = player_id
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.pop(subscriber, None)
+
+    def connected_player_ids(self):
+        with self.lock:
+            return {player_id for player_id in self.subscribers.values() if player_id is not None}
+
+    def publish(self, event, data, player_id=None):
+        with self.lock:
+            self.event_id += 1
+            message = f"id: {self.event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+            targets = [
+                subscriber for subscriber, subscriber_player_id in self.subscribers.items()
+                if player_id is None or subscriber_player_id == player_id
+            ]
+            self.published += 1
+
+        for subscriber in targets:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                # A slow client loses its oldest event rather than blocking the tick
+                try:
+                    subscriber.get_nowait()
+                except queue.Empty:
+                    pass
+                subscriber.put_nowait(message)
+                self.dropped += 1
+        return len(targets)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'connections': len(self.subscribers),
+                'max_connections': self.max_connections,
+                'refused': self.refused,
+                'player_connections': sum(1 for player_id in self.subscribers.values() if player_id is not None),
+                'published': self.published,
+                'dropped': self.dropped
+            }
+
+
+stream_broker = StreamBroker()
+
+
+def get_top_movers(snapshot, count=5):
+    """
+    Return the biggest increases and decreases against the previous year.
+    """
+    return price_matrix.top_movers(snapshot.year, count)
+
+
+def publish_tick(year):
+    """
+    Push the new year, prices, top movers and leaderboard to every stream,
+    plus each connected player's own standing on their channel.
+    """
+    snapshot = get_price_snapshot(year)
+    top_increases, top_decreases = get_top_movers(snapshot)
+    player_table = generate_player_table(year)
+    # Render the new year's board now rather than in the first request to ask for it
+    get_market_board(year)
+
+    stream_broker.publish('tick', {
+        'current_year': year,
+        'game_running': game_running,
+        'prices': [
+            {'stock_id': stock.stock_id, 'price': get_active_price(stock), 'previousPrice': stock.previous_price}
+            for stock in snapshot.stocks
+        ],
+        'top_increases': top_increases,
+        'top_decreases': top_decreases,
+        'player_table': player_table[:5],
+        'published_at': time.time()
+    })
+
+    connected_players = stream_broker.connected_player_ids()
+    for rank, row in enumerate(player_table, start=1):
+        if row['player_id'] in connected_players:
+            stream_broker.publish('player', {**row, 'rank': rank, 'current_year': year}, player_id=row['player_id'])
+
+
+
+# Watch-list alerts
+# Evaluated once per tick by the tick leader against the new year's raw prices, using the
+# same rules the client Ticker applies: a birth is a price of 8 after 0, a value alert
+# fires when the price reaches the threshold. Thresholds are kept sorted per stock, so a
+# tick only visits the entries whose threshold was crossed. Fired alerts are stored in
+# player_alert, whose ids are the /api/alerts cursor on every worker. Each worker pushes
+# the stored alerts it has not sent yet to the players streaming from it.
+ALERT_QUEUE_SIZE = 100
+
+
+class WatchListAlertIndex:
+    """
+    Watch-list rows indexed by stock id: birth watchers, and (threshold, player_id)
+    pairs sorted by threshold.
+    """
+    def __init__(self, rows):
+        self.birth_watchers = defaultdict(list)
+        self.thresholds = defaultdict(list)
+        for row in rows:
+            if row.birth_alert:
+                self.birth_watchers[row.stock_id].append(row.player_id)
+            if row.value_alert_enabled and row.value_alert is not None:
+                self.thresholds[row.stock_id].append((row.value_alert, row.player_id))
+        for entries in self.thresholds.values():
+            entries.sort()
+        self.threshold_values = {
+            stock_id: [threshold for threshold, _ in entries] for stock_id, entries in self.thresholds.items()
+        }
+        self.stock_ids = set(self.birth_watchers) | set(self.thresholds)
+
+    def triggered(self, stock_id, previous_price, price):
+        """
+        Yield (player_id, alert_type, threshold) for every alert fired by the move.
+        """
+        if price == 8 and previous_price == 0:
+            for player_id in self.birth_watchers.get(stock_id, ()):
+                yield player_id, 'birth', None
+
+        values = self.threshold_values.get(stock_id)
+        if values and price > previous_price:
+            start = bisect_right(values, previous_price)
+            end = bisect_right(values, price)
+            for threshold, player_id in self.thresholds[stock_id][start:end]:
+                yield player_id, 'value', threshold
+
+
+stream_alert_cursor = None  # id of the last stored alert this worker's streams were sent
+stream_alert_lock = threading.Lock()
+
+
+def build_alert(player_id, year, stock, alert_type, threshold=None):
+    if alert_type == 'birth':
+        message = f"Birth! {stock.name} has been born and is now available to buy"
+    else:
+        message = f"Alert! {stock.name} is valued at or above {threshold:g}!"
+    return PlayerAlert(player_id=player_id, stock_id=stock.stock_id, year=year, alert_type=alert_type,
+                       threshold=threshold, message=message)
+
+
+def evaluate_watch_list_alerts(year):
+    """
+    Store every watch-list alert triggered by the move into the given year. Watch lists
+    are edited on every worker, so each tick reads them from the table, but only the
+    rows of the stocks that rose: their value alerts within the year's price range and
+    the birth alerts of stocks born this year. The index then picks the alerts fired.
+    """
+    snapshot = get_price_snapshot(year)
+    rising = [stock for stock in snapshot.stocks if stock.price > (stock.previous_base_price or 0)]
+    if not rising:
+        return 0
+    born = [stock.stock_id for stock in rising if stock.price == 8 and not stock.previous_base_price]
+    rows = db.session.query(WatchList).filter(
+        WatchList.stock_id.in_([stock.stock_id for stock in rising]),
+        (WatchList.value_alert_enabled.is_(True)
+         & (WatchList.value_alert > min(stock.previous_base_price or 0 for stock in rising))
+         & (WatchList.value_alert <= max(stock.price for stock in rising)))
+        | (WatchList.birth_alert.is_(True) & WatchList.stock_id.in_(born))
+    )
+    index = WatchListAlertIndex(rows)
+    alerts = []
+
+    for stock_id in index.stock_ids:
+        stock = snapshot.get(stock_id)
+        if not stock:
+            continue
+        for player_id, alert_type, threshold in index.triggered(stock_id, stock.previous_base_price or 0, stock.price):
+            alerts.append(build_alert(player_id, year, stock, alert_type, threshold))
+
+    if alerts:
+        db.session.add_all(alerts)
+        db.session.commit()
+    return len(alerts)
+
+
+def publish_alerts():
+    """
+    Push the alerts stored since the last call to the players streaming from this worker.
+    The first call only records where to start from.
+    """
+    global stream_alert_cursor
+
+    with stream_alert_lock:
+        latest = db.session.query(db.func.max(PlayerAlert.alert_id)).scalar() or 0
+        previous, stream_alert_cursor = stream_alert_cursor, latest
+        players = stream_broker.connected_player_ids()
+        if previous is None or latest <= previous or not players:
+            return 0
+        alerts = (
+            db.session.query(PlayerAlert)
+            .filter(PlayerAlert.alert_id > previous, PlayerAlert.alert_id <= latest,
+                    PlayerAlert.player_id.in_(players))
+            .order_by(PlayerAlert.alert_id)
+            .all()
+        )
+        for alert in alerts:
+            stream_broker.publish('alert', alert.to_dict(), player_id=alert.player_id)
+    return len(alerts)
+
+
+def clear_alerts():
+    """
+    Forget which alerts this worker's streams were sent, e.g. after the database was replaced.
+    """
+    global stream_alert_cursor
+    with stream_alert_lock:
+        stream_alert_cursor = None
+
+
+
+def error_response(message, status_code=400):
+    return jsonify({'status': 'failure', 'message': message}), status_code
+
+BOARD_COLUMNS = [25, 25, 25, 25, 25, 30, 15, 20]
+BOARD_TITLES = ["Film & Television", "Business", "Science", "Literature", "Music", "Politics", "Jewish Authorities", "Sport"]
+EMPTY_BOARD_CELLS = '<td style="border: none;"></td><td style="border: none;"></td><td style="border: none;"></td>'
+
+
+def generate_stocks_display(stocks, previous_year_stocks, current_year):
+    """
+    Generate HTML for displaying stock data with adjusted prices.
+    Requests should use get_market_board, which renders this once per price snapshot.
+    """
+    stock_slices = []
+    start = 0
+    for count in BOARD_COLUMNS:
+        if start < len(stocks):
+            stock_slices.append(stocks[start:start + count])
+            start += count
+
+    # Top four categories, then the bottom four
+    return (
+        render_board_table('topStocksDisplay', '', BOARD_TITLES[:4], stock_slices[:4], max(BOARD_COLUMNS[:4]), previous_year_stocks)
+        + render_board_table('bottomStocksDisplay', ' margin-top: 20px;', BOARD_TITLES[4:], stock_slices[4:], max(BOARD_COLUMNS[4:]), previous_year_stocks)
+    )
+
+
+def render_board_table(table_id, extra_style, titles, stock_slices, max_rows, previous_year_stocks):
+    parts = [f'<table id="{table_id}" style="width: 100%; border-collapse: collapse;{extra_style}"><thead><tr>']
+    for title in titles:
+        parts.append(f'<th colspan="3" class="category-title" style="text-align: center;">{title}</th>')
+    parts.append('</tr><tr>')
+    parts.extend('<th class="label">Stock</th><th class="label">Price</th><th class="label">Change</th>' for _ in titles)
+    parts.append('</tr></thead><tbody>')
+
+    for row in range(max_rows):
+        parts.append('<tr>')
+        for col in range(len(titles)):
+            if row >= len(stock_slices[col]):
+                parts.append(EMPTY_BOARD_CELLS)
+                continue
+            stock = stock_slices[col][row]
+            adjusted_price = get_active_price(stock)
+            prev_price = previous_year_stocks.get(stock.name, adjusted_price)
+            change = adjusted_price - prev_price
+            percentage_change = (change / prev_price) * 100 if prev_price != 0 else 0
+            color = 'green' if change > 0 else 'red' if change < 0 else 'black'
+
+            if adjusted_price > 0:
+                stock_style, end_stock_style = '<strong>', '</strong>'
+                change_display = f'{change:+.0f} ({percentage_change:.1f}%)'
+            else:
+                stock_style, end_stock_style = '<i class="unavailable">', '</i>'
+                change_display = '<i class="unavailable">N/A</i>'
+
+            parts.append(f'<td style="border: none;">{stock_style}{stock.name}{end_stock_style}</td>')
+            parts.append(f'<td style="border: none;">{stock_style}£{int(adjusted_price)}{end_stock_style}</td>')
+            parts.append(f'<td style="color: {color}; border: none;">{change_display}</td>')
+        parts.append('</tr>')
+    parts.append('</tbody></table>')
+    return ''.join(parts)
+
+
+def get_previous_year_stocks(year):
+    """
+    Fetch the stocks from the previous year as a dictionary of stock name to price.
+    """
+    return get_price_snapshot(year).previous_prices_by_name()
+
+
+# Market board
+# The stocks board on the admin pages and the /api/stocks_data payload depend only on a
+# year's prices, so both are rendered once per price snapshot, i.e. once per tick, set
+# year or repricing, and kept with a strong ETag and a precomputed gzip body each.
+NO_STOCKS_HTML = "<p>No stocks available for the current year.</p>"
+EncodedBody = namedtuple('EncodedBody', ['body', 'gzipped', 'etag'])
+
+
+def encode_body(text):
+    body = text.encode('utf-8')
+    # mtime=0 keeps the gzip bytes identical across workers and restarts
+    return EncodedBody(body, gzip.compress(body, compresslevel=6, mtime=0), hashlib.sha1(body).hexdigest())
+
+
+class MarketBoard:
+    def __init__(self, snapshot):
+        previous_year_stocks = snapshot.previous_prices_by_name()
+        self.game_id = snapshot.game_id
+        self.year = snapshot.year
+        self.version = snapshot.version
+        self.html = generate_stocks_display(snapshot.stocks, previous_year_stocks, snapshot.year) if snapshot.stocks else NO_STOCKS_HTML
+        self.data = generate_stocks_display_data(snapshot.stocks, previous_year_stocks, snapshot.year)
+        self.html_body = encode_body(self.html)
+        # Byte for byte what jsonify would send
+        self.data_body = encode_body(app.json.dumps(self.data, separators=(',', ':')) + '\n')
+
+
+market_boards = {}
+market_board_lock = threading.Lock()
+market_board_counters = {'hits': 0, 'renders': 0, 'render_ms': 0.0}
+
+
+def get_market_board(year):
+    """
+    Return the year's market board, rendering it if its prices have changed since the last one.
+    """
+    snapshot = get_price_snapshot(year)
+    key = (snapshot.game_id, year)
+    board = market_boards.get(key)
+    if board is not None and board.version == snapshot.version:
+        market_board_counters['hits'] += 1
+        return board
+
+    with market_board_lock:
+        board = market_boards.get(key)
+        if board is None or board.version != snapshot.version:
+            started = time.perf_counter()
+            board = MarketBoard(snapshot)
+            # Boards for snapshots that have since been dropped are not worth keeping
+            for stale_key in [stale_key for stale_key in market_boards if stale_key[1] not in (year - 1, year, year + 1)]:
+                del market_boards[stale_key]
+            market_boards[key] = board
+            market_board_counters['renders'] += 1
+            market_board_counters['render_ms'] += (time.perf_counter() - started) * 1000
+        else:
+            market_board_counters['hits'] += 1
+    return board
+
+
+def encoded_response(encoded, mimetype):
+    """
+    Serve a precomputed body with its strong ETag, gzipped when the client accepts it.
+    The gzipped body is a different representation, so it gets its own ETag.
+    """
+    if request.accept_encodings['gzip'] > 0:
+        response = Response(encoded.gzipped, mimetype=mimetype)
+        response.headers['Content-Encoding'] = 'gzip'
+        response.set_etag(f'{encoded.etag}-gz')
+    else:
+        response = Response(encoded.body, mimetype=mimetype)
+        response.set_etag(encoded.etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+def market_board_stats():
+    renders = market_board_counters['renders']
+    return {
+        **market_board_counters,
+        'render_ms': round(market_board_counters['render_ms'], 3),
+        'mean_render_ms': round(market_board_counters['render_ms'] / renders, 3) if renders else None,
+        'cached_years': sorted(key[1] for key in market_boards)
+    }
+
+
+# Conditional reads
+# Most read endpoints return the same body for a whole year, while clients poll them
+# every few seconds. Each one declares what its body depends on, and conditional_read
+# turns that into an ETag from in-memory versions alone: a matching If-None-Match gets
+# a 304 before the handler runs or the database is touched. Prices and the leaderboard
+# only change with game.state_version, which every tick, trade and new team bumps, so
+# ETags covering them use the version this worker's caches were last brought up to.
+# Workers at the same version serve the same body, so any of them may confirm an ETag
+# another one issued. Bodies that only change when the year does may be cached by the
+# client until the next tick is due.
+READ_SCOPES = ('year', 'prices', 'trades')
+read_validator_epoch = {'pid': None, 'epoch': None}
+year_clock = {'year': None, 'seen_at': None}
+conditional_read_counters = Counter()
+
+
+def validator_epoch():
+    """
+    A token unique to this process, regenerated after a fork. Only used when game state
+    sync is off, as the state version then restarts with the process.
+    """
+    if read_validator_epoch['pid'] != os.getpid():
+        read_validator_epoch.update(pid=os.getpid(), epoch=secrets.token_hex(4))
+    return read_validator_epoch['epoch']
+
+
+def read_versions(scopes):
+    versions = []
+    if 'year' in scopes:
+        versions += [current_year, game_running]
+    if 'prices' in scopes or 'trades' in scopes:
+        versions.append(game_state.read_version)
+        if not game_state.enabled:
+            versions.append(validator_epoch())
+    return versions
+
+
+def read_etag(scopes, gzipped=False):
+    key = repr((request.path, request.query_string, read_versions(scopes)))
+    etag = hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+    return f'{etag}-gz' if gzipped else etag
+
+
+def seconds_to_next_tick():
+    """
+    How long until the current year is due to end, or None while the game is stopped.
+    The worker running ticks knows its deadline; the others count the year's interval
+    from when they first saw it.
+    """
+    if not game_running:
+        return None
+    scheduled = tick_scheduler.stats()['seconds_to_next_tick']
+    if scheduled is not None:
+        return scheduled
+    if year_clock['year'] != current_year:
+        year_clock.update(year=current_year, seen_at=time.monotonic())
+    return max(0.0, time_intervals.get(current_year, 60) - (time.monotonic() - year_clock['seen_at']))
+
+
+def conditional_read(*scopes, until_tick=False, negotiates_gzip=False):
+    """
+    Answer If-None-Match for a read endpoint whose body depends only on the request's
+    path and query string and the given scopes. until_tick lets clients reuse the
+    body until the next tick; without it they revalidate on every poll.
+    negotiates_gzip marks handlers whose body is gzipped for clients that accept it.
+    """
+    unknown = set(scopes) - set(READ_SCOPES)
+    if unknown:
+        raise ValueError(f"Unknown read scopes: {sorted(unknown)}")
+
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            gzipped = negotiates_gzip and request.accept_encodings['gzip'] > 0
+            if read_etag(scopes, gzipped) in request.if_none_match:
+                conditional_read_counters['not_modified'] += 1
+                response = Response(status=304)
+            else:
+                conditional_read_counters['full'] += 1
+                response = app.make_response(f(*args, **kwargs))
+                if response.status_code not in (200, 304):
+                    return response
+            # The handler may have moved a version on its way, e.g. building the leaderboard
+            response.set_etag(read_etag(scopes, gzipped))
+            if negotiates_gzip:
+                response.headers['Vary'] = 'Accept-Encoding'
+            max_age = int(seconds_to_next_tick() or 0) if until_tick else 0
+            response.headers['Cache-Control'] = f'max-age={max_age}' if max_age else 'no-cache'
+            return response
+        return decorated
+    return decorator
+
+
+def conditional_read_stats():
+    requests = conditional_read_counters['full'] + conditional_read_counters['not_modified']
+    return {
+        'full': conditional_read_counters['full'],
+        'not_modified': conditional_read_counters['not_modified'],
+        'not_modified_rate': round(conditional_read_counters['not_modified'] / requests, 4) if requests else None,
+        'state_version': game_state.read_version
+    }
+
+
+# Portfolio valuation
+# Values any set of players' holdings at a year with a single query: either Portfolio
+# joined to that year's Stock rows, or Portfolio alone priced from the price snapshot.
+HoldingValuation = namedtuple(
+    'HoldingValuation',
+    ['portfolio_id', 'stock_id', 'name', 'category', 'quantity', 'purchase_price', 'year_purchased', 'price', 'current_value']
+)
+PortfolioValuation = namedtuple('PortfolioValuation', ['player_id', 'holdings', 'total_value', 'stocks_owned'])
+
+
+def value_portfolios(player_ids, year, use_snapshot=True):
+    """
+    Return {player_id: PortfolioValuation} for the given players (all players if None).
+    Holdings without a stock row for the year have price None and are not counted.
+    """
+    if use_snapshot:
+        snapshot = get_price_snapshot(year)
+        query = db.session.query(
+            Portfolio.portfolio_id, Portfolio.player_id, Portfolio.stock_id, Portfolio.quantity,
+            Portfolio.purchase_price, Portfolio.year_purchased
+        )
+    else:
+        query = db.session.query(
+            Portfolio.portfolio_id, Portfolio.player_id, Portfolio.stock_id, Portfolio.quantity,
+            Portfolio.purchase_price, Portfolio.year_purchased,
+            StockMaster.name, StockMaster.category, Stock.price, Stock.adjusted_price
+        ).outerjoin(Stock, db.and_(Stock.stock_id == Portfolio.stock_id, Stock.year == year)
+        ).outerjoin(StockMaster, StockMaster.stock_id == Stock.stock_id)
+
+    if player_ids is not None:
+        query = query.filter(Portfolio.player_id.in_(player_ids))
+
+    holdings = defaultdict(list)
+    for row in query.order_by(Portfolio.portfolio_id):
+        if use_snapshot:
+            stock = snapshot.get(row.stock_id)
+        else:
+            stock = row if row.price is not None else None
+        price = get_active_price(stock) if stock else None
+        holdings[row.player_id].append(HoldingValuation(
+            portfolio_id=row.portfolio_id,
+            stock_id=row.stock_id,
+            name=stock.name if stock else None,
+            category=stock.category if stock else None,
+            quantity=row.quantity,
+            purchase_price=row.purchase_price,
+            year_purchased=row.year_purchased,
+            price=price,
+            current_value=row.quantity * price if price is not None else 0
+        ))
+
+    valuations = {}
+    for player_id in (player_ids if player_ids is not None else holdings.keys()):
+        items = holdings.get(player_id, [])
+        valuations[player_id] = PortfolioValuation(
+            player_id=player_id,
+            holdings=items,
+            total_value=round(sum(item.current_value for item in items), 2),
+            stocks_owned=sum(item.quantity for item in items if item.price is not None)
+        )
+    return valuations
+
+
+# Leaderboard
+# Net worth per player is kept in a list sorted by (-total value, player_id), so top-N is a
+# slice and a player's rank is a bisect. It is refreshed for the trading player when a trade
+# commits and rebuilt in one pass when a tick reprices every holding.
+class Leaderboard:
+    """
+    Player net worths for one year, ordered for ranking.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.year = None
+        self.entries = {}
+        self.ordered = []
+
+    def clear(self, year=None):
+        with self.lock:
+            self.year = year
+            self.entries = {}
+            self.ordered = []
+
+    def update(self, player_id, name, total_value):
+        total_value = round(total_value, 1)
+        with self.lock:
+            self._remove(player_id)
+            self.entries[player_id] = (name, total_value)
+            insort(self.ordered, (-total_value, player_id))
+
+    def remove(self, player_id):
+        with self.lock:
+            self._remove(player_id)
+
+    def _remove(self, player_id):
+        entry = self.entries.pop(player_id, None)
+        if entry:
+            key = (-entry[1], player_id)
+            del self.ordered[bisect_left(self.ordered, key)]
+
+    def row(self, player_id):
+        name, total_value = self.entries[player_id]
+        return {'player_id': player_id, 'name': name, 'total_value': total_value}
+
+    def top(self, count=None):
+        with self.lock:
+            keys = self.ordered if count is None else self.ordered[:count]
+            return [self.row(player_id) for _, player_id in keys]
+
+    def rank(self, player_id):
+        with self.lock:
+            entry = self.entries.get(player_id)
+            if not entry:
+                return None
+            return bisect_left(self.ordered, (-entry[1], player_id)) + 1
+
+    def __len__(self):
+        return len(self.entries)
+
+
+player_leaderboard = Leaderboard()
+
+
+def calculate_net_worths(year, player_ids=None):
+    """
+    Return {player_id: (name, balance + holdings valued at the year's prices)}
+    using one query for players and one for their holdings.
+    """
+    players = db.session.query(Player.player_id, Player.name, Player.balance)
+    if player_ids is not None:
+        players = players.filter(Player.player_id.in_(player_ids))
+
+    valuations = value_portfolios(player_ids, year)
+    return {
+        player.player_id: (
+            player.name,
+            (player.balance or 0) + (valuations[player.player_id].total_value if player.player_id in valuations else 0)
+        )
+        for player in players
+    }
+
+
+def rebuild_leaderboard(year):
+    net_worths = calculate_net_worths(year)
+    player_leaderboard.clear(year)
+    for player_id, (name, total_value) in net_worths.items():
+        player_leaderboard.update(player_id, name, total_value)
+    return player_leaderboard
+
+
+def refresh_leaderboard_players(player_ids, year):
+    """
+    Re-value just these players after their holdings or balance changed.
+    """
+    if player_leaderboard.year != year:
+        rebuild_leaderboard(year)
+        return
+    net_worths = calculate_net_worths(year, player_ids)
+    for player_id in player_ids:
+        if player_id in net_worths:
+            player_leaderboard.update(player_id, *net_worths[player_id])
+        else:
+            player_leaderboard.remove(player_id)
+
+
+def refresh_leaderboard_holders(stock_id, year):
+    """
+    Re-value everyone holding a stock whose price changed during the year.
+    """
+    if player_leaderboard.year == year:
+        holders = [row.player_id for row in db.session.query(Portfolio.player_id).filter_by(stock_id=stock_id).distinct()]
+        if holders:
+            refresh_leaderboard_players(holders, year)
+
+
+def get_leaderboard(year):
+    if player_leaderboard.year != year:
+        rebuild_leaderboard(year)
+    return player_leaderboard
+
+
+def generate_player_table(current_year):
+    """
+    Generate a table of players with their total portfolio value for the given year.
+    """
+    try:
+        return get_leaderboard(current_year).top()
+    except Exception as e:
+        print(f"Error generating player table: {e}")
+        return []
+
+
+def compute_player_table(current_year):
+    """
+    Recompute the player table from scratch, one player at a time.
+    Used to check the maintained leaderboard.
+    """
+    players = db.session.query(Player).all()
+    player_table = []
+
+    for player in players:
+        # Calculate portfolio value for the current year
+        portfolio_value = calculate_portfolio_value(player.player_id, current_year)
+        total_value = (player.balance or 0) + (portfolio_value or 0)
+
+        player_table.append({
+            'player_id': player.player_id,
+            'name': player.name,
+            'total_value': round(total_value, 1),
+        })
+
+    # Sort players by total value in descending order
+    return sorted(player_table, key=lambda x: x['total_value'], reverse=True)
+
+
+def check_leaderboard(year):
+    """
+    Compare the maintained leaderboard with a full recomputation and return the differences.
+    """
+    expected = compute_player_table(year)
+    actual = get_leaderboard(year).top()
+    mismatches = [
+        {'rank': rank, 'expected': expected_row, 'actual': actual_row}
+        for rank, (expected_row, actual_row) in enumerate(zip(expected, actual), start=1)
+        if expected_row != actual_row
+    ]
+    if len(expected) != len(actual):
+        mismatches.append({'rank': None, 'expected': len(expected), 'actual': len(actual)})
+    return mismatches
+
+
+def calculate_portfolio_value(player_id, current_year):
+    return value_portfolios([player_id], current_year)[player_id].total_value
+
+
+
+
+def generate_stocks_display_data(stocks, previous_year_stocks, current_year):
     """
     Generate structured data for stocks with adjusted prices.
+    Requests should use get_market_board, which builds this once per price snapshot.
     """
-    columns = [25, 25, 25, 25, 25, 30, 15, 20]
     stock_slices = []
     start = 0
 
-    for count in columns:
+    for count in BOARD_COLUMNS:
         if start < len(stocks):
             stock_slices.append(stocks[start:start + count])
             start += count
 
-    column_titles = ["Film & Television", "Business", "Science", "Literature", "Music", "Politics", "Jewish Authorities", "Sport"]
+    column_titles = BOARD_TITLES
 
     top_categories = column_titles[:4]
     top_stock_slices = stock_slices[:4]
     bottom_categories = column_titles[4:]
     bottom_stock_slices = stock_slices[4:]
 
-    def process_stock_slices(stock_slices, categories):
-        category_data = []
-        for category, stocks in zip(categories, stock_slices):
-            stocks_data = []
-            for stock in stocks:
-                adjusted_price = get_active_price(stock)
-                prev_price = previous_year_stocks.get(stock.name, adjusted_price)
-                change = adjusted_price - prev_price
-                percentage_change = (change / prev_price) * 100 if prev_price != 0 else 0
-                stocks_data.append({
-                    'stock_id': stock.stock_id,
-                    'name': stock.name,
-                    'price': adjusted_price,
-                    'category': stock.category,
-                    'previousPrice': prev_price,
-                    'change': change,
-                    'percentageChange': percentage_change
-                })
-            category_data.append({
-                'category': category,
-                'stocks': stocks_data
-            })
-        return category_data
+    def process_stock_slices(stock_slices, categories):
+        category_data = []
+        for category, stocks in zip(categories, stock_slices):
+            stocks_data = []
+            for stock in stocks:
+                adjusted_price = get_active_price(stock)
+                prev_price = previous_year_stocks.get(stock.name, adjusted_price)
+                change = adjusted_price - prev_price
+                percentage_change = (change / prev_price) * 100 if prev_price != 0 else 0
+                stocks_data.append({
+                    'stock_id': stock.stock_id,
+                    'name': stock.name,
+                    'price': adjusted_price,
+                    'category': stock.category,
+                    'previousPrice': prev_price,
+                    'change': change,
+                    'percentageChange': percentage_change
+                })
+            category_data.append({
+                'category': category,
+                'stocks': stocks_data
+            })
+        return category_data
+
+    top_data = process_stock_slices(top_stock_slices, top_categories)
+    bottom_data = process_stock_slices(bottom_stock_slices, bottom_categories)
+
+    return {
+        'topCategories': [data['category'] for data in top_data],
+        'topStockSlices': [data['stocks'] for data in top_data],
+        'bottomCategories': [data['category'] for data in bottom_data],
+        'bottomStockSlices': [data['stocks'] for data in bottom_data]
+    }
+
+
+# Request metrics
+# Every SQL statement is counted and timed through SQLAlchemy engine events, against each
+# query scope open on the thread that ran it: the current request, or anything wrapped in
+# query_tracker.track(). Statements are grouped by shape (their SQL with lists of bound
+# parameters collapsed), and a request that runs one shape N_PLUS_ONE_THRESHOLD times or
+# more is flagged as a suspected N+1. Each endpoint keeps its last REQUEST_METRICS_WINDOW
+# requests for latency percentiles and a histogram, served at /admin/metrics.
+REQUEST_METRICS_ENABLED = os.getenv('REQUEST_METRICS', 'True') == 'True'
+REQUEST_METRICS_WINDOW = int(os.getenv('REQUEST_METRICS_WINDOW', 500))
+N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', 5))
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+PARAMETER_LIST = re.compile(r"(\?|%s|%\(\w+\)s|:\w+)(\s*,\s*(\?|%s|%\(\w+\)s|:\w+))+")
+ROW_LIST = re.compile(r"(\([^()]*\))(\s*,\s*\1)+")
+
+
+@lru_cache(maxsize=2048)
+def statement_shape(statement):
+    shape = PARAMETER_LIST.sub(r"\1, ...", " ".join(statement.split()))
+    return ROW_LIST.sub(r"\1, ...", shape)
+
+
+class QueryScope:
+    """
+    The statements run while the scope was open: how many, how long they took, the
+    rows written and how often each shape ran.
+    """
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.shapes = Counter()
+
+    def repeated(self, threshold=N_PLUS_ONE_THRESHOLD):
+        return {shape: count for shape, count in self.shapes.items() if count >= threshold}
+
+
+class QueryTracker:
+    """
+    Feeds every statement to the query scopes open on the thread that runs it.
+    """
+    def __init__(self):
+        self.local = threading.local()
+        event.listen(Engine, 'before_cursor_execute', self.before_execute)
+        event.listen(Engine, 'after_cursor_execute', self.after_execute)
+
+    def open(self):
+        scope = QueryScope()
+        self.local.__dict__.setdefault('scopes', []).append(scope)
+        return scope
+
+    def close(self, scope):
+        scopes = getattr(self.local, 'scopes', [])
+        if scope in scopes:
+            scopes.remove(scope)
+
+    @contextmanager
+    def track(self):
+        scope = self.open()
+        try:
+            yield scope
+        finally:
+            self.close(scope)
+
+    def before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if getattr(self.local, 'scopes', None):
+            context._query_started = time.perf_counter()
+
+    def after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        scopes = getattr(self.local, 'scopes', None)
+        if not scopes:
+            return
+        seconds = time.perf_counter() - getattr(context, '_query_started', time.perf_counter())
+        shape = statement_shape(statement)
+        rows = cursor.rowcount if not statement.lstrip().upper().startswith('SELECT') and cursor.rowcount > 0 else 0
+        for scope in scopes:
+            scope.count += 1
+            scope.seconds += seconds
+            scope.rows += rows
+            scope.shapes[shape] += 1
+
+
+query_tracker = QueryTracker()
+
+
+class EndpointMetrics:
+    """
+    Totals for one endpoint plus its most recent requests.
+    """
+    def __init__(self, window):
+        self.recent = deque(maxlen=window)  # (seconds, queries, db seconds)
+        self.requests = 0
+        self.errors = 0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.n_plus_one = {}  # shape -> [requests flagged, most repeats in one request]
+
+    def record(self, seconds, status, scope):
+        self.requests += 1
+        self.errors += status >= 500
+        self.queries += scope.count
+        self.db_seconds += scope.seconds
+        self.recent.append((seconds, scope.count, scope.seconds))
+        for shape, count in scope.repeated().items():
+            flagged = self.n_plus_one.setdefault(shape, [0, 0])
+            flagged[0] += 1
+            flagged[1] = max(flagged[1], count)
+
+    def summary(self):
+        latencies = sorted(seconds * 1000 for seconds, _, _ in self.recent)
+        queries = [count for _, count, _ in self.recent]
+        histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        for ms in latencies:
+            histogram[bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+
+        def percentile(fraction):
+            return round(latencies[min(len(latencies) - 1, int(fraction * len(latencies)))], 2) if latencies else None
+
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'queries': self.queries,
+            'db_ms': round(self.db_seconds * 1000, 2),
+            'window': len(latencies),
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95),
+            'p99_ms': percentile(0.99),
+            'max_ms': round(latencies[-1], 2) if latencies else None,
+            'mean_queries': round(sum(queries) / len(queries), 2) if queries else None,
+            'max_queries': max(queries) if queries else None,
+            'mean_db_ms': round(sum(db for _, _, db in self.recent) * 1000 / len(self.recent), 3) if self.recent else None,
+            'histogram': dict(zip([f'<={ms}ms' for ms in LATENCY_BUCKETS_MS] + [f'>{LATENCY_BUCKETS_MS[-1]}ms'], histogram)),
+            'suspected_n_plus_one': [
+                {'shape': shape, 'requests': flagged, 'max_repeats': repeats}
+                for shape, (flagged, repeats) in sorted(self.n_plus_one.items(), key=lambda item: -item[1][1])
+            ]
+        }
+
+
+class RequestMetrics:
+    """
+    Per-endpoint request metrics for this worker.
+    """
+    def __init__(self, window):
+        self.window = window
+        self.lock = threading.Lock()
+        self.endpoints = {}
+        self.since = time.time()
+
+    def record(self, endpoint, seconds, status, scope):
+        with self.lock:
+            metrics = self.endpoints.get(endpoint)
+            if metrics is None:
+                metrics = self.endpoints[endpoint] = EndpointMetrics(self.window)
+            metrics.record(seconds, status, scope)
+
+    def reset(self):
+        with self.lock:
+            self.endpoints = {}
+            self.since = time.time()
+
+    def stats(self):
+        with self.lock:
+            endpoints = {endpoint: metrics.summary() for endpoint, metrics in self.endpoints.items()}
+        return {
+            'since': datetime.fromtimestamp(self.since, timezone.utc).isoformat(timespec='seconds'),
+            'n_plus_one_threshold': N_PLUS_ONE_THRESHOLD,
+            'endpoints': dict(sorted(endpoints.items(), key=lambda item: -item[1]['db_ms']))
+        }
+
+
+request_metrics = RequestMetrics(REQUEST_METRICS_WINDOW)
+
+
+@app.before_request
+def start_request_metrics():
+    if REQUEST_METRICS_ENABLED:
+        g.request_started = time.perf_counter()
+        g.query_scope = query_tracker.open()
 
-    top_data = process_stock_slices(top_stock_slices, top_categories)
-    bottom_data = process_stock_slices(bottom_stock_slices, bottom_categories)
+@app.after_request
+def note_response_status(response):
+    g.response_status = response.status_code
+    return response
 
-    return {
-        'topCategories': [data['category'] for data in top_data],
-        'topStockSlices': [data['stocks'] for data in top_data],
-        'bottomCategories': [data['category'] for data in bottom_data],
-        'bottomStockSlices': [data['stocks'] for data in bottom_data]
-    }
+@app.teardown_request
+def record_request_metrics(error=None):
+    scope = g.pop('query_scope', None)
+    if scope is None:
+        return
+    query_tracker.close(scope)
+    # Label by route rule, so /api/stock_history/1 and /api/stock_history/2 are one endpoint
+    rule = request.url_rule.rule if request.url_rule else '<unmatched>'
+    status = 500 if error else g.get('response_status', 500)
+    request_metrics.record(f'{request.method} {rule}', time.perf_counter() - g.request_started, status, scope)
 
 
 @app.before_request
 def log_request():
     print(f"Incoming request: {request.method} {request.path}")
 
+@app.before_request
+def start_worker_threads():
+    # Every worker that serves requests follows the game state and competes for the
+    # tick lease, so one can take over the game clock if the leader dies. It also
+    # sweeps its session store.
+    if game_state.thread is None:
+        game_state.start()
+    if tick_leader.thread is None:
+        tick_leader.start()
+    start_session_sweeper()
+
 
 
 @app.route('/admin/login', methods=['GET', 'POST'])
@@ -1091,27 +3361,9 @@ def game_screen():
     players = db.session.query(Player).order_by((Player.balance + Player.portfolio_value).desc()).all()
     top_5_players = players[:5]
 
-    # Fetch previous year's stocks for comparison
-    previous_year_stocks = get_previous_year_stocks(current_year)
-
     try:
-        # Fetch current year stocks
-        stocks = db.session.query(Stock).filter(Stock.year == current_year).all()
-        if not stocks:
-            stock_changes_display = "<p>No stocks available for the current year.</p>"
-            top_5_increases = []
-            top_5_decreases = []
-        else:
-            stock_changes_display = generate_stocks_display(stocks, previous_year_stocks, current_year)
-
-            # Extract data for the top 5 increases and decreases
-            stock_changes = [
-                {'name': stock.name, 'change': get_active_price(stock) - previous_year_stocks.get(stock.name, 0)}
-                for stock in stocks
-            ]
-            stock_changes_sorted = sorted(stock_changes, key=lambda x: x['change'], reverse=True)
-            top_5_increases = stock_changes_sorted[:5]
-            top_5_decreases = stock_changes_sorted[-5:]
+        stock_changes_display = get_market_board(current_year).html
+        top_5_increases, top_5_decreases = price_matrix.top_movers(current_year)
 
     except Exception as e:
         stock_changes_display = f"<p>Error loading stocks: {str(e)}</p>"
@@ -1145,11 +3397,8 @@ def admin_dashboard():
     current_year = game.current_year if game else 1900
     game_running = game.game_running if game else False
 
-    # Fetch previous year's stocks for comparison
-    previous_year_stocks = get_previous_year_stocks(current_year)
     try:
-        stocks = db.session.query(Stock).filter(Stock.year == current_year).all()
-        stocks_display = generate_stocks_display(stocks, previous_year_stocks, current_year) if stocks else "<p>No stocks available for the current year.</p>"
+        stocks_display = get_market_board(current_year).html
     except Exception as e:
         stocks_display = f"<p>Error loading stocks: {e}</p>"
 
@@ -1185,6 +3434,7 @@ def create_market_event():
     )
     db.session.add(new_event)
     db.session.commit()
+    invalidate_price_snapshots()
 
     flash('Market event created successfully!', 'success')
     return redirect(url_for('admin_dashboard'))
@@ -1203,21 +3453,16 @@ def admin_player_details(player_id):
         flash('Player not found', 'error')
         return redirect(url_for('admin_dashboard'))
 
-    portfolio_items = db.session.query(Portfolio).filter_by(player_id=player_id).all()
     completed_sales = db.session.query(CompletedSale).filter_by(player_id=player_id).all()
 
     portfolio = []
-    for item in portfolio_items:
-        stock = db.session.query(Stock).filter_by(stock_id=item.stock_id, year=current_year).first()
-        if stock:
-            adjusted_price = get_adjusted_stock_price(stock, current_year)
-            current_value = adjusted_price * item.quantity
-            potential_profit = current_value - (item.purchase_price * item.quantity)
+    for item in value_portfolios([player_id], current_year)[player_id].holdings:
+        if item.price is not None:
             portfolio.append({
-                'stock_name': stock.name,
+                'stock_name': item.name,
                 'quantity': item.quantity,
-                'current_value': current_value,
-                'potential_profit': potential_profit,
+                'current_value': item.current_value,
+                'potential_profit': item.current_value - (item.purchase_price * item.quantity),
             })
 
     return render_template(
@@ -1229,6 +3474,7 @@ def admin_player_details(player_id):
 
 
 @app.route('/get_player_table')
+@conditional_read('year', 'trades')
 def get_player_table():
     try:
         game = db.session.query(Game).first()
@@ -1256,44 +3502,55 @@ def stop_game():
         game = db.session.query(Game).first()
         current_year = game.current_year
 
-        # Iterate through all players and sell their stocks
-        for player in players:
-            portfolio_items = db.session.query(Portfolio).filter_by(player_id=player.player_id).all()
-            for item in portfolio_items:
-                # Calculate adjusted stock price
-                stock = db.session.query(Stock).filter_by(stock_id=item.stock_id, year=current_year).first()
-                if stock:
-                    adjusted_price = get_adjusted_stock_price(stock, current_year)
-
-                    # Sell all stocks in the portfolio
-                    total_revenue = adjusted_price * item.quantity
-                    player.balance += total_revenue
-
-                    # Track completed sale
-                    profit = total_revenue - (item.purchase_price * item.quantity)
-                    percentage_return = (profit / (item.purchase_price * item.quantity)) * 100 if item.purchase_price > 0 else 0
-
-                    completed_sale = CompletedSale(
-                        player_id=player.player_id,
-                        stock_name=stock.name,
-                        stock_id=item.stock_id,
-                        price_purchased=item.purchase_price,
-                        quantity_sold=item.quantity,
-                        price_sold=adjusted_price,
-                        profit=profit,
-                        percentage_return=percentage_return,
-                        sale_year=current_year  # Add the current year
-                    )
-                    db.session.add(completed_sale)
-
-                    # Remove the portfolio item
-                    db.session.delete(item)
+        # Sell every player's holdings at this year's prices
+        valuations = value_portfolios(None, current_year)
+        players_by_id = {player.player_id: player for player in players}
+        sold_portfolio_ids = []
+        completed_sales = []
+        for player_id, valuation in valuations.items():
+            player = players_by_id.get(player_id)
+            if not player:
+                continue
+            for item in valuation.holdings:
+                if item.price is None:
+                    continue
+                total_revenue = item.current_value
+                player.balance += total_revenue
+
+                # Track completed sale
+                profit = total_revenue - (item.purchase_price * item.quantity)
+                percentage_return = (profit / (item.purchase_price * item.quantity)) * 100 if item.purchase_price > 0 else 0
+
+                completed_sales.append(dict(
+                    player_id=player_id,
+                    stock_name=item.name,
+                    stock_id=item.stock_id,
+                    price_purchased=item.purchase_price,
+                    quantity_sold=item.quantity,
+                    price_sold=item.price,
+                    profit=profit,
+                    percentage_return=percentage_return,
+                    sale_year=current_year  # Add the current year
+                ))
+                sold_portfolio_ids.append(item.portfolio_id)
+
+        if completed_sales:
+            db.session.execute(insert(CompletedSale), completed_sales)
+        if sold_portfolio_ids:
+            db.session.query(Portfolio).filter(Portfolio.portfolio_id.in_(sold_portfolio_ids)).delete(synchronize_session=False)
+
+        # Standing orders can no longer fill
+        db.session.query(StandingOrder).filter_by(status='pending').update({'status': 'cancelled'}, synchronize_session=False)
 
         # Stop the game and mark it as not running
         game.game_running = False
         game_running = False
 
         db.session.commit()
+        announce_game_state()
+        tick_scheduler.stop()
+        tick_leader.wake()
+        rebuild_leaderboard(current_year)
         return jsonify({'status': 'success', 'message': 'Game stopped successfully.'}), 200
 
     except Exception as e:
@@ -1315,13 +3572,14 @@ def set_year():
         # Update the game with the selected year
         game = db.session.query(Game).first()
         if game:
-            game.current_year = current_year
+            game.current_year = int(year)
             db.session.commit()
+            announce_game_state()
+        invalidate_price_snapshots()
+        player_leaderboard.clear()
 
-        # Prepare the stocks for the selected year
-        stocks = db.session.query(Stock).filter(Stock.year == current_year).all()
-        previous_year_stocks = get_previous_year_stocks(current_year)
-        stocks_display = generate_stocks_display(stocks, previous_year_stocks,current_year)
+        # Prepare the board and standings for the selected year
+        get_market_board(current_year)
         player_table = generate_player_table(current_year)
 
         # Return to the home page to allow starting the game with the selected year
@@ -1343,9 +3601,11 @@ def start_game():
         if game:
             # Set the game to start at the currently set year
             current_year = game.current_year
-            game.current_year = current_year
-            game.game_running = game_running
+            game.game_running = True
+            game.ticks_paused = False
             db.session.commit()
+        ensure_ai_players()
+        announce_game_state()
 
                 # Start year updates
         start_year_updates()
@@ -1365,47 +3625,58 @@ def restart_game():
 
     game = db.session.query(Game).first()
     if game:
-        game.current_year = current_year
+        game.current_year = 1900
         game.password = 'default_password'  # Reset password to default
-        game.game_running = game_running
+        game.game_running = False
         db.session.commit()
 
     
     # Reset player data
-    db.session.query(Player).delete()
-    db.session.query(Portfolio).delete()
-    db.session.query(CompletedSale).delete()
-    db.session.query(WatchList).delete()
-    db.session.commit()
+    reset_player_data()
 
     # Reset AI players and scheduler
     reset_ai_players_and_scheduler()
+    announce_game_state()
 
     # Redirect back to the admin dashboard
     return redirect(url_for('admin_dashboard'))
 
+def reset_player_data():
+    """
+    Delete every player, holding, sale, watch-list entry, standing order and alert and the caches built from them.
+    """
+    db.session.query(StandingOrder).delete()
+    db.session.query(PlayerAlert).delete()
+    db.session.query(Player).delete()
+    db.session.query(Portfolio).delete()
+    db.session.query(CompletedSale).delete()
+    db.session.query(WatchList).delete()
+    db.session.commit()
+    invalidate_price_snapshots()
+    clear_alerts()
+    player_leaderboard.clear()
+
 placeholder_password = generate_password_hash("ai_placeholder_password")
 
+def ensure_ai_players():
+    """
+    Create any configured AI players that do not exist yet.
+    """
+    existing = {row.name for row in db.session.query(Player.name).filter(Player.name.in_(AI_PLAYER_NAMES))}
+    missing = [name for name in AI_PLAYER_NAMES if name not in existing]
+    if missing:
+        db.session.execute(insert(Player), [
+            dict(name=name, balance=1000, stocks_owned=0, portfolio_value=0) for name in missing
+        ])
+        db.session.commit()  # Commit changes after adding all AI players
+    return len(missing)
+
 def reset_ai_players_and_scheduler():
     # Add AI Players
-    for name in AI_PLAYER_NAMES:
-        player = db.session.query(Player).filter_by(name=name).first()
-        if not player:
-            new_player = Player(
-                name=name,
-                balance=1000,
-                portfolio_value=0
-            )
-            db.session.add(new_player)
-
-    db.session.commit()  # Commit changes after adding all AI players
+    ensure_ai_players()
 
     # Stop the scheduler
-    try:
-        if scheduler.running:
-            scheduler.shutdown()
-    except SchedulerAlreadyRunningError:
-        print("Scheduler wasn't running, skipping shutdown.")
+    tick_scheduler.stop()
 
     # Create a new session after clearing
     session.permanent = True  # Mark the new session as permanent
@@ -1418,36 +3689,35 @@ def reset_ai_players_and_scheduler():
 @app.route('/get_next_interval', methods=['GET'])
 def get_next_interval():
     interval = time_intervals.get(current_year, 60)
-    return jsonify(interval=interval)
+    return jsonify(interval=interval, seconds_to_next_tick=tick_scheduler.stats()['seconds_to_next_tick'])
 
 @app.route('/get_current_year', methods=['GET'])
+@conditional_read('year', until_tick=True)
 def get_current_year():
-    global current_year
-    game = db.session.query(Game).first()
-    if game:
-        current_year = game.current_year
     return jsonify(current_year=current_year, game_running=game_running)
 
 @app.route('/update_stocks', methods=['GET'])
+@conditional_read('year', 'trades')
 def update_stocks():
     """
-    Update stock data for the current year and generate updated displays.
+    The current year's full player table, for the admin home page to poll. The page
+    polls /market_board for the stocks.
     """
     global current_year
 
-    # Fetch the previous year's stock data
-    previous_year_stocks = get_previous_year_stocks(current_year)
-
-    # Fetch the current year's stock data
-    stocks = db.session.query(Stock).filter(Stock.year == current_year).all()
-
-    # Generate stocks display with current year
-    stocks_display = generate_stocks_display(stocks, previous_year_stocks, current_year)
-
     # Generate player table with the current year
     player_table = generate_player_table(current_year)
 
-    return jsonify(stocks_display=stocks_display, player_table=player_table)
+    return jsonify(player_table=player_table)
+
+
+@app.route('/market_board', methods=['GET'])
+@conditional_read('year', 'prices', negotiates_gzip=True)
+def market_board():
+    """
+    The current year's stocks board as an HTML fragment, for the admin pages to poll.
+    """
+    return encoded_response(get_market_board(current_year).html_body, 'text/html')
 
 
 
@@ -1467,6 +3737,8 @@ def login():
         db.session.add(new_player)
         db.session.commit()
         player = new_player
+        refresh_leaderboard_players([player.player_id], current_year)
+        announce_game_state(players=[player.player_id])
 
     # Generate JWT token
     token = jwt.encode({
@@ -1487,89 +3759,195 @@ def get_categories():
     ]
     return jsonify(category_list)
 
-@app.route('/api/update_portfolio', methods=['POST'])
-@token_required
-def update_portfolio(current_user):
-    """
-    Update the player's portfolio based on buying or selling stocks.
-    """
-    global current_year
-    data = request.get_json()
+# Player order execution
+# A batch from /api/update_portfolio is loaded, priced and checked as a whole before
+# anything is written: stocks, prices and holdings take one query each, every leg is
+# validated against the team's cash and holdings, and all legs and sales are written
+# with bulk statements in one transaction. Balance and quantity changes are applied as
+# guarded increments, so concurrent batches for the same team cannot overspend.
+Fill = namedtuple('Fill', ['stock_id', 'name', 'quantity', 'price', 'value', 'profit'])
 
-    if not isinstance(data, dict):
-        return jsonify({'status': 'failure', 'message': 'Invalid data format'}), 400
 
-    player = current_user
-    if not player:
-        return jsonify({'status': 'failure', 'message': 'Player not found'}), 404
+class OrderRejected(Exception):
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
 
+def parse_orders(data):
+    """
+    Turn {stock_id: change} into a list of (stock_id, change), skipping zero changes.
+    Keys naming the same stock, such as "1" and " 1", are rejected, as each leg would
+    be checked against the holdings from before the others.
+    """
+    orders = []
+    seen = set()
     for stock_id_str, change in data.items():
         try:
             stock_id = int(stock_id_str)
         except ValueError:
-            return jsonify({'status': 'failure', 'message': f"Invalid stock ID: {stock_id_str}"}), 400
+            raise OrderRejected(f"Invalid stock ID: {stock_id_str}")
+        if stock_id in seen:
+            raise OrderRejected(f"Stock ID {stock_id} appears more than once in the order")
+        seen.add(stock_id)
+        if isinstance(change, bool) or not isinstance(change, int):
+            raise OrderRejected(f"Invalid quantity for stock ID {stock_id}: {change}")
+        if change:
+            orders.append((stock_id, change))
+    return orders
+
+
+def price_orders(stock_ids, year):
+    """
+    Load the year's Stock rows for stock_ids and their live adjusted prices.
+    Returns {stock_id: (stock, adjusted price)}.
+    """
+    stocks = {}
+    for stock in db.session.query(Stock).filter(Stock.stock_id.in_(stock_ids), Stock.year == year).order_by(Stock.id):
+        stocks.setdefault(stock.stock_id, stock)
+    adjusted_prices = calculate_adjusted_prices(list(stocks.values()), year)
+    return {stock_id: (stock, adjusted_prices[stock.id]) for stock_id, stock in stocks.items()}
 
-        stock = db.session.query(Stock).filter_by(stock_id=stock_id, year=current_year).first()
-        if not stock:
-            return jsonify({'status': 'failure', 'message': f"Stock ID {stock_id} not found"}), 404
 
-        adjusted_price = get_adjusted_stock_price(stock, current_year)
+def execute_orders(player, orders, year):
+    """
+    Validate and apply a batch of (stock_id, change) orders for the player at the year's
+    live prices. Either every leg is filled in one transaction or nothing is written and
+    OrderRejected is raised. A filled batch is announced to the other workers with the
+    players it re-valued. Returns the list of Fills.
+    """
+    if not orders:
+        return []
+    stock_ids = [stock_id for stock_id, _ in orders]
+    priced = price_orders(stock_ids, year)
+    holdings = {}
+    for row in (db.session.query(Portfolio)
+                .filter(Portfolio.player_id == player.player_id, Portfolio.stock_id.in_(stock_ids))
+                .order_by(Portfolio.portfolio_id)):
+        holdings.setdefault(row.stock_id, row)
+
+    cash = player.balance
+    fills, updates, deletes, inserts, sales = [], [], [], [], []
+    for stock_id, change in orders:
+        if stock_id not in priced:
+            raise OrderRejected(f"Stock ID {stock_id} not found", 404)
+        stock, price = priced[stock_id]
+        holding = holdings.get(stock_id)
 
-        # Handle buying stocks
         if change > 0:
-            total_cost = adjusted_price * change
-            if player.balance >= total_cost:
-                player.balance -= total_cost
-                portfolio_item = db.session.query(Portfolio).filter_by(player_id=player.player_id, stock_id=stock_id).first()
-                if portfolio_item:
-                    portfolio_item.quantity += change
-                else:
-                    portfolio_item = Portfolio(
-                        player_id=player.player_id,
-                        stock_id=stock_id,
-                        quantity=change,
-                        purchase_price=adjusted_price,
-                        year_purchased=current_year
-                    )
-                    db.session.add(portfolio_item)
+            total_cost = price * change
+            if cash < total_cost:
+                raise OrderRejected(f"Not enough balance to buy {change} shares of {stock.name}")
+            cash -= total_cost
+            if holding:
+                updates.append({'row_id': holding.portfolio_id, 'change': change})
             else:
-                return jsonify({'status': 'failure', 'message': f"Not enough balance to buy {change} shares of {stock.name}"}), 400
-
-        # Handle selling stocks
-        elif change < 0:
-            portfolio_item = db.session.query(Portfolio).filter_by(player_id=player.player_id, stock_id=stock_id).first()
-            if not portfolio_item or portfolio_item.quantity < abs(change):
-                return jsonify({'status': 'failure', 'message': f"Not enough shares of {stock.name} to sell"}), 400
-
-            total_revenue = adjusted_price * abs(change)
-            player.balance += total_revenue
-            portfolio_item.quantity += change
-
-            # Track completed sale
-            profit = total_revenue - abs(change) * portfolio_item.purchase_price
-            percentage_return = (profit / (abs(change) * portfolio_item.purchase_price)) * 100 if portfolio_item.purchase_price > 0 else 0
-
-            completed_sale = CompletedSale(
+                inserts.append(dict(player_id=player.player_id, stock_id=stock_id, quantity=change,
+                                    purchase_price=price, year_purchased=year))
+            fills.append(Fill(stock_id, stock.name, change, price, -total_cost, None))
+        else:
+            quantity = -change
+            if not holding or holding.quantity < quantity:
+                raise OrderRejected(f"Not enough shares of {stock.name} to sell")
+            total_revenue = price * quantity
+            cash += total_revenue
+            profit = total_revenue - quantity * holding.purchase_price
+            percentage_return = (profit / (quantity * holding.purchase_price)) * 100 if holding.purchase_price > 0 else 0
+            updates.append({'row_id': holding.portfolio_id, 'change': change})
+            if holding.quantity == quantity:
+                deletes.append(holding.portfolio_id)
+            sales.append(dict(
                 player_id=player.player_id,
                 stock_name=stock.name,
                 stock_id=stock_id,
-                price_purchased=portfolio_item.purchase_price,
-                quantity_sold=abs(change),
-                price_sold=adjusted_price,
+                price_purchased=holding.purchase_price,
+                quantity_sold=quantity,
+                price_sold=price,
                 profit=profit,
                 percentage_return=percentage_return,
-                sale_year=current_year
+                sale_year=year
+            ))
+            fills.append(Fill(stock_id, stock.name, change, price, total_revenue, profit))
+
+    changed = [(stock, price) for stock, price in priced.values() if stock.adjusted_price != price]
+    repriced = [{'row_id': stock.id, 'adjusted_price': price} for stock, price in changed]
+    changed_stock_ids = [stock.stock_id for stock, _ in changed]
+    changed_prices = {stock.stock_id: price for stock, price in changed}
+    player_table, portfolio_table = Player.__table__, Portfolio.__table__
+
+    try:
+        # Another session for the same team may have traded since the batch was checked
+        balance_delta = cash - player.balance
+        result = db.session.execute(
+            player_table.update()
+            .where(player_table.c.player_id == player.player_id,
+                   player_table.c.balance + balance_delta >= 0)
+            .values(balance=player_table.c.balance + balance_delta)
+        )
+        if result.rowcount != 1:
+            raise OrderRejected("Not enough balance for this order", 409)
+        if updates:
+            result = db.session.execute(
+                portfolio_table.update()
+                .where(portfolio_table.c.portfolio_id == bindparam('row_id'),
+                       portfolio_table.c.quantity + bindparam('change') >= 0)
+                .values(quantity=portfolio_table.c.quantity + bindparam('change')),
+                updates
+            )
+            if result.rowcount != len(updates):
+                raise OrderRejected("Holdings changed while the order was placed, please retry", 409)
+        if deletes:
+            db.session.execute(
+                portfolio_table.delete()
+                .where(portfolio_table.c.portfolio_id.in_(deletes), portfolio_table.c.quantity <= 0)
+            )
+        if inserts:
+            db.session.execute(insert(Portfolio), inserts)
+        if sales:
+            db.session.execute(insert(CompletedSale), sales)
+        if repriced:
+            db.session.execute(
+                Stock.__table__.update().where(Stock.__table__.c.id == bindparam('row_id')), repriced
             )
-            db.session.add(completed_sale)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
 
-            # Remove the portfolio entry if all shares are sold
-            if portfolio_item.quantity == 0:
-                db.session.delete(portfolio_item)
-            else:
-                print(f"Portfolio item for stock_id={stock.stock_id} not found.")
+    refreshed = {player.player_id}
+    if changed_stock_ids:
+        price_matrix.set_adjusted(year, changed_prices)
+        invalidate_price_snapshots(year)
+        refreshed.update(row.player_id for row in db.session.query(Portfolio.player_id)
+                         .filter(Portfolio.stock_id.in_(changed_stock_ids)).distinct())
+    refresh_leaderboard_players(list(refreshed), year)
+    announce_game_state(players=list(refreshed))
+    return fills
 
-    db.session.commit()
-    return jsonify({'status': 'success'})
+
+@app.route('/api/update_portfolio', methods=['POST'])
+@token_required
+def update_portfolio(current_user):
+    """
+    Buy and sell stocks for the player. The whole batch is filled or none of it is.
+    """
+    global current_year
+    data = request.get_json()
+
+    if not isinstance(data, dict):
+        return jsonify({'status': 'failure', 'message': 'Invalid data format'}), 400
+
+    player = current_user
+    if not player:
+        return jsonify({'status': 'failure', 'message': 'Player not found'}), 404
+
+    try:
+        fills = execute_orders(player, parse_orders(data), current_year)
+    except OrderRejected as e:
+        return jsonify({'status': 'failure', 'message': e.message}), e.status_code
+
+    return jsonify({'status': 'success', 'fills': [fill._asdict() for fill in fills]})
 
 
 
@@ -1597,19 +3975,9 @@ def player_info(current_user):
 
     player = current_user
 
-    portfolio_value = 0
-    total_stocks_owned = 0
-
-    portfolio = db.session.query(Portfolio).filter_by(player_id=player.player_id).all()
-    for item in portfolio:
-        current_year_stock = db.session.query(Stock).filter_by(stock_id=item.stock_id, year=current_year).first()
-        if current_year_stock:
-            stock_current_price = current_year_stock.price
-            portfolio_value += item.quantity * stock_current_price
-            total_stocks_owned += item.quantity
-
-    player.portfolio_value = portfolio_value
-    player.stocks_owned = total_stocks_owned
+    valuation = value_portfolios([player.player_id], current_year)[player.player_id]
+    player.portfolio_value = valuation.total_value
+    player.stocks_owned = valuation.stocks_owned
     db.session.commit()
 
     completed_sales = [
@@ -1647,30 +4015,21 @@ def player_portfolio(current_user):
     if not player:
         return jsonify({'status': 'failure', 'message': 'Player not found'}), 404
 
-    portfolio = db.session.query(Portfolio).filter_by(player_id=player.player_id).all()
+    holdings = value_portfolios([player.player_id], current_year)[player.player_id].holdings
 
-    if not portfolio:
+    if not holdings:
         return jsonify([])
 
     shares_owned = []
 
-    for item in portfolio:
-        stock = db.session.query(Stock).filter_by(stock_id=item.stock_id, year=current_year).first()
-
-        if stock:
-            adjusted_price = get_adjusted_stock_price(stock, current_year)
-            current_value = adjusted_price * item.quantity
-        else:
-            adjusted_price = 0
-            current_value = 0
-
+    for item in holdings:
         shares_owned.append({
             'stock_id': item.stock_id,
-            'name': stock.name if stock else "Unknown",
+            'name': item.name if item.name else "Unknown",
             'category': determine_category(item.stock_id),
             'owned': item.quantity,
             'purchase_price': item.purchase_price,
-            'current_value': current_value,
+            'current_value': item.current_value,
             'year_purchased': item.year_purchased,
             'current_year': current_year
         })
@@ -1681,6 +4040,7 @@ def player_portfolio(current_user):
 
 
 @app.route('/api/stocks/<category>', methods=['GET'])
+@conditional_read('year', 'prices')
 def stocks_by_category(category):
     """
     Fetch stocks belonging to a specific category for the current year.
@@ -1700,11 +4060,7 @@ def stocks_by_category(category):
 
     if category in category_ranges:
         start, end = category_ranges[category]
-        stocks = db.session.query(Stock).filter(
-            Stock.stock_id >= start,
-            Stock.stock_id < end,
-            Stock.year == current_year
-        ).all()
+        stocks = [stock for stock in get_price_snapshot(current_year).stocks if start <= stock.stock_id < end]
         stock_list = [
             {'stock_id': stock.stock_id, 'name': stock.name, 'price': get_active_price(stock)}
             for stock in stocks
@@ -1715,24 +4071,77 @@ def stocks_by_category(category):
 
 
 @app.route('/api/stock_history/<int:stock_id>', methods=['GET'])
+@conditional_read('year', until_tick=True)
 def stock_history(stock_id):
     global current_year
-    session = RawSQLSession()  # Use the SQLAlchemy session
     try:
-        print(f"Current game year: {current_year}")
-
-        # Execute raw SQL directly to fetch all stock data up to and including the current year
-        sql = text("SELECT * FROM stock WHERE stock_id = :stock_id AND year <= :current_year ORDER BY year")
-        stock_history_data = session.execute(sql, {'stock_id': stock_id, 'current_year': current_year}).fetchall()
-
-        # Create the history list outside of the loop
-        history = [{'year': row.year, 'price': row.price} for row in stock_history_data]
-
+        # Every year up to and including the current one, straight from the price matrix
+        history = [{'year': year, 'price': price} for year, price in price_matrix.history(stock_id, current_year)]
         return jsonify(history)
     except Exception as e:
         return jsonify({'status': 'failure', 'message': str(e)}), 500
-    finally:
-        session.close()
+
+
+@app.route('/api/stock_history', methods=['GET'])
+@conditional_read('year', until_tick=True)
+def stock_histories():
+    """
+    Several stocks' histories in one response: ?ids=1,2,3 with optional from and to years
+    (to is capped at the current year) and points, the most years to return per stock,
+    which samples long ranges evenly. The body is columnar, one shared years list and
+    one price list per stock, with null for years a stock was not listed.
+    """
+    try:
+        stock_ids = [int(stock_id) for stock_id in request.args.get('ids', '').split(',') if stock_id.strip()]
+        first_year = request.args.get('from', type=int)
+        last_year = request.args.get('to', type=int)
+        points = request.args.get('points', type=int)
+    except ValueError:
+        return error_response('ids must be a comma separated list of stock ids')
+    if not stock_ids:
+        return error_response('ids is required')
+    if len(stock_ids) > STOCK_HISTORY_MAX_IDS:
+        return error_response(f'At most {STOCK_HISTORY_MAX_IDS} ids per request')
+    if points is not None and points < 2:
+        return error_response('points must be at least 2')
+
+    price_matrix.ensure()
+    unknown = [stock_id for stock_id in stock_ids
+               if not 0 <= stock_id < len(price_matrix.names) or price_matrix.names[stock_id] is None]
+    if unknown:
+        return error_response(f"Unknown stock ids: {', '.join(map(str, unknown))}", 404)
+
+    # Always the series up to the current year, so requests with different ranges share them
+    series_first_year, series_last_year, series = stock_series_cache.get(stock_ids, current_year)
+    first_year = series_first_year if first_year is None else max(first_year, series_first_year)
+    last_year = series_last_year if last_year is None else min(last_year, series_last_year)
+    if first_year > last_year:
+        return error_response('from must not be after to or the current year')
+
+    start, end = first_year - series_first_year, last_year - series_first_year + 1
+    indexes, step = downsample_indexes(end - start, points)
+    if step == 1:
+        years = list(range(first_year, last_year + 1))
+        prices = [prices[start:end] for prices in series]
+    else:
+        years = [first_year + index for index in indexes]
+        prices = [[prices[start + index] for index in indexes] for prices in series]
+    return jsonify(
+        stock_ids=stock_ids,
+        names=[price_matrix.names[stock_id] for stock_id in stock_ids],
+        years=years,
+        step=step,
+        prices=prices
+    )
+
+
+@app.route('/api/sector_averages', methods=['GET'])
+@conditional_read('year', 'prices')
+def sector_averages():
+    """
+    Mean price per category for the current year against the previous year.
+    """
+    return jsonify(price_matrix.sector_averages(current_year))
 
 
 
@@ -1743,23 +4152,22 @@ def verify_stock_data():
         sql = text("SELECT * FROM stock WHERE stock_id = :stock_id ORDER BY year")
         result = session.execute(sql, {'stock_id': 1}).fetchall()
         for row in result:
-            print(f"Year: {row[2]}, Price: {row[3]}")  # Using integer indices
-        return jsonify([{'year': row[2], 'price': row[3]} for row in result])
+            print(f"Year: {row.year}, Price: {row.price}")
+        return jsonify([{'year': row.year, 'price': row.price} for row in result])
     finally:
         session.close()
 
 @app.route('/api/stocks_data')
+@conditional_read('year', 'prices', negotiates_gzip=True)
 def get_stocks_data():
     """
     Fetch all stocks' data for the current year, including adjusted prices.
     """
-    previous_year_stocks = get_previous_year_stocks(current_year)
-    stocks = db.session.query(Stock).filter(Stock.year == current_year).all()
-    stocks_data = generate_stocks_display_data(stocks, previous_year_stocks, current_year)
-    return jsonify(stocks_data)
+    return encoded_response(get_market_board(current_year).data_body, 'application/json')
 
 
 @app.route('/api/historical_events', methods=['GET'])
+@conditional_read(until_tick=True)
 def get_historical_events():
     year = request.args.get('year')
     if year:
@@ -1793,6 +4201,52 @@ def historical_events_for_portfolio(current_user):
     ).all()
     return jsonify([event.to_dict() for event in events])
 
+@app.route('/api/stream', methods=['GET'])
+def event_stream():
+    """
+    Server-sent events stream of ticks. EventSource cannot set headers, so the
+    player's token may be passed as ?token= to also receive their own channel.
+    """
+    token = request.args.get('token')
+    if not token and 'Authorization' in request.headers:
+        token = request.headers['Authorization'].split()[-1]
+
+    player_id = None
+    if token:
+        try:
+            player_id = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])['player_id']
+        except Exception:
+            return jsonify({'message': 'Token is invalid!'}), 401
+
+    subscriber = stream_broker.subscribe(player_id)
+    if subscriber is None:
+        # Clients without a stream keep polling, which needs no thread between requests
+        response = jsonify({'message': 'Too many open streams, try again later'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(STREAM_HEARTBEAT_SECONDS)
+        return response
+    if player_id is not None and stream_alert_cursor is None:
+        # Start pushing alerts from here; older ones are for /api/alerts
+        publish_alerts()
+    initial_state = f"retry: 3000\nevent: year\ndata: {json.dumps({'current_year': current_year, 'game_running': game_running})}\n\n"
+
+    def generate():
+        try:
+            yield initial_state
+            while True:
+                try:
+                    yield subscriber.get(timeout=STREAM_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+        finally:
+            stream_broker.unsubscribe(subscriber)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
 @app.route('/api/watch_list', methods=['GET'])
 @token_required
 def get_watch_list(current_user):
@@ -1854,35 +4308,126 @@ def add_to_watch_list(current_user):
             db.session.add(watch_list_item)
 
         db.session.commit()
+
+        # Ticks only fire on a crossing, so report a threshold that is already met straight away
+        stock = get_price_snapshot(current_year).get(stock_id)
+        if stock and value_alert_enabled and value_alert is not None and stock.price >= value_alert:
+            db.session.add(build_alert(current_user.player_id, current_year, stock, 'value', value_alert))
+            db.session.commit()
+            publish_alerts()
+
         return jsonify({'status': 'success'})
 
 
 
 
-@app.route('/api/stocks_with_history', methods=['GET'])
+@app.route('/api/alerts', methods=['GET'])
 @token_required
-def get_stocks_with_history(current_user):
-    global current_year
-    previous_year = current_year - 1
+def get_alerts(current_user):
+    """
+    Return the player's alerts newer than the ?since= cursor, plus the cursor to send next time.
+    """
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return jsonify({'status': 'failure', 'message': 'Invalid cursor'}), 400
+
+    alerts = (
+        db.session.query(PlayerAlert)
+        .filter(PlayerAlert.player_id == current_user.player_id, PlayerAlert.alert_id > since)
+        .order_by(PlayerAlert.alert_id.desc())
+        .limit(ALERT_QUEUE_SIZE)
+        .all()
+    )
+    cursor = db.session.query(db.func.max(PlayerAlert.alert_id)).scalar() or 0
+
+    return jsonify({'alerts': [alert.to_dict() for alert in reversed(alerts)], 'cursor': max(cursor, since)})
+
+
+@app.route('/api/orders', methods=['GET'])
+@token_required
+def get_orders(current_user):
+    """
+    The player's standing orders, newest first, optionally filtered by ?status=.
+    """
+    query = db.session.query(StandingOrder).filter_by(player_id=current_user.player_id)
+    status = request.args.get('status')
+    if status:
+        query = query.filter_by(status=status)
+    return jsonify([order.to_dict() for order in query.order_by(StandingOrder.order_id.desc())])
+
+
+@app.route('/api/orders', methods=['POST'])
+@token_required
+def place_order(current_user):
+    """
+    Queue a limit or stop order, filled at the first tick whose price triggers it.
+    Cash and shares are checked when it fills, not when it is placed.
+    """
+    data = request.get_json()
+    if not isinstance(data, dict):
+        return error_response('Invalid data format')
+
+    side, order_type = data.get('side'), data.get('type')
+    stock_id, quantity, price = data.get('stock_id'), data.get('quantity'), data.get('price')
+    if side not in ORDER_SIDES:
+        return error_response("side must be 'buy' or 'sell'")
+    if order_type not in ORDER_TYPES:
+        return error_response("type must be 'limit' or 'stop'")
+    if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity <= 0:
+        return error_response('quantity must be a positive whole number')
+    if isinstance(price, bool) or not isinstance(price, (int, float)) or price <= 0:
+        return error_response('price must be a positive number')
+    try:
+        stock_id = int(stock_id)
+    except (TypeError, ValueError):
+        return error_response(f"Invalid stock ID: {stock_id}")
+    if not get_price_snapshot(current_year).get(stock_id):
+        return error_response(f"Stock ID {stock_id} not found", 404)
+
+    order = StandingOrder(
+        player_id=current_user.player_id,
+        stock_id=stock_id,
+        side=side,
+        order_type=order_type,
+        trigger_price=price,
+        quantity=quantity,
+        status='pending',
+        placed_year=current_year
+    )
+    db.session.add(order)
+    db.session.commit()
+    return jsonify({'status': 'success', 'order': order.to_dict()}), 201
 
-    # Query current year's stocks and their prices
-    current_stocks = db.session.query(Stock.stock_id, Stock.name, Stock.price).filter_by(year=current_year).all()
 
-    # Query previous year's stocks and their prices
-    previous_stocks = db.session.query(Stock.stock_id, Stock.price).filter_by(year=previous_year).all()
+@app.route('/api/orders/<int:order_id>', methods=['DELETE'])
+@token_required
+def cancel_order(current_user, order_id):
+    cancelled = (
+        db.session.query(StandingOrder)
+        .filter_by(order_id=order_id, player_id=current_user.player_id, status='pending')
+        .update({'status': 'cancelled'}, synchronize_session=False)
+    )
+    db.session.commit()
+    if not cancelled:
+        return error_response('Pending order not found', 404)
+    return jsonify({'status': 'success'})
 
-    # Create a dictionary to map stock_id to previous year's price
-    previous_prices = {stock.stock_id: stock.price for stock in previous_stocks}
 
-    # Construct the response data with current and previous prices
+@app.route('/api/stocks_with_history', methods=['GET'])
+@token_required
+@conditional_read('year', until_tick=True)
+def get_stocks_with_history(current_user):
+    global current_year
+    # Raw yearly prices, so births (price 8, previous 0) can be detected by the client
     stocks_data = [
         {
             'stock_id': stock.stock_id,
             'name': stock.name,
-            'price': get_active_price(stock),
-            'previousPrice': previous_prices.get(stock.stock_id, 0)  # If no previous price found, default to 0
+            'price': stock.price,
+            'previousPrice': stock.previous_base_price or 0  # If no previous price found, default to 0
         }
-        for stock in current_stocks
+        for stock in get_price_snapshot(current_year).stocks
     ]
 
     return jsonify(stocks_data)
@@ -1907,6 +4452,128 @@ def leaderboard():
     high_scores = db.session.query(HighScore).order_by(HighScore.total_value.desc()).all()
     return render_template('leaderboard.html', high_scores=high_scores)
 
+@app.route('/admin/cache_stats', methods=['GET'])
+@admin_required
+def cache_stats():
+    return jsonify(price_snapshot=price_snapshot_stats(), price_matrix=price_matrix.stats(),
+                   market_board=market_board_stats(), stock_series=stock_series_cache.stats(),
+                   conditional_reads=conditional_read_stats(),
+                   stream=stream_broker.stats())
+
+@app.route('/admin/ai_stats', methods=['GET'])
+@admin_required
+def ai_stats():
+    return jsonify(bots=AI_BOTS, strategies=sorted(AI_STRATEGIES), last_tick=ai_phase_stats)
+
+@app.route('/admin/order_stats', methods=['GET'])
+@admin_required
+def order_stats():
+    pending = db.session.query(db.func.count(StandingOrder.order_id)).filter_by(status='pending').scalar()
+    return jsonify(pending=pending, last_tick=order_phase_stats)
+
+@app.route('/admin/tick_stats', methods=['GET'])
+@admin_required
+def tick_stats():
+    return jsonify(current_year=current_year, interval=time_intervals.get(current_year, 60),
+                   leader=tick_leader.stats(), **tick_scheduler.stats())
+
+@app.route('/admin/request_stats', methods=['GET'])
+@admin_required
+def request_stats():
+    return jsonify(request_metrics.stats())
+
+@app.route('/admin/metrics', methods=['GET'])
+@admin_required
+def admin_metrics():
+    return render_template('admin_metrics.html', metrics=request_metrics.stats())
+
+@app.route('/admin/metrics/reset', methods=['POST'])
+@admin_required
+def reset_request_metrics():
+    request_metrics.reset()
+    return redirect(url_for('admin_metrics'))
+
+@app.route('/admin/session_stats', methods=['GET'])
+@admin_required
+def session_stats():
+    return jsonify(sweep_seconds=SESSION_SWEEP_SECONDS, **session_sweep_stats)
+
+@app.route('/admin/game_state', methods=['GET'])
+@admin_required
+def game_state_stats():
+    return jsonify(worker_id=tick_leader.worker_id, **game_state.stats())
+
+@app.route('/admin/tick_history', methods=['GET'])
+@admin_required
+def tick_history_stats():
+    return jsonify(worker_id=tick_leader.worker_id, leader=tick_leader.leader, ticks=list(tick_history)[::-1],
+                   profile_requested=tick_profile_requested.is_set(), profile=last_tick_profile)
+
+@app.route('/admin/ticks', methods=['GET'])
+@admin_required
+def admin_ticks():
+    ticks = list(tick_history)[::-1]
+    phase_names = list(dict.fromkeys(phase['name'] for tick in ticks for phase in tick['phases']))
+    return render_template('admin_ticks.html', ticks=ticks, phase_names=phase_names, leader=tick_leader.leader,
+                           profile_requested=tick_profile_requested.is_set(), profile=last_tick_profile)
+
+@app.route('/admin/ticks/profile', methods=['POST'])
+@admin_required
+def profile_next_tick():
+    tick_profile_requested.set()
+    return redirect(url_for('admin_ticks'))
+
+@app.route('/admin/ticks/pause', methods=['POST'])
+@admin_required
+def pause_ticks():
+    return set_ticks_paused(True)
+
+@app.route('/admin/ticks/resume', methods=['POST'])
+@admin_required
+def resume_ticks():
+    return set_ticks_paused(False)
+
+def set_ticks_paused(paused):
+    """
+    Record the pause in the game row, where the tick leader picks it up, whichever worker
+    it is.
+    """
+    game = db.session.query(Game).first()
+    if not game or not game.game_running:
+        flash('The game is not running. Start the game before pausing or resuming the clock.', 'error')
+        return redirect(url_for('admin_dashboard'))
+    game.ticks_paused = paused
+    db.session.commit()
+    announce_game_state()
+    if tick_leader.enabled:
+        tick_leader.wake()
+    elif paused:
+        tick_scheduler.pause()
+    else:
+        tick_scheduler.resume()
+    return redirect(url_for('admin_dashboard'))
+
+@app.route('/admin/ticks/fast_forward', methods=['POST'])
+@admin_required
+def fast_forward_ticks():
+    years = request.form.get('years', '1')
+    if not years.isdigit() or not 1 <= int(years) <= 2024 - current_year:
+        flash(f'Enter between 1 and {2024 - current_year} years to fast-forward.', 'error')
+        return redirect(url_for('admin_dashboard'))
+    if not tick_scheduler.running:
+        flash('The game clock is not running in this worker. Start the game, or try again on the tick leader.', 'error')
+        return redirect(url_for('admin_dashboard'))
+    tick_scheduler.fast_forward(int(years))
+    return redirect(url_for('admin_dashboard'))
+
+@app.route('/admin/leaderboard_check', methods=['GET'])
+@admin_required
+def leaderboard_check():
+    game = db.session.query(Game).first()
+    year = game.current_year if game else current_year
+    mismatches = check_leaderboard(year)
+    return jsonify(consistent=not mismatches, players=len(player_leaderboard), mismatches=mismatches)
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('404.html'), 404
@@ -1925,11 +4592,6 @@ def test_js():
 def serve_static(path):
     return send_from_directory(os.path.join(app.static_folder, 'static'), path)
 
-#def clean_up_expired_sessions():
-#    now = datetime.now(timezone.utc)  # Use timezone-aware UTC datetime
-#    db.session.execute(delete(Session).where(Session.expiry < now))  # Here, `Session` should be your session model, so replace it if necessary.
-#    db.session.commit()
-
 @app.route("/api/<path:path>", methods=["GET", "POST", "PUT", "DELETE"])
 def api_routes(path):
     # API route handling
@@ -1943,9 +4605,17 @@ def serve_react_app(path):
         return send_from_directory(app.static_folder, path)
     return send_from_directory(app.static_folder, "index.html")
     
+def upgrade_database():
+    """
+    Apply the migrations in migrations/, as `flask db upgrade` does. The schema is only
+    ever changed here, once per deploy (the Procfile's release step) or by scripts that
+    set up their own copy of the database, never by the workers as they import the app.
+    """
+    with app.app_context():
+        upgrade(directory=MIGRATIONS_DIRECTORY)
+
 # Run the app
 if __name__ == '__main__':
-    with app.app_context():
-        print(app.config['SQLALCHEMY_DATABASE_URI'])
-        db.create_all()
+    print(app.config['SQLALCHEMY_DATABASE_URI'])
+    upgrade_database()
     app.run(host="0.0.0.0", port=int(os.environ.get("PORT",5000)))
@@ -0,0 +1,75 @@
+"""
+Tick time against bot count and AI worker processes.
+
+Usage: python benchmarks/bench_ai_workers.py [--bots 5 100 1000] [--workers 1 2 4 8] [--ticks 3]
+
+For every bot count the same seeded database is restored before each worker setting,
+and the bots' orders are checked to be identical whatever the worker count.
+"""
+import argparse
+import contextlib
+import io
+import os
+import time
+
+from common import load_app, reset_database, save_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bots', type=int, nargs='+', default=[5, 100, 1000])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--ticks', type=int, default=3)
+    parser.add_argument('--year', type=int, default=1960)
+    args = parser.parse_args()
+
+    os.environ['AI_SEED'] = 'bench'
+    game_app = load_app()
+    game_app.AI_SEED = 'bench'
+    game_app.AI_PARALLEL_MIN_BOTS = 1
+
+    print(f"{'bots':>6} {'workers':>8} {'tick ms':>9} {'AI ms':>8} {'decide ms':>10}  orders")
+    for bot_count in args.bots:
+        game_app.AI_BOTS = {
+            f"Bot {i + 1}": game_app.AI_BOT_STRATEGIES[i % len(game_app.AI_BOT_STRATEGIES)] for i in range(bot_count)
+        }
+        game_app.AI_PLAYER_NAMES = list(game_app.AI_BOTS)
+
+        reset_database(game_app)
+        with game_app.app.app_context():
+            game_app.ensure_ai_players()
+            game = game_app.db.session.query(game_app.Game).first()
+            game.current_year = args.year
+            game_app.db.session.commit()
+        seeded = save_database(f'bots_{bot_count}.db')
+
+        reference_orders = None
+        for workers in args.workers:
+            reset_database(game_app, seeded)
+            game_app.configure_ai_workers(workers)
+            # Spawn the pool outside the timed ticks
+            if game_app.get_ai_executor():
+                list(game_app.get_ai_executor().map(abs, range(workers * 2)))
+
+            tick_times, ai_times, decide_times, orders = [], [], [], []
+            for _ in range(args.ticks):
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    game_app.update_year()
+                tick_times.append(time.perf_counter() - start)
+                ai_times.append(game_app.ai_phase_stats['seconds'])
+                decide_times.append(game_app.ai_phase_stats['decide_seconds'])
+                orders.append(game_app.ai_phase_stats['orders'])
+
+            if reference_orders is None:
+                reference_orders = orders
+            deterministic = 'same' if orders == reference_orders else f'DIFFERENT from {reference_orders}'
+            print(f"{bot_count:>6} {workers:>8} {sum(tick_times) / len(tick_times) * 1000:>9.1f} "
+                  f"{sum(ai_times) / len(ai_times) * 1000:>8.1f} {sum(decide_times) / len(decide_times) * 1000:>10.1f}  "
+                  f"{sum(orders)} ({deterministic})")
+
+    game_app.configure_ai_workers(1)
+
+
+if __name__ == '__main__':
+    main()
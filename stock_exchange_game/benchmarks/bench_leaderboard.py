@@ -0,0 +1,69 @@
+"""
+Compare the full player-table recomputation with the maintained leaderboard.
+
+Usage: python benchmarks/bench_leaderboard.py [--players 10 100 1000] [--holdings 10]
+"""
+import argparse
+import random
+
+from common import load_app, timed
+
+
+def seed_players(game_app, count, holdings, year, rng):
+    db = game_app.db
+    stock_ids = [stock.stock_id for stock in game_app.get_price_snapshot(year).stocks]
+    existing = db.session.query(game_app.Player).count()
+    players = [
+        game_app.Player(name=f'Bench Team {existing + index}', balance=rng.uniform(0, 2000))
+        for index in range(count)
+    ]
+    db.session.add_all(players)
+    db.session.flush()
+    db.session.add_all([
+        game_app.Portfolio(player_id=player.player_id, stock_id=stock_id, quantity=rng.randint(1, 20),
+                           purchase_price=10, year_purchased=year)
+        for player in players
+        for stock_id in rng.sample(stock_ids, holdings)
+    ])
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--players', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--holdings', type=int, default=10)
+    parser.add_argument('--year', type=int, default=1960)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    game_app = load_app()
+    rng = random.Random(1)
+    print(f"{'players':>8} {'full recompute':>16} {'leaderboard read':>17} {'trade refresh':>14} "
+          f"{'rank lookup':>12} {'tick rebuild':>13}  consistent")
+
+    with game_app.app.app_context():
+        seeded = 0
+        for target in sorted(args.players):
+            seed_players(game_app, target - seeded, args.holdings, args.year, rng)
+            seeded = target
+            game_app.invalidate_price_snapshots()
+            game_app.player_leaderboard.clear()
+
+            full, _, _ = timed(game_app.compute_player_table, args.year, repeat=args.repeat)
+            rebuild, _, _ = timed(game_app.rebuild_leaderboard, args.year, repeat=args.repeat)
+            read, _, _ = timed(game_app.generate_player_table, args.year, repeat=args.repeat)
+
+            player_ids = list(game_app.player_leaderboard.entries)
+            refresh, _, _ = timed(lambda: game_app.refresh_leaderboard_players([rng.choice(player_ids)], args.year),
+                                  repeat=args.repeat)
+            rank, _, _ = timed(lambda: game_app.player_leaderboard.rank(rng.choice(player_ids)), repeat=args.repeat)
+            consistent = not game_app.check_leaderboard(args.year)
+
+            print(f"{len(player_ids):>8} {full * 1000:>13.2f} ms {read * 1000:>14.3f} ms {refresh * 1000:>11.2f} ms "
+                  f"{rank * 1e6:>9.1f} us {rebuild * 1000:>10.2f} ms  {consistent}")
+            if not consistent:
+                raise SystemExit("Leaderboard does not match the full recomputation")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Check the price matrix against the Stock table and time it against ORM price reads.
+
+Usage: python benchmarks/bench_price_matrix.py [--years 1950 1960 1990] [--repeat 5]
+
+A few years are repriced first so adjusted prices are exercised. For every year in
+the table the snapshot, top movers and sector averages built from the matrix are
+compared with the same values computed from Stock rows, and every stock's history
+with the raw query /api/stock_history used to run. Then the matrix is loaded from
+the database, written to a cache file and mapped back, and single-price, snapshot
+and history reads are timed both ways.
+"""
+import argparse
+import contextlib
+import io
+import math
+import os
+import random
+from collections import defaultdict
+
+from common import load_app, timed
+from bench_pricing import seed_market_activity
+
+
+def legacy_snapshot_prices(game_app, year):
+    """
+    The query build_price_snapshot used to run: {stock_id: (price, adjusted, previous active, previous base)}.
+    """
+    Stock, StockMaster = game_app.Stock, game_app.StockMaster
+    rows = (
+        game_app.db.session.query(Stock.id, Stock.stock_id, StockMaster.name, Stock.price, Stock.adjusted_price, Stock.year)
+        .join(StockMaster, StockMaster.stock_id == Stock.stock_id)
+        .filter(Stock.year.in_([year, year - 1]))
+        .order_by(Stock.id)
+        .all()
+    )
+    previous = {row.stock_id: row for row in rows if row.year == year - 1}
+    prices = {}
+    for row in rows:
+        if row.year == year:
+            previous_row = previous.get(row.stock_id)
+            prices[row.stock_id] = (
+                row.name, row.price, row.adjusted_price,
+                game_app.get_active_price(previous_row) if previous_row else None,
+                previous_row.price if previous_row else None
+            )
+    return prices
+
+
+def legacy_history(game_app, stock_id, year):
+    rows = game_app.db.session.execute(
+        game_app.text("SELECT * FROM stock WHERE stock_id = :stock_id AND year <= :current_year ORDER BY year"),
+        {'stock_id': stock_id, 'current_year': year}
+    ).fetchall()
+    return [(row.year, row.price) for row in rows]
+
+
+def legacy_active_price(game_app, stock_id, year):
+    stock = game_app.db.session.query(game_app.Stock).filter_by(stock_id=stock_id, year=year).first()
+    return game_app.get_active_price(stock) if stock else None
+
+
+def check_year(game_app, matrix, year, problems):
+    expected = legacy_snapshot_prices(game_app, year)
+    snapshot = game_app.build_price_snapshot(0, year)
+    actual = {
+        stock.stock_id: (stock.name, stock.price, stock.adjusted_price, stock.previous_price, stock.previous_base_price)
+        for stock in snapshot.stocks
+    }
+    if actual != expected:
+        problems.append(f"{year}: snapshot differs for {len(set(actual.items()) ^ set(expected.items()))} stocks")
+        return
+
+    changes = sorted(
+        ({'stock_id': stock_id, 'name': values[0],
+          'change': (values[2] if values[2] is not None else values[1]) - (values[3] or 0)}
+         for stock_id, values in expected.items()),
+        key=lambda change: change['change'], reverse=True
+    )
+    if matrix.top_movers(year) != (changes[:5], changes[-5:]):
+        problems.append(f"{year}: top movers differ")
+
+    totals = defaultdict(list)
+    for stock in snapshot.stocks:
+        totals[stock.category].append(game_app.get_active_price(stock))
+    for sector in matrix.sector_averages(year):
+        prices = totals[sector['category']]
+        if len(prices) != sector['stocks'] or not math.isclose(
+                round(sum(prices) / len(prices), 2), sector['average_price'], abs_tol=0.011):
+            problems.append(f"{year}: {sector['category']} average differs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=int, nargs='+', default=[1950, 1960, 1990], help='years to reprice first')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    game_app = load_app()
+    rng = random.Random(args.seed)
+    with game_app.app.app_context():
+        with contextlib.redirect_stdout(io.StringIO()):
+            for year in args.years:
+                seed_market_activity(game_app, year, 500, rng)
+                game_app.reprice_year(year)
+
+        load_best, _, _ = timed(lambda: game_app.PriceMatrix().ensure(), repeat=args.repeat)
+        matrix = game_app.price_matrix.ensure()
+        print(f"Matrix shape {matrix.prices.shape}, {matrix.prices.nbytes / 2 ** 20:.2f} MB, "
+              f"loaded from the database in {load_best * 1000:.1f} ms")
+
+        cache_path = os.path.join(os.path.dirname(game_app.db.engine.url.database), 'price_matrix.npy')
+        game_app.PriceMatrix(cache_path).ensure()
+        map_best, _, mapped = timed(lambda: game_app.PriceMatrix(cache_path).ensure(), repeat=args.repeat)
+        print(f"Mapped from {cache_path} in {map_best * 1000:.1f} ms ({mapped.cache_loads} cache loads)")
+
+        # In-place writes must land in the file every worker maps
+        year, stock_id = args.years[0], int(mapped.stock_ids(args.years[0])[0])
+        other_worker = game_app.PriceMatrix(cache_path).ensure()
+        mapped.set_adjusted(year, {stock_id: 123.25})
+        if other_worker.active_price(stock_id, year) != 123.25:
+            raise SystemExit("An in-place update was not visible through a second mapping")
+        # The cache only vouches for base prices, a worker mapping it later takes adjusted ones from the table
+        if game_app.PriceMatrix(cache_path).ensure().active_price(stock_id, year) != matrix.active_price(stock_id, year):
+            raise SystemExit("A new mapping kept an adjusted price the Stock table does not have")
+
+        first_year, years = matrix.first_year, matrix.years
+        problems = []
+        for year in range(first_year, first_year + years):
+            check_year(game_app, matrix, year, problems)
+        for stock_id in range(matrix.prices.shape[1]):
+            if matrix.history(stock_id, 1980) != legacy_history(game_app, stock_id, 1980):
+                problems.append(f"history differs for stock {stock_id}")
+        print(f"Checked {years} years and {matrix.prices.shape[1]} histories against the Stock table")
+
+        lookups = [(rng.randint(1, matrix.prices.shape[1] - 1), rng.randint(first_year + 1, first_year + years - 1))
+                   for _ in range(args.lookups)]
+        timings = [
+            ('price lookup', lambda: [legacy_active_price(game_app, *lookup) for lookup in lookups],
+             lambda: [matrix.active_price(*lookup) for lookup in lookups], len(lookups)),
+            ('year snapshot', lambda: legacy_snapshot_prices(game_app, 1960),
+             lambda: game_app.build_price_snapshot(0, 1960), 1),
+            ('stock history', lambda: legacy_history(game_app, 42, 2000), lambda: matrix.history(42, 2000), 1),
+            ('sector averages', None, lambda: matrix.sector_averages(1960), 1),
+        ]
+        for name, legacy, vectorized, count in timings:
+            matrix_best, _, _ = timed(vectorized, repeat=args.repeat)
+            if legacy is None:
+                print(f"{name:16} matrix {matrix_best / count * 1e6:10.2f} us")
+                continue
+            legacy_best, _, _ = timed(legacy, repeat=args.repeat)
+            print(f"{name:16} ORM {legacy_best / count * 1e6:10.2f} us   matrix {matrix_best / count * 1e6:10.2f} us   "
+                  f"{legacy_best / matrix_best:.0f}x")
+
+    if problems:
+        for problem in problems[:20]:
+            print(f"  {problem}")
+        raise SystemExit(f"{len(problems)} mismatches")
+    print("Matrix matches the Stock table for every year and stock")
+
+
+if __name__ == '__main__':
+    main()
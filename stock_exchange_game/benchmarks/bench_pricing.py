@@ -0,0 +1,118 @@
+"""
+Compare the per-stock pricing loop against the batch pricing engine.
+
+Usage: python benchmarks/bench_pricing.py [--year 1960] [--repeat 5] [--sales 2000]
+"""
+import argparse
+import contextlib
+import io
+import random
+
+from common import load_app, timed
+
+
+def seed_market_activity(game_app, year, sales, rng):
+    """
+    Add completed sales, supply-demand modifiers and market events for the year
+    so every term of the pricing formula is exercised.
+    """
+    db = game_app.db
+    stocks = db.session.query(game_app.Stock).filter_by(year=year).all()
+    categories = sorted({stock.category for stock in stocks})
+
+    db.session.add_all([
+        game_app.CompletedSale(
+            player_id=1,
+            stock_name=stock.name,
+            stock_id=stock.stock_id,
+            price_purchased=stock.price,
+            quantity_sold=rng.randint(1, 400),
+            price_sold=stock.price,
+            profit=0,
+            percentage_return=0,
+            sale_year=year
+        )
+        for stock in (rng.choice(stocks) for _ in range(sales))
+    ])
+    db.session.add_all([
+        game_app.SupplyDemand(stock_id=stock.stock_id, year=year, demand_modifier=rng.uniform(0.8, 1.3))
+        for stock in rng.sample(stocks, len(stocks) // 3)
+    ])
+    db.session.add_all([
+        game_app.MarketDynamics(year=year, effect_description='Global boom', sector=None,
+                                price_change_factor=1.05, demand_change_factor=1.0),
+        game_app.MarketDynamics(year=year, effect_description='Sector slump', sector=categories[0].upper(),
+                                price_change_factor=0.9, demand_change_factor=1.0),
+    ])
+    db.session.commit()
+
+
+def legacy_adjusted_price(game_app, stock, year):
+    """
+    The original per-stock pricing: three queries for one stock's adjusted price.
+    """
+    db = game_app.db
+    if stock.price < 8:
+        return stock.price
+    total_sold = (
+        db.session.query(db.func.sum(game_app.CompletedSale.quantity_sold))
+        .filter(game_app.CompletedSale.stock_id == stock.stock_id, game_app.CompletedSale.sale_year == year)
+        .scalar() or 0
+    )
+    supply_demand = db.session.query(game_app.SupplyDemand).filter_by(stock_id=stock.stock_id, year=year).first()
+    demand_modifier = supply_demand.demand_modifier if supply_demand else 1.0
+    price_change_factor = 1.0
+    for event in db.session.query(game_app.MarketDynamics).filter_by(year=year).all():
+        if event.sector is None or event.sector.lower() == stock.category.lower():
+            price_change_factor *= event.price_change_factor
+    return game_app.apply_price_adjustments(
+        stock.price, stock.market_cap, total_sold, demand_modifier, price_change_factor
+    )
+
+
+def legacy_reprice(game_app, year):
+    """
+    The original update_year loop: one per-stock pricing and commit per stock.
+    """
+    db = game_app.db
+    prices = {}
+    for stock in db.session.query(game_app.Stock).filter_by(year=year).all():
+        prices[stock.id] = legacy_adjusted_price(game_app, stock, year)
+        stock.adjusted_price = prices[stock.id]
+        db.session.commit()
+    return prices
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--year', type=int, default=1960)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--sales', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    game_app = load_app()
+    with game_app.app.app_context():
+        seed_market_activity(game_app, args.year, args.sales, random.Random(args.seed))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            legacy_best, legacy_mean, legacy_prices = timed(legacy_reprice, game_app, args.year, repeat=args.repeat)
+            batch_best, batch_mean, batch_prices = timed(game_app.reprice_year, args.year, repeat=args.repeat)
+
+        mismatches = [
+            row_id for row_id, price in legacy_prices.items()
+            if abs(batch_prices[row_id] - price) > 1e-9
+        ]
+
+    print(f"Stocks repriced:      {len(batch_prices)}")
+    print(f"Per-stock loop:       best {legacy_best * 1000:8.2f} ms   mean {legacy_mean * 1000:8.2f} ms")
+    print(f"Batch pricing engine: best {batch_best * 1000:8.2f} ms   mean {batch_mean * 1000:8.2f} ms")
+    print(f"Speed-up (best):      {legacy_best / batch_best:.1f}x")
+    if mismatches:
+        print(f"MISMATCH: {len(mismatches)} stocks priced differently, e.g. row ids {mismatches[:5]}")
+        raise SystemExit(1)
+    print("Prices match the per-stock formula for every stock.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Time matching standing orders at a tick against the number of pending orders.
+
+Usage: python benchmarks/bench_standing_orders.py [--orders 100 1000 10000] [--teams 200]
+
+For every order count the same seeded database is restored, the orders are placed
+around the next year's prices so roughly half of them trigger, and one tick is run.
+Cash and shares are then checked against the filled orders.
+"""
+import argparse
+import contextlib
+import io
+import random
+
+from sqlalchemy import insert
+
+from common import load_app, reset_database, save_database
+from synthetic import seed_game
+
+
+def place_orders(game_app, count, player_ids, year, rng):
+    # Orders trigger at the adjusted prices teams trade at
+    stock_ids = [stock.stock_id for stock in game_app.build_price_snapshot(0, year + 1).stocks]
+    next_prices = {stock_id: price for stock_id, (_, price) in game_app.price_orders(stock_ids, year + 1).items()}
+    stock_ids = [stock_id for stock_id, price in next_prices.items() if price > 0]
+    orders = []
+    for _ in range(count):
+        stock_id = rng.choice(stock_ids)
+        orders.append(dict(
+            player_id=rng.choice(player_ids), stock_id=stock_id,
+            side=rng.choice(game_app.ORDER_SIDES), order_type=rng.choice(game_app.ORDER_TYPES),
+            trigger_price=next_prices[stock_id] * rng.uniform(0.8, 1.2), quantity=rng.randint(1, 5),
+            status='pending', placed_year=year
+        ))
+    game_app.db.session.execute(insert(game_app.StandingOrder), orders)
+    game_app.db.session.commit()
+
+
+def team_totals(game_app, player_ids):
+    db = game_app.db
+    balances = dict(db.session.query(game_app.Player.player_id, game_app.Player.balance)
+                    .filter(game_app.Player.player_id.in_(player_ids)))
+    shares = dict(db.session.query(game_app.Portfolio.player_id, db.func.sum(game_app.Portfolio.quantity))
+                  .filter(game_app.Portfolio.player_id.in_(player_ids)).group_by(game_app.Portfolio.player_id))
+    return sum(balances.values()), sum(shares.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--teams', type=int, default=200)
+    parser.add_argument('--year', type=int, default=1960)
+    args = parser.parse_args()
+
+    game_app = load_app()
+    with game_app.app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+        player_ids = seed_game(game_app, args.year, args.teams, holdings=10, sales=0, watch_list=0, events=0)
+    seeded = save_database('orders.db')
+
+    print(f"{'orders':>8} {'triggered':>10} {'filled':>8} {'rejected':>9} {'match ms':>9} {'tick ms':>8}  conserved")
+    for count in args.orders:
+        reset_database(game_app, seeded)
+        with game_app.app.app_context():
+            place_orders(game_app, count, player_ids, args.year, random.Random(count))
+            cash_before, shares_before = team_totals(game_app, player_ids)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            game_app.update_year()
+        stats = game_app.order_phase_stats
+
+        with game_app.app.app_context():
+            cash_after, shares_after = team_totals(game_app, player_ids)
+            filled = (
+                game_app.db.session.query(game_app.StandingOrder.side, game_app.StandingOrder.quantity,
+                                          game_app.StandingOrder.fill_price)
+                .filter_by(status='filled').all()
+            )
+        bought = sum(order.quantity for order in filled if order.side == 'buy')
+        sold = sum(order.quantity for order in filled if order.side == 'sell')
+        spent = sum(order.quantity * order.fill_price * (1 if order.side == 'buy' else -1) for order in filled)
+        conserved = (shares_after == shares_before + bought - sold and abs(cash_after - (cash_before - spent)) < 1e-6)
+
+        print(f"{count:>8} {stats['triggered']:>10} {stats['filled']:>8} {stats['rejected']:>9} "
+              f"{stats['seconds'] * 1000:>9.1f} {sum(game_app.last_tick_timings.values()) * 1000:>8.1f}  {conserved}")
+        if not conserved:
+            raise SystemExit("Filled orders do not account for the teams' cash and shares")
+
+
+if __name__ == '__main__':
+    main()
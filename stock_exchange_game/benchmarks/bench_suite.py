@@ -0,0 +1,173 @@
+"""
+Time the tick and the hot API paths against a synthetic game, and catch regressions.
+
+Usage: python benchmarks/bench_suite.py [--players 200] [--holdings 10] [--sales 20]
+                                        [--watch-list 5] [--events 4] [--year 1960]
+                                        [--output results.json] [--baseline baseline.json]
+
+Every path is timed repeat times. update_year runs against a freshly restored copy of
+the seeded database each time, so every tick does the same work. With --baseline the
+best times are compared with an earlier --output file and the run fails if any path
+is more than --tolerance slower (and at least --min-ms slower).
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import time
+from datetime import datetime, timezone
+
+from common import load_app, reset_database, save_database, timed
+from synthetic import seed_game
+
+
+def time_update_year(game_app, seeded, repeat):
+    timings = []
+    for _ in range(repeat):
+        reset_database(game_app, seeded)
+        start = time.perf_counter()
+        game_app.update_year()
+        timings.append(time.perf_counter() - start)
+        if not game_app.last_tick_timings:
+            raise SystemExit("update_year failed, see the log above")
+    return min(timings), sum(timings) / len(timings)
+
+
+def run_suite(game_app, args, seeded, player_id):
+    flask_app = game_app.app
+    year = args.year
+    results = {}
+
+    def record(name, best, mean):
+        results[name] = {'best_ms': round(best * 1000, 4), 'mean_ms': round(mean * 1000, 4)}
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        best, mean = time_update_year(game_app, seeded, args.repeat)
+        record('update_year', best, mean)
+        reset_database(game_app, seeded)
+        game_app.current_year = year
+
+        with flask_app.app_context():
+            name = game_app.db.session.get(game_app.Player, player_id).name
+            snapshot = game_app.get_price_snapshot(year)
+            previous = game_app.get_previous_year_stocks(year)
+            stock_id = next(stock.stock_id for stock in snapshot.stocks if game_app.get_active_price(stock) > 0)
+            category_ids = ','.join(str(stock.stock_id) for stock in snapshot.stocks[:25])
+
+            best, mean, _ = timed(game_app.generate_player_table, year, repeat=args.repeat)
+            record('generate_player_table', best, mean)
+            best, mean, _ = timed(game_app.generate_stocks_display, snapshot.stocks, previous, year, repeat=args.repeat)
+            record('generate_stocks_display', best, mean)
+
+        client = flask_app.test_client()
+        token = client.post('/api/login', json={'teamName': name}).get_json()['token']
+        headers = {'Authorization': f'Bearer {token}'}
+
+        def request(method, path, expected=200, **kwargs):
+            response = getattr(client, method)(path, headers={**headers, **kwargs.pop('headers', {})}, **kwargs)
+            if response.status_code != expected:
+                raise SystemExit(f"{method.upper()} {path} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+            return response
+
+        def buy_and_sell():
+            request('post', '/api/update_portfolio', json={str(stock_id): 1})
+            request('post', '/api/update_portfolio', json={str(stock_id): -1})
+
+        checks = {
+            '/api/update_portfolio (buy + sell)': buy_and_sell,
+            '/api/player_info': lambda: request('get', '/api/player_info'),
+            '/api/player_portfolio': lambda: request('get', '/api/player_portfolio'),
+            '/api/stocks_data': lambda: request('get', '/api/stocks_data'),
+            '/api/stock_history/<id>': lambda: request('get', f'/api/stock_history/{stock_id}'),
+            '/api/stock_history?ids=<25 ids>': lambda: request('get', f'/api/stock_history?ids={category_ids}'),
+            '/update_stocks': lambda: request('get', '/update_stocks'),
+            '/market_board (gzip)': lambda: request('get', '/market_board', headers={'Accept-Encoding': 'gzip'}),
+        }
+        for check_name, check in checks.items():
+            best, mean, _ = timed(check, repeat=args.repeat)
+            record(check_name, best, mean)
+
+    return results
+
+
+def compare(results, baseline, tolerance, min_ms):
+    """
+    Print each path against the baseline and return the names of those that regressed.
+    """
+    regressions = []
+    print(f"{'path':36} {'baseline ms':>12} {'now ms':>10} {'change':>8}")
+    for name, timing in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:36} {'-':>12} {timing['best_ms']:>10.3f}      new")
+            continue
+        change = timing['best_ms'] / before['best_ms'] - 1 if before['best_ms'] else 0
+        regressed = change > tolerance and timing['best_ms'] - before['best_ms'] >= min_ms
+        flag = '  REGRESSION' if regressed else ''
+        print(f"{name:36} {before['best_ms']:>12.3f} {timing['best_ms']:>10.3f} {change:>+7.0%}{flag}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, default=200)
+    parser.add_argument('--holdings', type=int, default=10)
+    parser.add_argument('--sales', type=int, default=20, help='completed sales per player')
+    parser.add_argument('--watch-list', type=int, default=5, help='watch-list entries per player')
+    parser.add_argument('--events', type=int, default=4, help='market events in the year')
+    parser.add_argument('--year', type=int, default=1960)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare against an earlier --output file')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slow-down, 0.25 = 25%%')
+    parser.add_argument('--min-ms', type=float, default=0.5, help='ignore slow-downs smaller than this')
+    args = parser.parse_args()
+    # load_app changes directory, so resolve the file paths first
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+
+    game_app = load_app()
+    with game_app.app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+        game_app.ensure_ai_players()
+        player_ids = seed_game(game_app, args.year, args.players, args.holdings, args.sales,
+                               args.watch_list, args.events, args.seed)
+    seeded = save_database('seeded.db')
+
+    results = run_suite(game_app, args, seeded, player_ids[0])
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'config': {key: getattr(args, key) for key in ('players', 'holdings', 'sales', 'watch_list', 'events',
+                                                         'year', 'repeat', 'seed')},
+        'results': results
+    }
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        if baseline.get('config') != report['config']:
+            print(f"Warning: baseline was recorded with {baseline.get('config')}")
+        regressions = compare(results, baseline['results'], args.tolerance, args.min_ms)
+    else:
+        regressions = []
+        print(f"{'path':36} {'best ms':>10} {'mean ms':>10}")
+        for name, timing in results.items():
+            print(f"{name:36} {timing['best_ms']:>10.3f} {timing['mean_ms']:>10.3f}")
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {output}")
+
+    if regressions:
+        raise SystemExit(f"Slower than the baseline: {', '.join(regressions)}")
+
+
+if __name__ == '__main__':
+    main()
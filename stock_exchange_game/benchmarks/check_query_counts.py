@@ -0,0 +1,140 @@
+"""
+Assert that portfolio valuation and order batches cost a constant number of
+queries, however many holdings a player has or legs a batch has.
+
+Usage: python benchmarks/check_query_counts.py [--small 1] [--large 60]
+"""
+import argparse
+import contextlib
+import io
+import random
+
+from sqlalchemy import event
+
+from common import load_app
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self.on_execute)
+
+    def on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def measure(self, func, *args, **kwargs):
+        start = self.count
+        with contextlib.redirect_stdout(io.StringIO()):
+            func(*args, **kwargs)
+        return self.count - start
+
+
+def create_player(game_app, name, holdings, year, rng):
+    db = game_app.db
+    player = game_app.Player(name=name, balance=1000)
+    db.session.add(player)
+    db.session.flush()
+    stock_ids = [stock.stock_id for stock in game_app.get_price_snapshot(year).stocks]
+    db.session.add_all([
+        game_app.Portfolio(player_id=player.player_id, stock_id=stock_id, quantity=rng.randint(1, 9),
+                           purchase_price=10, year_purchased=year)
+        for stock_id in rng.sample(stock_ids, holdings)
+    ])
+    db.session.commit()
+    return player.player_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--small', type=int, default=1)
+    parser.add_argument('--large', type=int, default=60)
+    parser.add_argument('--year', type=int, default=1960)
+    args = parser.parse_args()
+
+    game_app = load_app()
+    flask_app = game_app.app
+    rng = random.Random(1)
+    failures = []
+
+    with flask_app.app_context():
+        counter = QueryCounter(game_app.db.engine)
+        game = game_app.db.session.query(game_app.Game).first()
+        game.current_year = args.year
+        game_app.db.session.commit()
+        game_app.current_year = args.year
+        game_app.get_price_snapshot(args.year)
+
+        sizes = {'small': args.small, 'large': args.large}
+        player_ids = {label: create_player(game_app, f'Query Count {label}', size, args.year, rng)
+                      for label, size in sizes.items()}
+
+        client = flask_app.test_client()
+        tokens = {label: client.post('/api/login', json={'teamName': f'Query Count {label}'}).get_json()['token']
+                  for label in sizes}
+        with client.session_transaction() as flask_session:
+            flask_session['admin_logged_in'] = True
+
+        checks = {
+            'value_portfolios (snapshot)': lambda label: game_app.value_portfolios([player_ids[label]], args.year),
+            'value_portfolios (joined)': lambda label: game_app.value_portfolios([player_ids[label]], args.year, use_snapshot=False),
+            'calculate_portfolio_value': lambda label: game_app.calculate_portfolio_value(player_ids[label], args.year),
+            '/api/player_info': lambda label: client.get('/api/player_info', headers={'Authorization': f'Bearer {tokens[label]}'}),
+            '/api/player_portfolio': lambda label: client.get('/api/player_portfolio', headers={'Authorization': f'Bearer {tokens[label]}'}),
+            '/admin/player/<id>': lambda label: client.get(f'/admin/player/{player_ids[label]}'),
+        }
+
+        for name, check in checks.items():
+            counts = {label: counter.measure(check, label) for label in sizes}
+            status = 'ok' if counts['small'] == counts['large'] else 'FAIL'
+            print(f"{name:32} {args.small:>3} holdings: {counts['small']:>3} queries   "
+                  f"{args.large:>3} holdings: {counts['large']:>3} queries   {status}")
+            if status != 'ok':
+                failures.append(name)
+
+        # An order batch must not cost a query per leg
+        trader_id = create_player(game_app, 'Query Count trader', 0, args.year, rng)
+        game_app.db.session.get(game_app.Player, trader_id).balance = 1_000_000
+        game_app.db.session.commit()
+        trader_token = client.post('/api/login', json={'teamName': 'Query Count trader'}).get_json()['token']
+        listed = [stock.stock_id for stock in game_app.get_price_snapshot(args.year).stocks if stock.price > 0]
+        large_batch = min(args.large, len(listed))
+
+        def place(legs, side):
+            batch = {str(stock_id): side for stock_id in listed[:legs]}
+            return counter.measure(client.post, '/api/update_portfolio', json=batch,
+                                   headers={'Authorization': f'Bearer {trader_token}'})
+
+        # Trade every stock once first, so both batch sizes reprice and insert alike
+        place(large_batch, 1)
+        place(large_batch, -1)
+        order_counts = {}
+        for label, legs in (('small', 2), ('large', large_batch)):
+            for side in (1, -1):
+                order_counts[label, side] = place(legs, side)
+        for side, name in ((1, '/api/update_portfolio (buys)'), (-1, '/api/update_portfolio (sells)')):
+            status = 'ok' if order_counts['small', side] == order_counts['large', side] else 'FAIL'
+            print(f"{name:32} {2:>3} legs:     {order_counts['small', side]:>3} queries   "
+                  f"{large_batch:>3} legs:     {order_counts['large', side]:>3} queries   {status}")
+            if status != 'ok':
+                failures.append(name)
+
+        # Selling out the whole game must not cost a query per holding either
+        counter.measure(client.post, '/stop_game')
+        stop_counts = {}
+        for label, extra_players in (('small', 1), ('large', 10)):
+            for index in range(extra_players):
+                create_player(game_app, f'Stop Game {label} {index}', sizes[label], args.year, rng)
+            stop_counts[label] = counter.measure(client.post, '/stop_game')
+        status = 'ok' if stop_counts['small'] == stop_counts['large'] else 'FAIL'
+        print(f"{'/stop_game':32} few holdings: {stop_counts['small']:>3} queries   "
+              f"many holdings: {stop_counts['large']:>3} queries   {status}")
+        if status != 'ok':
+            failures.append('/stop_game')
+
+    if failures:
+        raise SystemExit(f"Query count grows with holdings or legs for: {', '.join(failures)}")
+    print("Query counts are independent of the number of holdings and order legs.")
+
+
+if __name__ == '__main__':
+    main()
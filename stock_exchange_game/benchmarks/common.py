@@ -0,0 +1,99 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Every benchmark runs against a scratch copy of the game database so the
+real instance/stock_exchange_game.db is never touched.
+"""
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DATABASE = os.path.join(APP_DIR, 'instance', 'stock_exchange_game.db')
+
+pristine_database = None
+scratch_database = None
+
+
+def load_app(source_database=DEFAULT_DATABASE):
+    """
+    Copy the game database to a scratch directory, point the app at it and import it.
+    Must be called before anything else imports app.
+    """
+    global pristine_database, scratch_database
+
+    work_dir = tempfile.mkdtemp(prefix='stock_exchange_bench_')
+    scratch_database = os.path.join(work_dir, 'stock_exchange_game.db')
+    pristine_database = os.path.join(work_dir, 'pristine.db')
+    shutil.copy(source_database, scratch_database)
+
+    os.environ['DATABASE_URL'] = f'sqlite:///{scratch_database}'
+    os.environ['DATABASE_URI'] = os.environ['DATABASE_URL']
+    os.environ.setdefault('SESSION_COOKIE_SECURE', 'False')
+    # Benchmarks drive update_year themselves, so no worker should start the game clock
+    # or pick up game state from anywhere else
+    os.environ.setdefault('TICK_LEADER_ELECTION', 'False')
+    os.environ.setdefault('GAME_STATE_SYNC', 'False')
+
+    # Keep any relative files the app writes out of the source tree
+    os.chdir(work_dir)
+    if APP_DIR not in sys.path:
+        sys.path.insert(0, APP_DIR)
+
+    import app as game_app
+    game_app.upgrade_database()
+
+    # Taken after the upgrade, so it has the current schema
+    shutil.copy(scratch_database, pristine_database)
+
+    # app.py logs at DEBUG, which drowns out benchmark output
+    logging.getLogger().setLevel(logging.WARNING)
+    print(f"Using scratch database {scratch_database}")
+    return game_app
+
+
+def reset_database(game_app, source=None):
+    """
+    Put the scratch database back to its starting copy (or another file) and drop
+    every in-process cache built from it.
+    """
+    with game_app.app.app_context():
+        game_app.db.session.remove()
+        game_app.db.engine.dispose()
+    shutil.copy(source or pristine_database, scratch_database)
+    with game_app.app.app_context():
+        game_app.invalidate_price_snapshots()
+        game_app.player_leaderboard.clear()
+        game_app.clear_alerts()
+
+
+def save_database(path):
+    """
+    Copy the current scratch database, e.g. after seeding, for later reset_database calls.
+    """
+    shutil.copy(scratch_database, path)
+    return path
+
+
+def timed(func, *args, repeat=5, **kwargs):
+    """
+    Run func repeat times and return (best seconds, mean seconds, last result).
+    """
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+    return min(timings), sum(timings) / len(timings), result
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of values, e.g. fraction=0.95 for p95.
+    """
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
@@ -0,0 +1,251 @@
+"""
+Run several app servers on one database and measure how stale their game year gets.
+
+Usage: python benchmarks/game_state_sync.py [--workers 4] [--interval 1] [--years 10]
+
+Each worker imports the app and serves it on its own port, as gunicorn workers share
+one database. They elect a tick leader and follow the game state, with every year
+shortened to --interval seconds. /get_current_year is polled on every worker every
+--poll-ms. For each year, a worker's lag is how long after the first worker showed the
+new year it showed it too. The run fails if a worker ever shows an older year than it
+showed before, or lags by more than --max-lag-ms.
+
+Before the game starts, --trades buy-and-sell pairs are placed through the first
+worker. Each sale moves the stock's adjusted price, and the run also fails if any
+worker's /api/stocks_data or /get_player_table takes more than --max-lag-ms to match
+the first worker's.
+
+The team also watches every stock on the board through the last worker, with births
+and a value alert 5% above the price. After the game, every worker must return the
+same non-empty /api/alerts.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+
+from common import load_app, percentile
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def worker(database, port, interval, lease_seconds):
+    os.environ['DATABASE_URL'] = os.environ['DATABASE_URI'] = f'sqlite:///{database}'
+    os.environ['TICK_LEADER_ELECTION'] = 'True'
+    os.environ['GAME_STATE_SYNC'] = 'True'
+    os.environ['TICK_LEASE_SECONDS'] = str(lease_seconds)
+    os.environ['AI_WORKERS'] = '1'
+    os.environ['SESSION_COOKIE_SECURE'] = 'False'
+    os.chdir(os.path.dirname(database))
+    sys.stdout = open(os.devnull, 'w')
+
+    import logging
+    from werkzeug.serving import make_server
+    import app as game_app
+
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    for year in game_app.time_intervals:
+        game_app.time_intervals[year] = interval
+    make_server('127.0.0.1', port, game_app.app, threaded=True).serve_forever()
+
+
+def poll_worker(port, poll_seconds, seen, regressions, stop):
+    """
+    Record when this worker first shows each year.
+    """
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    latest = None
+    while not stop.is_set():
+        try:
+            connection.request('GET', '/get_current_year')
+            year = json.loads(connection.getresponse().read())['current_year']
+        except (OSError, http.client.HTTPException, ValueError):
+            connection.close()
+            time.sleep(0.1)
+            continue
+        now = time.monotonic()
+        if latest is not None and year < latest:
+            regressions.append((port, latest, year))
+        if year not in seen:
+            seen[year] = now
+        latest = year if latest is None else max(latest, year)
+        time.sleep(poll_seconds)
+
+
+def get_body(connection, path, headers=None):
+    connection.request('GET', path, headers=headers or {})
+    response = connection.getresponse()
+    return response.status, response.read()
+
+
+def login(connection, team):
+    connection.request('POST', '/api/login', body=json.dumps({'teamName': team}),
+                       headers={'Content-Type': 'application/json'})
+    return {'Authorization': f"Bearer {json.loads(connection.getresponse().read())['token']}",
+            'Content-Type': 'application/json'}
+
+
+def board_stocks(connection):
+    board = json.loads(get_body(connection, '/api/stocks_data')[1])
+    return [stock for stocks in board['topStockSlices'] + board['bottomStockSlices'] for stock in stocks]
+
+
+def watch_board(port, headers):
+    """
+    Put every stock on the board on the team's watch list, and return how many.
+    """
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    stocks = board_stocks(connection)
+    for stock in stocks:
+        connection.request('POST', '/api/watch_list', headers=headers, body=json.dumps({
+            'stock_id': stock['stock_id'], 'birthAlert': True,
+            'valueAlert': round(stock['price'] * 1.05, 2) or 1, 'valueAlertEnabled': True
+        }))
+        connection.getresponse().read()
+    return len(stocks)
+
+
+TRADED_PATHS = ('/api/stocks_data', '/get_player_table')
+
+
+def trade_lags(ports, headers, trades, timeout):
+    """
+    Trade through the first worker and time how long every other worker takes to serve
+    the same /api/stocks_data and /get_player_table. Returns the lags in seconds.
+    """
+    connections = [http.client.HTTPConnection('127.0.0.1', port, timeout=10) for port in ports]
+    trader = connections[0]
+    stock_id = next(stock['stock_id'] for stock in board_stocks(trader) if stock['price'] > 0)
+
+    # Load every worker's prices and leaderboard first, so the lags do not include building them
+    for connection in connections:
+        for path in TRADED_PATHS:
+            get_body(connection, path)
+
+    lags = []
+    for _ in range(trades):
+        for quantity in (1, -1):
+            trader.request('POST', '/api/update_portfolio', body=json.dumps({str(stock_id): quantity}), headers=headers)
+            trader.getresponse().read()
+        traded_at = time.monotonic()
+        expected = [get_body(trader, path)[1] for path in TRADED_PATHS]
+        for connection in connections[1:]:
+            while [get_body(connection, path)[1] for path in TRADED_PATHS] != expected:
+                if time.monotonic() - traded_at > timeout:
+                    raise SystemExit("A worker never caught up with a trade")
+                time.sleep(0.005)
+            lags.append(time.monotonic() - traded_at)
+    return lags
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--interval', type=float, default=1.0, help='seconds per year')
+    parser.add_argument('--years', type=int, default=10, help='years to watch')
+    parser.add_argument('--lease', type=float, default=3)
+    parser.add_argument('--poll-ms', type=float, default=5)
+    parser.add_argument('--max-lag-ms', type=float, default=500)
+    parser.add_argument('--year', type=int, default=1950)
+    parser.add_argument('--trades', type=int, default=5, help='buy-and-sell pairs to propagate before the game starts')
+    args = parser.parse_args()
+
+    game_app = load_app()
+    with game_app.app.app_context():
+        database = game_app.db.engine.url.database
+    connection = sqlite3.connect(database, timeout=10)
+    connection.execute('UPDATE game SET current_year = ?, game_running = 0', (args.year,))
+    connection.commit()
+
+    context = multiprocessing.get_context('spawn')
+    ports = [free_port() for _ in range(args.workers)]
+    processes = [context.Process(target=worker, args=(database, port, args.interval, args.lease), daemon=True)
+                 for port in ports]
+    for process in processes:
+        process.start()
+
+    # Wait for every server to come up before starting the game
+    for port in ports:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                http.client.HTTPConnection('127.0.0.1', port, timeout=1).request('GET', '/get_current_year')
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise SystemExit(f"Worker on port {port} did not start")
+                time.sleep(0.1)
+
+    headers = login(http.client.HTTPConnection('127.0.0.1', ports[0], timeout=10), 'Sync Team')
+    watched = watch_board(ports[-1], headers)
+
+    if args.trades:
+        lags = trade_lags(ports, headers, args.trades, timeout=10)
+        print(f"Trades through port {ports[0]} reached every worker's prices and leaderboard after: "
+              f"p50 {percentile(lags, 0.5) * 1000:.1f} ms, max {max(lags) * 1000:.1f} ms")
+        if max(lags) * 1000 > args.max_lag_ms:
+            raise SystemExit(f"A worker served stale prices for {max(lags) * 1000:.0f} ms after a trade")
+
+    stop = threading.Event()
+    seen = {port: {} for port in ports}
+    regressions = []
+    pollers = [threading.Thread(target=poll_worker, args=(port, args.poll_ms / 1000, seen[port], regressions, stop),
+                                daemon=True) for port in ports]
+    for poller in pollers:
+        poller.start()
+
+    # Start the game through one worker only, as an admin would
+    starter = http.client.HTTPConnection('127.0.0.1', ports[-1], timeout=10)
+    starter.request('POST', '/start_game')
+    starter.getresponse().read()
+    print(f"{args.workers} workers, {args.interval}s years, game started through port {ports[-1]}")
+
+    time.sleep(args.years * args.interval + args.lease)
+    stop.set()
+    for poller in pollers:
+        poller.join()
+    # Stop the game and let any tick in flight finish, so every worker is read at the same year
+    connection.execute('UPDATE game SET game_running = 0')
+    connection.commit()
+    time.sleep(args.interval + 0.5)
+    alerts = {get_body(http.client.HTTPConnection('127.0.0.1', port, timeout=10), '/api/alerts?since=0', headers)[1]
+              for port in ports}
+    for process in processes:
+        process.kill()
+
+    lags = []
+    years = sorted(year for year in set.intersection(*(set(times) for times in seen.values())) if year > args.year)
+    for year in years:
+        first = min(times[year] for times in seen.values())
+        lags.extend(times[year] - first for times in seen.values())
+    if not years:
+        raise SystemExit("The game never advanced")
+
+    worst = max(lags) * 1000
+    print(f"Years {args.year} -> {years[-1]} seen by every worker")
+    print(f"lag behind the first worker: p50 {percentile(lags, 0.5) * 1000:.1f} ms, "
+          f"p95 {percentile(lags, 0.95) * 1000:.1f} ms, max {worst:.1f} ms")
+    fired = len(json.loads(next(iter(alerts)))['alerts'])
+    print(f"{watched} stocks watched, {fired} alerts fired, "
+          f"{'the same' if len(alerts) == 1 else 'different'} on every worker")
+    if regressions:
+        raise SystemExit(f"Workers went back a year: {regressions[:5]}")
+    if len(alerts) != 1 or not fired:
+        raise SystemExit("Workers disagree about the team's alerts")
+    if worst > args.max_lag_ms:
+        raise SystemExit(f"A worker lagged by {worst:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
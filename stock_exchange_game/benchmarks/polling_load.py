@@ -0,0 +1,301 @@
+"""
+Replay the clients' polling timers for N logged-in teams and report latency per endpoint.
+
+Usage: python benchmarks/polling_load.py [--teams 100] [--duration 60] [--tick-seconds 10]
+                                         [--url http://127.0.0.1:8000] [--json results.json]
+                                         [--conditional]
+
+Every team runs the React client's timers: Ticker.js (/api/watch_list then
+/api/stocks_with_history every 3s), Header.js (/api/player_info every 5s) and
+Home.js (/api/player_portfolio then /api/player_info every 5s). Each admin screen
+runs game_screen.html (/api/game_status then /get_player_table every 2s) and
+home.html (/get_current_year, then /market_board and /update_stocks while the game
+runs, every 5s).
+Timers start at a random offset, as teams open the page at different times.
+
+By default the app is started locally on a scratch copy of the database, seeded with
+synthetic teams, and update_year runs every --tick-seconds. With --url the load goes
+to an app you started yourself, e.g. under gunicorn with a given number of workers.
+Ticks are then driven by the game itself and detected by watching /get_current_year.
+
+Requests that start during a tick or within --tick-window seconds after it are also
+reported separately.
+
+With --conditional every timer keeps the last ETag and body per endpoint and sends
+If-None-Match, as a browser revalidating its cache does, so 304s and the bytes they
+save show up in the report.
+"""
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from common import percentile
+
+# (seconds between runs, [(path, needs token)]) for each timer in the clients
+TEAM_POLLERS = {
+    'Ticker.js': (3, [('/api/watch_list', True), ('/api/stocks_with_history', True)]),
+    'Header.js': (5, [('/api/player_info', True)]),
+    'Home.js': (5, [('/api/player_portfolio', True), ('/api/player_info', True)]),
+}
+ADMIN_POLLERS = {
+    'game_screen.html': (2, [('/api/game_status', False), ('/get_player_table', False)]),
+    'home.html': (5, [('/get_current_year', False), ('/market_board', False), ('/update_stocks', False)]),
+}
+
+
+class Poller(threading.Thread):
+    """
+    One client timer: runs its requests in order every interval seconds, like setInterval.
+    """
+    def __init__(self, host, port, interval, steps, token, offset, samples, stop, conditional=False):
+        super().__init__(daemon=True)
+        self.host, self.port = host, port
+        self.interval = interval
+        self.steps = steps
+        self.headers = {'Authorization': f'Bearer {token}'} if token else {}
+        self.offset = offset
+        self.samples = samples
+        self.stop = stop
+        self.conditional = conditional
+        self.cached = {}  # path: (etag, body)
+
+    def run(self):
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        next_run = time.monotonic() + self.offset
+        while not self.stop.wait(max(0, next_run - time.monotonic())):
+            for path, needs_token in self.steps:
+                headers = dict(self.headers) if needs_token else {}
+                if self.conditional and path in self.cached:
+                    headers['If-None-Match'] = self.cached[path][0]
+                started = time.monotonic()
+                try:
+                    connection.request('GET', path, headers=headers)
+                    response = connection.getresponse()
+                    body = response.read()
+                    status = response.status
+                    etag = response.getheader('ETag')
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    body, status, etag = b'', None, None
+                self.samples.append((path, started, time.monotonic() - started, status, len(body)))
+                if status == 304:
+                    body = self.cached[path][1]
+                elif status == 200 and etag and self.conditional:
+                    self.cached[path] = (etag, body)
+                # home.html only refreshes the tables while the game is running
+                if path == '/get_current_year' and status in (200, 304) and not json.loads(body).get('game_running'):
+                    break
+            next_run = max(next_run + self.interval, time.monotonic())
+
+
+def login(host, port, team_name):
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    connection.request('POST', '/api/login', body=json.dumps({'teamName': team_name}),
+                       headers={'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    if response.status != 200:
+        raise SystemExit(f"Login failed for {team_name}: {response.status}")
+    token = json.loads(response.read())['token']
+    connection.close()
+    return token
+
+
+def start_local_app(args):
+    """
+    Start the app on a scratch database seeded with synthetic teams. Returns
+    (host, port, game_app, team names).
+    """
+    from werkzeug.serving import make_server
+
+    from common import load_app
+    from synthetic import seed_game
+
+    game_app = load_app()
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    with game_app.app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+        game_app.ensure_ai_players()
+        player_ids = seed_game(game_app, args.year, args.teams, args.holdings, args.sales, args.watch_list, 0)
+        names = [game_app.db.session.get(game_app.Player, player_id).name for player_id in player_ids]
+    game_app.game_running = True
+
+    server = make_server('127.0.0.1', 0, game_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return '127.0.0.1', server.server_port, game_app, names
+
+
+def drive_ticks(game_app, interval, ticks, stop):
+    """
+    Call update_year every interval seconds and record (start, end) of each tick.
+    """
+    while not stop.wait(interval):
+        started = time.monotonic()
+        with contextlib.redirect_stdout(io.StringIO()):
+            game_app.update_year()
+        ticks.append((started, time.monotonic()))
+
+
+def watch_ticks(host, port, ticks, stop):
+    """
+    Record a tick whenever /get_current_year changes. The tick's duration is unknown.
+    """
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    year = None
+    while not stop.wait(0.2):
+        try:
+            connection.request('GET', '/get_current_year')
+            current = json.loads(connection.getresponse().read())['current_year']
+        except (OSError, http.client.HTTPException, ValueError):
+            connection.close()
+            continue
+        if year is not None and current != year:
+            now = time.monotonic()
+            ticks.append((now, now))
+        year = current
+
+
+def summarise(samples, duration):
+    by_path = defaultdict(list)
+    errors = defaultdict(int)
+    not_modified = defaultdict(int)
+    body_bytes = defaultdict(int)
+    for path, _, latency, status, size in samples:
+        by_path[path].append(latency)
+        body_bytes[path] += size
+        if status == 304:
+            not_modified[path] += 1
+        elif status != 200:
+            errors[path] += 1
+    return {
+        path: {
+            'requests': len(latencies),
+            'per_second': round(len(latencies) / duration, 2),
+            'errors': errors[path],
+            'not_modified': not_modified[path],
+            'kb_per_request': round(body_bytes[path] / len(latencies) / 1024, 2),
+            'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+            'max_ms': round(max(latencies) * 1000, 2),
+        }
+        for path, latencies in sorted(by_path.items())
+    }
+
+
+def print_table(title, rows):
+    print(title)
+    print(f"  {'endpoint':28} {'requests':>9} {'req/s':>8} {'errors':>7} {'304s':>7} {'KB/req':>7} {'p50 ms':>8} "
+          f"{'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for path, row in rows.items():
+        print(f"  {path:28} {row['requests']:>9} {row['per_second']:>8.1f} {row['errors']:>7} {row['not_modified']:>7} "
+              f"{row['kb_per_request']:>7.2f} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} "
+              f"{row['max_ms']:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--teams', type=int, default=100)
+    parser.add_argument('--admin-screens', type=int, default=1, help='open game_screen.html and home.html pages')
+    parser.add_argument('--duration', type=float, default=60, help='seconds of load')
+    parser.add_argument('--url', help='load an app that is already running instead of starting one')
+    parser.add_argument('--tick-seconds', type=float, default=10, help='local mode: seconds between ticks')
+    parser.add_argument('--tick-window', type=float, default=1.0, help='seconds after a tick counted as near it')
+    parser.add_argument('--year', type=int, default=1960, help='local mode: starting year')
+    parser.add_argument('--holdings', type=int, default=10, help='local mode: holdings per team')
+    parser.add_argument('--sales', type=int, default=10, help='local mode: completed sales per team')
+    parser.add_argument('--watch-list', type=int, default=5, help='local mode: watch-list entries per team')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='also write the results to this file')
+    parser.add_argument('--conditional', action='store_true', help='revalidate with If-None-Match like a browser cache')
+    args = parser.parse_args()
+    # load_app changes directory, so resolve the file path first
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    stop = threading.Event()
+    ticks = []
+    if args.url:
+        target = urlsplit(args.url)
+        host, port = target.hostname, target.port or 80
+        names = [f'Load Team {index}' for index in range(args.teams)]
+        tick_thread = threading.Thread(target=watch_ticks, args=(host, port, ticks, stop), daemon=True)
+    else:
+        host, port, game_app, names = start_local_app(args)
+        tick_thread = threading.Thread(target=drive_ticks, args=(game_app, args.tick_seconds, ticks, stop),
+                                       daemon=True)
+
+    # The local app prints every request, keep that out of the report
+    quiet = contextlib.nullcontext() if args.url else contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        tokens = [login(host, port, name) for name in names]
+
+    rng = random.Random(args.seed)
+    samples = []
+    pollers = [
+        Poller(host, port, interval, steps, token, rng.uniform(0, interval), samples, stop, args.conditional)
+        for token in tokens
+        for interval, steps in TEAM_POLLERS.values()
+    ] + [
+        Poller(host, port, interval, steps, None, rng.uniform(0, interval), samples, stop, args.conditional)
+        for _ in range(args.admin_screens)
+        for interval, steps in ADMIN_POLLERS.values()
+    ]
+
+    print(f"{len(tokens)} teams, {args.admin_screens} admin screens, {len(pollers)} timers, "
+          f"{args.duration:.0f}s against {args.url or f'http://{host}:{port} (local)'}")
+    with quiet:
+        started = time.monotonic()
+        for poller in pollers:
+            poller.start()
+        tick_thread.start()
+        time.sleep(args.duration)
+        stop.set()
+        for poller in pollers:
+            poller.join(timeout=30)
+        duration = time.monotonic() - started
+
+    def near_tick(sample):
+        return any(start <= sample[1] <= end + args.tick_window for start, end in ticks)
+
+    overall = summarise(samples, duration)
+    tick_samples = [sample for sample in samples if near_tick(sample)]
+    tick_time = sum(end + args.tick_window - start for start, end in ticks)
+    around_ticks = summarise(tick_samples, tick_time) if tick_samples else {}
+
+    print(f"{len(samples)} requests in {duration:.1f}s ({len(samples) / duration:.1f} req/s)")
+    print_table("All requests:", overall)
+    if ticks and args.url:
+        print(f"{len(ticks)} ticks seen")
+    elif ticks:
+        tick_seconds = [end - start for start, end in ticks]
+        print(f"{len(ticks)} ticks, mean {sum(tick_seconds) / len(ticks) * 1000:.1f} ms, "
+              f"max {max(tick_seconds) * 1000:.1f} ms")
+    if around_ticks:
+        print_table(f"Requests started during a tick or up to {args.tick_window:g}s after:", around_ticks)
+
+    if json_path:
+        results = {
+            'teams': len(tokens),
+            'admin_screens': args.admin_screens,
+            'conditional': args.conditional,
+            'target': args.url or 'local',
+            'seconds': round(duration, 2),
+            'requests': len(samples),
+            'ticks': [round((end - start) * 1000, 2) for start, end in ticks],
+            'endpoints': overall,
+            'around_ticks': around_ticks,
+        }
+        with open(json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {json_path}")
+
+
+if __name__ == '__main__':
+    main()
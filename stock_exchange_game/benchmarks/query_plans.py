@@ -0,0 +1,115 @@
+"""
+Report the query plans and timings of the hot queries before and after the schema migrations.
+
+Usage: python benchmarks/query_plans.py [--copies 5] [--repeat 50]
+
+The game database is copied twice: one copy is left as it is and the other is upgraded
+by importing the app, which runs the migrations. portfolio, completed_sale and
+supply_demand are grown to 2 ** --copies times their size in both copies, so the
+scans the indexes remove show up in the timings. Each query below is then run with
+EXPLAIN QUERY PLAN and timed against both copies. "SCAN" is a full table scan;
+"SEARCH ... USING INDEX" or "USING COVERING INDEX" is an index lookup.
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from common import DEFAULT_DATABASE, load_app
+
+YEAR = 1960
+STOCK_IDS = (12, 57, 140)
+
+QUERIES = [
+    ('stock prices for a year (reprice_year, price matrix reloads)',
+     'SELECT id, stock_id, price, adjusted_price FROM stock WHERE year = :year'),
+    ('stock rows for an order batch (price_orders)',
+     'SELECT * FROM stock WHERE stock_id IN (12, 57, 140) AND year = :year ORDER BY id'),
+    ('stock history up to a year',
+     'SELECT year, price FROM stock WHERE stock_id = :stock_id AND year <= :year ORDER BY year'),
+    ('one team holding (execute_orders)',
+     'SELECT * FROM portfolio WHERE player_id = :player_id AND stock_id IN (12, 57, 140) ORDER BY portfolio_id'),
+    ('holdings valued against a year (value_portfolios, joined)',
+     'SELECT portfolio.portfolio_id, stock.price, stock.adjusted_price FROM portfolio '
+     'LEFT OUTER JOIN stock ON stock.stock_id = portfolio.stock_id AND stock.year = :year '
+     'WHERE portfolio.player_id = :player_id ORDER BY portfolio.portfolio_id'),
+    ('shares sold per stock in a year (calculate_adjusted_prices)',
+     'SELECT stock_id, sum(quantity_sold) FROM completed_sale WHERE sale_year = :year GROUP BY stock_id'),
+    ('demand modifiers for a year (calculate_adjusted_prices)',
+     'SELECT * FROM supply_demand WHERE year = :year ORDER BY supply_demand_id'),
+    ('news for a team\'s holdings (/api/news)',
+     'SELECT * FROM historical_events_feed WHERE year = :year AND stock_id IN (12, 57, 140)'),
+]
+
+GROWN_TABLES = ['portfolio', 'completed_sale', 'supply_demand']
+
+
+def grow(connection, copies):
+    """
+    Double every grown table copies times, giving the copies new primary keys.
+    supply_demand starts empty, so it gets one modifier per stock and year first.
+    """
+    if not connection.execute('SELECT count(*) FROM supply_demand').fetchone()[0]:
+        connection.execute('INSERT INTO supply_demand (stock_id, year, demand_modifier) '
+                           'SELECT stock_id, year, 1.0 FROM stock WHERE year BETWEEN 1950 AND 1970')
+    for table in GROWN_TABLES:
+        columns = [row[1] for row in connection.execute(f'PRAGMA table_info({table})') if not row[5]]
+        column_list = ', '.join(columns)
+        for _ in range(copies):
+            connection.execute(f'INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {table}')
+    connection.commit()
+
+
+def plan(connection, sql, parameters):
+    return [row[3] for row in connection.execute(f'EXPLAIN QUERY PLAN {sql}', parameters)]
+
+
+def best_time(connection, sql, parameters, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        connection.execute(sql, parameters).fetchall()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--copies', type=int, default=5, help='times to double the grown tables')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    before_path = os.path.join(tempfile.mkdtemp(prefix='stock_exchange_plans_'), 'before.db')
+    shutil.copy(DEFAULT_DATABASE, before_path)
+    game_app = load_app()
+    with game_app.app.app_context():
+        after_path = game_app.db.engine.url.database
+        revision = game_app.db.session.execute(game_app.text('SELECT version_num FROM alembic_version')).scalar()
+        game_app.db.session.remove()
+        game_app.db.engine.dispose()
+
+    before, after = sqlite3.connect(before_path), sqlite3.connect(after_path)
+    for connection in (before, after):
+        grow(connection, args.copies)
+    player_id = before.execute('SELECT player_id FROM portfolio LIMIT 1').fetchone()[0]
+    parameters = {'year': YEAR, 'stock_id': STOCK_IDS[0], 'player_id': player_id}
+    sizes = ', '.join(f"{table} {after.execute(f'SELECT count(*) FROM {table}').fetchone()[0]}" for table in GROWN_TABLES)
+    print(f"Before: the database as shipped. After: migrated to {revision}. Rows: {sizes}\n")
+
+    total_before = total_after = 0
+    for name, sql in QUERIES:
+        before_seconds = best_time(before, sql, parameters, args.repeat)
+        after_seconds = best_time(after, sql, parameters, args.repeat)
+        total_before += before_seconds
+        total_after += after_seconds
+        print(name)
+        print(f"  before {before_seconds * 1e6:9.1f} us   {' / '.join(plan(before, sql, parameters))}")
+        print(f"  after  {after_seconds * 1e6:9.1f} us   {' / '.join(plan(after, sql, parameters))}")
+    print(f"\nAll queries: before {total_before * 1000:.2f} ms, after {total_after * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Hold many idle /api/stream connections and measure publish-to-delivery latency.
+
+Usage: python benchmarks/stream_capacity.py [--connections 400] [--players 100] [--ticks 5]
+
+Connections past STREAM_MAX_CONNECTIONS are refused with a 503 and reported as such.
+"""
+import argparse
+import json
+import selectors
+import socket
+import statistics
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+from common import load_app, percentile
+
+
+def open_stream(port, path):
+    sock = socket.create_connection(('127.0.0.1', port))
+    sock.sendall(f"GET {path} HTTP/1.1\r\nHost: localhost\r\nAccept: text/event-stream\r\n\r\n".encode())
+    sock.setblocking(False)
+    return sock
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--connections', type=int, default=400)
+    parser.add_argument('--players', type=int, default=100, help='connections that also join a player channel')
+    parser.add_argument('--ticks', type=int, default=5)
+    parser.add_argument('--year', type=int, default=1960)
+    args = parser.parse_args()
+
+    game_app = load_app()
+    flask_app = game_app.app
+
+    with flask_app.app_context():
+        tokens = []
+        client = flask_app.test_client()
+        for index in range(args.players):
+            tokens.append(client.post('/api/login', json={'teamName': f'Stream Team {index}'}).get_json()['token'])
+        game_app.current_year = args.year
+
+    server = make_server('127.0.0.1', 0, flask_app, threaded=True)
+    port = server.server_port
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    selector = selectors.DefaultSelector()
+    buffers = {}
+    for index in range(args.connections):
+        path = f"/api/stream?token={tokens[index]}" if index < len(tokens) else '/api/stream'
+        sock = open_stream(port, path)
+        selector.register(sock, selectors.EVENT_READ)
+        buffers[sock] = b''
+
+    # Wait until the broker has registered every connection
+    deadline = time.time() + 30
+    while sum(game_app.stream_broker.stats()[key] for key in ('connections', 'refused')) < args.connections \
+            and time.time() < deadline:
+        time.sleep(0.05)
+    held = game_app.stream_broker.stats()['connections']
+    if game_app.stream_broker.refused:
+        print(f"Refused: {game_app.stream_broker.refused} past the cap of {game_app.stream_broker.max_connections}")
+    print(f"Connections held: {held} ({game_app.stream_broker.stats()['player_connections']} on player channels)")
+
+    def drain(timeout, until=None):
+        """Read from every socket; return {sock: receive time} for sockets whose buffer gained `until`."""
+        received = {}
+        end = time.time() + timeout
+        while time.time() < end:
+            for key, _ in selector.select(timeout=0.05):
+                try:
+                    chunk = key.fileobj.recv(65536)
+                except BlockingIOError:
+                    continue
+                if not chunk:
+                    selector.unregister(key.fileobj)
+                    continue
+                buffers[key.fileobj] += chunk
+                if until and until in buffers[key.fileobj] and key.fileobj not in received:
+                    received[key.fileobj] = time.time()
+            if until and len(received) == len(buffers):
+                break
+        return received
+
+    drain(1.0)
+    latencies = []
+    publish_times = []
+    with flask_app.app_context():
+        for tick in range(args.ticks):
+            for sock in buffers:
+                buffers[sock] = b''
+            start = time.time()
+            game_app.publish_tick(args.year)
+            publish_times.append(time.time() - start)
+            received = drain(10.0, until=b'event: tick')
+            for sock, received_at in received.items():
+                payload = buffers[sock].split(b'event: tick\ndata: ', 1)[1].split(b'\n', 1)[0]
+                latencies.append(received_at - json.loads(payload)['published_at'])
+            print(f"Tick {tick + 1}: delivered to {len(received)}/{held} connections")
+
+    server.shutdown()
+    if latencies:
+        print(f"publish_tick():           mean {statistics.mean(publish_times) * 1000:.1f} ms")
+        print(f"Publish-to-delivery:      p50 {percentile(latencies, 0.5) * 1000:.1f} ms   "
+              f"p95 {percentile(latencies, 0.95) * 1000:.1f} ms   max {max(latencies) * 1000:.1f} ms")
+    print(f"Broker stats: {game_app.stream_broker.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Synthetic game data for the benchmarks: teams, holdings, completed sales,
+watch-list entries and market events, seeded into the scratch database.
+"""
+import random
+
+
+def seed_game(game_app, year, players=100, holdings=10, sales=20, watch_list=5, events=4, seed=1):
+    """
+    Set the game to year and add players teams, each with holdings stocks,
+    sales completed sales and watch_list watch-list entries, plus events
+    market events and supply-demand modifiers for the year. Returns the new
+    player ids.
+    """
+    db = game_app.db
+    rng = random.Random(seed)
+
+    game = db.session.query(game_app.Game).first()
+    game.current_year = year
+    db.session.commit()
+    game_app.current_year = year
+    game_app.invalidate_price_snapshots()
+
+    stocks = game_app.get_price_snapshot(year).stocks
+    listed = [stock for stock in stocks if game_app.get_active_price(stock) > 0] or list(stocks)
+    categories = sorted({stock.category for stock in stocks})
+
+    existing = db.session.query(game_app.Player).count()
+    teams = [
+        game_app.Player(name=f'Synthetic Team {existing + index}', balance=rng.uniform(0, 2000))
+        for index in range(players)
+    ]
+    db.session.add_all(teams)
+    db.session.flush()
+
+    for team in teams:
+        for stock in rng.sample(listed, min(holdings, len(listed))):
+            db.session.add(game_app.Portfolio(
+                player_id=team.player_id, stock_id=stock.stock_id, quantity=rng.randint(1, 50),
+                purchase_price=max(stock.price, 1), year_purchased=rng.randint(max(1900, year - 20), year)
+            ))
+        for _ in range(sales):
+            stock = rng.choice(listed)
+            quantity = rng.randint(1, 50)
+            bought, sold = max(stock.price, 1), max(stock.price, 1) * rng.uniform(0.5, 2)
+            db.session.add(game_app.CompletedSale(
+                player_id=team.player_id, stock_name=stock.name, stock_id=stock.stock_id,
+                price_purchased=bought, quantity_sold=quantity, price_sold=sold,
+                profit=(sold - bought) * quantity, percentage_return=(sold - bought) / bought * 100,
+                sale_year=rng.randint(max(1900, year - 20), year)
+            ))
+        for stock in rng.sample(stocks, min(watch_list, len(stocks))):
+            db.session.add(game_app.WatchList(
+                player_id=team.player_id, stock_id=stock.stock_id, birth_alert=rng.random() < 0.5,
+                value_alert=max(stock.price, 1) * rng.uniform(1, 3), value_alert_enabled=True
+            ))
+
+    for index in range(events):
+        sector = None if index % 2 == 0 else rng.choice(categories).upper()
+        db.session.add(game_app.MarketDynamics(
+            year=year, effect_description=f'Synthetic event {index}', sector=sector,
+            price_change_factor=rng.uniform(0.8, 1.2), demand_change_factor=1.0
+        ))
+    db.session.add_all([
+        game_app.SupplyDemand(stock_id=stock.stock_id, year=year, demand_modifier=rng.uniform(0.8, 1.3))
+        for stock in rng.sample(stocks, len(stocks) // 3)
+    ])
+    db.session.commit()
+
+    game_app.invalidate_price_snapshots()
+    game_app.player_leaderboard.clear()
+    game_app.clear_alerts()
+    return [team.player_id for team in teams]
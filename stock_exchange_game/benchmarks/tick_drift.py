@@ -0,0 +1,66 @@
+"""
+Run the tick scheduler with short year intervals and measure how far the ticks drift.
+
+Usage: python benchmarks/tick_drift.py [--years 20] [--interval 0.5] [--teams 200]
+
+Every year gets --interval seconds (alternating with 2 x --interval when --vary is
+given). The real update_year runs against a seeded scratch database, and the start of
+every tick is compared with where it should have been: the game's start plus the sum
+of the intervals so far. A scheduler that sleeps a fixed interval after each tick
+drifts by the tick time every year; this one should stay within a few milliseconds.
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from common import load_app, percentile
+from synthetic import seed_game
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=int, default=20)
+    parser.add_argument('--interval', type=float, default=0.5, help='seconds per year')
+    parser.add_argument('--vary', action='store_true', help='alternate between 1x and 2x the interval')
+    parser.add_argument('--teams', type=int, default=200)
+    parser.add_argument('--year', type=int, default=1960)
+    args = parser.parse_args()
+
+    game_app = load_app()
+    with game_app.app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+        game_app.ensure_ai_players()
+        seed_game(game_app, args.year, args.teams, holdings=10, sales=0, watch_list=5, events=0)
+
+    def interval_for(year):
+        return args.interval * (2 if args.vary and year % 2 else 1)
+
+    end_year = args.year + args.years
+    starts = []
+
+    def tick():
+        starts.append(time.monotonic())
+        return game_app.run_scheduled_tick()
+
+    scheduler = game_app.TickScheduler(tick, interval_for, lambda year: year >= end_year)
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.monotonic()
+        scheduler.start(args.year)
+        scheduler.thread.join()
+
+    expected = started
+    drift = []
+    for year, start in zip(range(args.year, end_year), starts):
+        expected += interval_for(year)
+        drift.append(start - expected)
+
+    stats = scheduler.stats()
+    print(f"{len(starts)} ticks, tick latency mean {stats['latency_ms']['mean']} ms, max {stats['latency_ms']['max']} ms, "
+          f"{stats['overruns']} overruns")
+    print(f"drift from schedule: p50 {percentile(drift, 0.5) * 1000:.2f} ms, p95 {percentile(drift, 0.95) * 1000:.2f} ms, "
+          f"max {max(drift) * 1000:.2f} ms, last {drift[-1] * 1000:.2f} ms")
+    print(f"a fixed sleep after each tick would have drifted by {sum(scheduler.latencies) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Run several app processes against one database and check that exactly one runs ticks.
+
+Usage: python benchmarks/tick_leader_failover.py [--workers 3] [--interval 0.5]
+                                                 [--lease 1.5] [--kills 2]
+
+Each worker imports the app, as a gunicorn worker would, and joins the tick election
+with every year shortened to --interval seconds. The game is started in the database,
+then the current leader is killed with SIGKILL --kills times. The year is sampled
+every 20 ms throughout. The run fails if the year ever moves by more than one at a
+time or faster than the interval allows, which is what two leaders ticking at once
+would do. Failover time is how long the year stood still after each kill.
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import sqlite3
+import sys
+import time
+
+from common import load_app
+
+POLL_SECONDS = 0.02
+
+
+def worker(database, lease_seconds, interval):
+    os.environ['DATABASE_URL'] = os.environ['DATABASE_URI'] = f'sqlite:///{database}'
+    os.environ['TICK_LEADER_ELECTION'] = 'True'
+    os.environ['TICK_LEASE_SECONDS'] = str(lease_seconds)
+    os.environ['AI_WORKERS'] = '1'
+    os.chdir(os.path.dirname(database))
+    sys.stdout = open(os.devnull, 'w')
+
+    import app as game_app
+    for year in game_app.time_intervals:
+        game_app.time_intervals[year] = interval
+    game_app.tick_leader.start()
+    while True:
+        time.sleep(60)
+
+
+def read_state(connection):
+    year = connection.execute('SELECT current_year FROM game').fetchone()[0]
+    lease = connection.execute("SELECT holder, term FROM tick_lease WHERE name = 'ticks'").fetchone()
+    return year, lease
+
+
+def watch(connection, seconds, samples):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        try:
+            year, lease = read_state(connection)
+        except sqlite3.OperationalError:
+            year, lease = None, None  # Locked or the lease table not created yet
+        if year is not None:
+            samples.append((time.monotonic(), year, lease))
+        time.sleep(POLL_SECONDS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--interval', type=float, default=0.5, help='seconds per year')
+    parser.add_argument('--lease', type=float, default=1.5, help='tick lease in seconds')
+    parser.add_argument('--kills', type=int, default=2)
+    parser.add_argument('--settle', type=float, default=4, help='seconds to watch between kills')
+    parser.add_argument('--year', type=int, default=1950)
+    args = parser.parse_args()
+
+    game_app = load_app()
+    with game_app.app.app_context():
+        database = game_app.db.engine.url.database
+    connection = sqlite3.connect(database, timeout=10)
+    connection.execute('UPDATE game SET current_year = ?, game_running = 1', (args.year,))
+    connection.commit()
+
+    context = multiprocessing.get_context('spawn')
+    processes = {}
+    for _ in range(args.workers):
+        process = context.Process(target=worker, args=(database, args.lease, args.interval), daemon=True)
+        process.start()
+        processes[process.pid] = process
+    print(f"{args.workers} workers, {args.interval}s years, {args.lease}s lease")
+
+    samples = []
+    kills = []
+    try:
+        # Workers take a few seconds to import the app
+        deadline = time.monotonic() + 60
+        while not (read_state(connection)[1] or (None,))[0]:
+            if time.monotonic() > deadline:
+                raise SystemExit("No worker took the tick lease")
+            time.sleep(0.1)
+        watch(connection, args.settle, samples)
+        for _ in range(args.kills):
+            _, lease = read_state(connection)
+            if not lease or not lease[0]:
+                raise SystemExit("No worker took the tick lease")
+            pid = int(lease[0].split(':')[1])
+            os.kill(pid, signal.SIGKILL)
+            processes.pop(pid).join()
+            kills.append((time.monotonic(), samples[-1][1], lease[1]))
+            print(f"Killed leader {pid} (term {lease[1]}) in year {samples[-1][1]}")
+            watch(connection, args.settle, samples)
+    finally:
+        connection.execute('UPDATE game SET game_running = 0')
+        connection.commit()
+        for process in processes.values():
+            process.kill()
+
+    violations = []
+    changes = []
+    for (previous_time, previous_year, _), (now, year, _) in zip(samples, samples[1:]):
+        if year != previous_year:
+            changes.append(now)
+            if year != previous_year + 1:
+                violations.append(f"year jumped from {previous_year} to {year}")
+    for previous, now in zip(changes, changes[1:]):
+        # Allow for the polling interval and a slow tick finishing late
+        if now - previous < args.interval * 0.5:
+            violations.append(f"two ticks {now - previous:.3f}s apart")
+
+    terms = sorted({sample[2][1] for sample in samples if sample[2]})
+    print(f"Years {samples[0][1]} -> {samples[-1][1]} in {samples[-1][0] - samples[0][0]:.1f}s, "
+          f"{len(changes)} ticks, lease terms {terms}")
+    for killed_at, year, term in kills:
+        resumed = next((now for now in changes if now > killed_at), None)
+        if resumed is None:
+            violations.append(f"no tick after killing the leader in year {year}")
+        else:
+            print(f"Leader of term {term} killed: next tick {resumed - killed_at:.2f}s later")
+    if violations:
+        for violation in violations:
+            print(f"  {violation}")
+        raise SystemExit(f"{len(violations)} violations")
+    print("One tick at a time throughout")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,363 @@
+"""
+Fire concurrent buy/sell batches at /api/update_portfolio, then check that no cash
+or shares were created or lost.
+
+Usage: python benchmarks/trading_stress.py [--teams 20] [--sessions 3] [--batches 5000]
+                                           [--concurrency 32] [--tick-seconds 5]
+                                           [--url http://127.0.0.1:8000 --database game.db]
+
+Every team logs in --sessions times, so the same team trades from several tokens at
+once, as it would from duplicate browser tabs or across gunicorn workers. Each batch
+has one to --legs buys and sells. By default the app is served locally on a seeded
+scratch database and update_year runs every --tick-seconds alongside the trading.
+With --url the batches go to an app you started yourself, and --database must point
+at its SQLite file so the final state can be checked.
+
+Checks, for every team, against the batches the server acknowledged with 200:
+- shares: final Portfolio quantity = starting quantity + bought - sold
+- sales: the new CompletedSale rows add up to exactly the shares sold
+- cash: final balance = starting balance + sale proceeds - cost of buys, taking the
+  cost of buys from the fills in each response. For a server that does not report
+  fills, each buy is bounded by the lowest and highest price the stock could have had
+  in the years the run covered
+- no negative balances or holdings
+Exits non-zero if any check fails.
+"""
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from common import percentile
+
+TOLERANCE = 1e-6
+
+
+def login(host, port, team_name):
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    connection.request('POST', '/api/login', body=json.dumps({'teamName': team_name}),
+                       headers={'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    if response.status != 200:
+        raise SystemExit(f"Login failed for {team_name}: {response.status}")
+    token = json.loads(response.read())['token']
+    connection.close()
+    return token
+
+
+def read_state(database, names):
+    """
+    Balances, holdings and the last sale id for the named teams, read straight from SQLite.
+    """
+    connection = sqlite3.connect(database, timeout=30)
+    try:
+        placeholders = ','.join('?' * len(names))
+        players = {name: (player_id, balance) for player_id, name, balance in connection.execute(
+            f"SELECT player_id, name, balance FROM player WHERE name IN ({placeholders})", names)}
+        holdings = defaultdict(int)
+        for player_id, stock_id, quantity in connection.execute(
+                "SELECT player_id, stock_id, quantity FROM portfolio"):
+            holdings[player_id, stock_id] += quantity
+        last_sale_id = connection.execute("SELECT COALESCE(MAX(sale_id), 0) FROM completed_sale").fetchone()[0]
+        year = connection.execute("SELECT current_year FROM game LIMIT 1").fetchone()[0]
+    finally:
+        connection.close()
+    return {'players': players, 'holdings': holdings, 'last_sale_id': last_sale_id, 'year': year}
+
+
+def read_sales(database, after_sale_id):
+    connection = sqlite3.connect(database, timeout=30)
+    try:
+        return connection.execute(
+            "SELECT player_id, stock_id, quantity_sold, price_sold FROM completed_sale WHERE sale_id > ?",
+            (after_sale_id,)
+        ).fetchall()
+    finally:
+        connection.close()
+
+
+def price_bounds(database, first_year, last_year):
+    """
+    {stock_id: (lowest, highest)} price a trade could have been filled at in the years,
+    following the clamp in apply_price_adjustments.
+    """
+    connection = sqlite3.connect(database, timeout=30)
+    bounds = {}
+    try:
+        for stock_id, price in connection.execute(
+                "SELECT stock_id, price FROM stock WHERE year BETWEEN ? AND ?", (first_year, last_year)):
+            low, high = (price, price) if price < 8 else (max(price - 10, 0), price + 10)
+            if stock_id in bounds:
+                low, high = min(low, bounds[stock_id][0]), max(high, bounds[stock_id][1])
+            bounds[stock_id] = (low, high)
+    finally:
+        connection.close()
+    return bounds
+
+
+def start_local_app(args):
+    """
+    Serve the app on a scratch database with synthetic teams. Returns
+    (host, port, game_app, team names, database path).
+    """
+    from werkzeug.serving import make_server
+
+    import common
+    from synthetic import seed_game
+
+    game_app = common.load_app()
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    with game_app.app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+        game_app.ensure_ai_players()
+        player_ids = seed_game(game_app, args.year, args.teams, holdings=5, sales=0, watch_list=0, events=0)
+        names = [game_app.db.session.get(game_app.Player, player_id).name for player_id in player_ids]
+    game_app.game_running = True
+
+    server = make_server('127.0.0.1', 0, game_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return '127.0.0.1', server.server_port, game_app, names, common.scratch_database
+
+
+def drive_ticks(game_app, interval, stop, ticks):
+    while not stop.wait(interval):
+        with contextlib.redirect_stdout(io.StringIO()):
+            game_app.update_year()
+        ticks.append(time.monotonic())
+
+
+class Trader:
+    """
+    Sends batches for any team and session and records, per team and stock, what the
+    server acknowledged.
+    """
+    def __init__(self, host, port, stock_ids, legs, rng):
+        self.host, self.port = host, port
+        self.stock_ids = stock_ids
+        self.legs = legs
+        self.rng = rng
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.acknowledged = defaultdict(int)  # (team, stock_id) -> net shares bought
+        self.sold = defaultdict(int)          # (team, stock_id) -> shares sold
+        self.bought = defaultdict(int)        # (team, stock_id) -> shares bought
+        self.believed = defaultdict(int)      # (team, stock_id) -> shares the team thinks it holds
+        self.latencies = []
+        self.statuses = defaultdict(int)
+        self.spent = defaultdict(float)       # team -> exact cost of buys, from the response fills
+        self.unpriced = set()                 # teams with an acknowledged batch that reported no fills
+
+    def connection(self):
+        if not hasattr(self.local, 'connection'):
+            self.local.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        return self.local.connection
+
+    def make_batch(self, team):
+        with self.lock:
+            held = [stock_id for (name, stock_id), quantity in self.believed.items() if name == team and quantity > 0]
+            batch = {}
+            for _ in range(self.rng.randint(1, self.legs)):
+                if held and self.rng.random() < 0.5:
+                    stock_id = self.rng.choice(held)
+                    batch[str(stock_id)] = -self.rng.randint(1, max(1, self.believed[team, stock_id]))
+                else:
+                    batch[str(self.rng.choice(self.stock_ids))] = self.rng.randint(1, 5)
+            return batch
+
+    def send(self, team, token):
+        batch = self.make_batch(team)
+        connection = self.connection()
+        started = time.monotonic()
+        try:
+            connection.request('POST', '/api/update_portfolio', body=json.dumps(batch),
+                               headers={'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            body = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            body, status = b'', None
+        latency = time.monotonic() - started
+
+        with self.lock:
+            self.latencies.append(latency)
+            self.statuses[status] += 1
+            if status == 200:
+                fills = json.loads(body).get('fills')
+                if fills is None:
+                    self.unpriced.add(team)
+                else:
+                    self.spent[team] -= sum(fill['value'] for fill in fills if fill['quantity'] > 0)
+                for stock_id, change in batch.items():
+                    key = (team, int(stock_id))
+                    self.acknowledged[key] += change
+                    self.believed[key] += change
+                    if change > 0:
+                        self.bought[key] += change
+                    else:
+                        self.sold[key] -= change
+        return status
+
+
+def check_invariants(before, after, sales, bounds, trader):
+    """
+    Return a list of violations, one string each.
+    """
+    violations = []
+    player_names = {player_id: name for name, (player_id, _) in after['players'].items()}
+
+    # Shares
+    keys = {key for key in trader.acknowledged} | {
+        (player_names[player_id], stock_id) for player_id, stock_id in after['holdings'] if player_id in player_names
+    }
+    for team, stock_id in sorted(keys):
+        player_id = after['players'][team][0]
+        expected = before['holdings'].get((player_id, stock_id), 0) + trader.acknowledged.get((team, stock_id), 0)
+        actual = after['holdings'].get((player_id, stock_id), 0)
+        if actual != expected:
+            violations.append(f"{team} stock {stock_id}: holds {actual} shares, acknowledged trades give {expected}")
+        if actual < 0:
+            violations.append(f"{team} stock {stock_id}: negative holding {actual}")
+
+    # Sales and cash
+    sold_by_key = defaultdict(int)
+    proceeds = defaultdict(float)
+    for player_id, stock_id, quantity, price in sales:
+        if player_id in player_names:
+            sold_by_key[player_names[player_id], stock_id] += quantity
+            proceeds[player_names[player_id]] += quantity * price
+    for key in sorted(set(sold_by_key) | set(trader.sold)):
+        if sold_by_key.get(key, 0) != trader.sold.get(key, 0):
+            violations.append(f"{key[0]} stock {key[1]}: {sold_by_key.get(key, 0)} shares in CompletedSale, "
+                              f"{trader.sold.get(key, 0)} sold in acknowledged trades")
+
+    for team, (player_id, balance) in sorted(after['players'].items()):
+        if balance < -TOLERANCE:
+            violations.append(f"{team}: negative balance {balance:.2f}")
+        start = before['players'][team][1] + proceeds[team]
+        if team not in trader.unpriced:
+            expected = start - trader.spent[team]
+            if abs(balance - expected) > TOLERANCE * max(1, abs(expected)):
+                violations.append(f"{team}: balance {balance:.6f}, acknowledged fills give {expected:.6f}")
+            continue
+        cheapest = sum(quantity * bounds[stock_id][0] for (name, stock_id), quantity in trader.bought.items() if name == team)
+        dearest = sum(quantity * bounds[stock_id][1] for (name, stock_id), quantity in trader.bought.items() if name == team)
+        if not start - dearest - TOLERANCE <= balance <= start - cheapest + TOLERANCE:
+            violations.append(f"{team}: balance {balance:.2f} outside {start - dearest:.2f}..{start - cheapest:.2f} "
+                              f"from its starting balance, sale proceeds and buys")
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--teams', type=int, default=20)
+    parser.add_argument('--sessions', type=int, default=3, help='logins (tokens) per team trading at once')
+    parser.add_argument('--batches', type=int, default=5000)
+    parser.add_argument('--legs', type=int, default=3, help='most stocks in one batch')
+    parser.add_argument('--concurrency', type=int, default=32, help='batches in flight')
+    parser.add_argument('--tick-seconds', type=float, default=5, help='local mode: seconds between ticks, 0 for none')
+    parser.add_argument('--year', type=int, default=1960, help='local mode: starting year')
+    parser.add_argument('--url', help='trade against an app that is already running')
+    parser.add_argument('--database', help='with --url: the SQLite file the app uses')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+    if args.url and not args.database:
+        parser.error('--url needs --database to check the final state')
+    # load_app changes directory, so resolve the file paths first
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    stop = threading.Event()
+    ticks = []
+    quiet = contextlib.redirect_stdout(io.StringIO())
+    if args.url:
+        target = urlsplit(args.url)
+        host, port = target.hostname, target.port or 80
+        names = [f'Stress Team {index}' for index in range(args.teams)]
+        database = os.path.abspath(args.database)
+        tick_thread = None
+        quiet = contextlib.nullcontext()
+    else:
+        host, port, game_app, names, database = start_local_app(args)
+        tick_thread = threading.Thread(target=drive_ticks, args=(game_app, args.tick_seconds, stop, ticks), daemon=True)
+
+    with quiet:
+        sessions = [(name, login(host, port, name)) for name in names for _ in range(args.sessions)]
+    before = read_state(database, names)
+    connection = sqlite3.connect(database)
+    stock_ids = [row[0] for row in connection.execute(
+        "SELECT stock_id FROM stock WHERE year = ? AND price > 0", (before['year'],))]
+    connection.close()
+
+    rng = random.Random(args.seed)
+    trader = Trader(host, port, stock_ids, args.legs, rng)
+    team_names = {player_id: name for name, (player_id, _) in before['players'].items()}
+    for (player_id, stock_id), quantity in before['holdings'].items():
+        if player_id in team_names:
+            trader.believed[team_names[player_id], stock_id] = quantity
+
+    print(f"{len(names)} teams x {args.sessions} sessions, {args.batches} batches, {args.concurrency} in flight, "
+          f"against {args.url or f'http://{host}:{port} (local)'}")
+    with quiet:
+        started = time.monotonic()
+        if tick_thread and args.tick_seconds > 0:
+            tick_thread.start()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for _ in range(args.batches):
+                pool.submit(trader.send, *rng.choice(sessions))
+        stop.set()
+        elapsed = time.monotonic() - started
+        if tick_thread and tick_thread.is_alive():
+            tick_thread.join()
+
+    after = read_state(database, names)
+    sales = read_sales(database, before['last_sale_id'])
+    bounds = price_bounds(database, before['year'], after['year'])
+    violations = check_invariants(before, after, sales, bounds, trader)
+
+    succeeded = trader.statuses.get(200, 0)
+    print(f"{sum(trader.statuses.values())} batches in {elapsed:.1f}s: {succeeded / elapsed:.1f} filled batches/s, "
+          f"{sum(trader.statuses.values()) / elapsed:.1f} batches/s, {len(ticks)} ticks")
+    print(f"Responses: {dict(sorted(trader.statuses.items(), key=str))}")
+    print(f"Latency: p50 {percentile(trader.latencies, 0.5) * 1000:.1f} ms   "
+          f"p95 {percentile(trader.latencies, 0.95) * 1000:.1f} ms   "
+          f"p99 {percentile(trader.latencies, 0.99) * 1000:.1f} ms   max {max(trader.latencies) * 1000:.1f} ms")
+    print(f"Shares bought {sum(trader.bought.values())}, sold {sum(trader.sold.values())}, "
+          f"new CompletedSale rows {len(sales)}")
+
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump({
+                'teams': len(names),
+                'sessions': args.sessions,
+                'batches': sum(trader.statuses.values()),
+                'seconds': round(elapsed, 2),
+                'batches_per_second': round(sum(trader.statuses.values()) / elapsed, 2),
+                'filled_batches_per_second': round(succeeded / elapsed, 2),
+                'responses': {str(status): count for status, count in trader.statuses.items()},
+                'p50_ms': round(percentile(trader.latencies, 0.5) * 1000, 2),
+                'p95_ms': round(percentile(trader.latencies, 0.95) * 1000, 2),
+                'p99_ms': round(percentile(trader.latencies, 0.99) * 1000, 2),
+                'ticks': len(ticks),
+                'violations': violations,
+            }, f, indent=2)
+        print(f"Results written to {json_path}")
+
+    if violations:
+        for violation in violations[:20]:
+            print(f"  {violation}")
+        raise SystemExit(f"{len(violations)} invariant violations")
+    print("Cash and shares are conserved for every team.")
+
+
+if __name__ == '__main__':
+    main()
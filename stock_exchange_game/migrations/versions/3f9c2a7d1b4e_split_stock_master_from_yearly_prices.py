@@ -0,0 +1,124 @@
+"""Split stock names and categories into stock_master and index the hot filters
+
+Revision ID: 3f9c2a7d1b4e
+Revises:
+Create Date: 2026-10-17 10:12:41.308215
+
+stock held a copy of every stock's name and category in each yearly row, and
+portfolio, completed_sale, watch_list, supply_demand and standing_order pointed
+their foreign keys at stock.stock_id, which is not unique. Names and categories
+move to stock_master (one row per stock_id), stock becomes the (stock_id, year)
+price table, and the foreign keys point at stock_master instead.
+
+Tables this database never had are skipped, as are foreign keys it never
+declared, so the same revision upgrades every copy of the game database.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2a7d1b4e'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Gives SQLite's unnamed foreign keys a name, so batch mode can drop them
+NAMING_CONVENTION = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+
+STOCK_REFERENCES = ['portfolio', 'completed_sale', 'watch_list', 'supply_demand', 'standing_order']
+
+INDEXES = [
+    ('ix_portfolio_player_id_stock_id', 'portfolio', ['player_id', 'stock_id']),
+    ('ix_completed_sale_sale_year_stock_id', 'completed_sale', ['sale_year', 'stock_id']),
+    ('ix_supply_demand_year_stock_id', 'supply_demand', ['year', 'stock_id']),
+    ('ix_historical_events_feed_year_stock_id', 'historical_events_feed', ['year', 'stock_id']),
+]
+
+
+def inspector():
+    return sa.inspect(op.get_bind())
+
+
+def stock_id_foreign_keys(table):
+    return [
+        foreign_key for foreign_key in inspector().get_foreign_keys(table)
+        if foreign_key['constrained_columns'] == ['stock_id']
+    ]
+
+
+def point_stock_id_at(table, referred_table):
+    """
+    Replace whatever foreign key the table's stock_id column has with one to referred_table.
+    """
+    if not inspector().has_table(table):
+        return
+    stale = stock_id_foreign_keys(table)
+    # Some copies reference tables that no longer exist, so referred tables are not reflected
+    with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION,
+                              reflect_kwargs={'resolve_fks': False}) as batch_op:
+        for foreign_key in stale:
+            name = foreign_key['name'] or NAMING_CONVENTION['fk'] % {
+                'table_name': table, 'column_0_name': 'stock_id', 'referred_table_name': foreign_key['referred_table']
+            }
+            batch_op.drop_constraint(name, type_='foreignkey')
+        if referred_table:
+            batch_op.create_foreign_key(f'fk_{table}_stock_id_{referred_table}', referred_table, ['stock_id'], ['stock_id'])
+
+
+def upgrade():
+    # SQLite DDL is not transactional, so a failed run can leave stock_master behind
+    if not inspector().has_table('stock_master'):
+        op.create_table(
+            'stock_master',
+            sa.Column('stock_id', sa.Integer(), autoincrement=False, nullable=False),
+            sa.Column('name', sa.String(length=50), nullable=False),
+            sa.Column('category', sa.String(length=50), nullable=False),
+            sa.PrimaryKeyConstraint('stock_id', name='pk_stock_master')
+        )
+    # Each stock's first row supplies its name and category, and only the first row
+    # for any (stock_id, year) is kept, as every price read already did
+    op.execute(
+        "INSERT INTO stock_master (stock_id, name, category) "
+        "SELECT stock_id, name, category FROM stock WHERE id IN (SELECT MIN(id) FROM stock GROUP BY stock_id) "
+        "AND stock_id NOT IN (SELECT stock_id FROM stock_master)"
+    )
+    op.execute("DELETE FROM stock WHERE id NOT IN (SELECT MIN(id) FROM stock GROUP BY stock_id, year)")
+
+    for table in STOCK_REFERENCES:
+        point_stock_id_at(table, 'stock_master')
+
+    with op.batch_alter_table('stock', naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_column('name')
+        batch_op.drop_column('category')
+        batch_op.create_unique_constraint('uq_stock_stock_id_year', ['stock_id', 'year'])
+        batch_op.create_foreign_key('fk_stock_stock_id_stock_master', 'stock_master', ['stock_id'], ['stock_id'])
+        batch_op.create_index('ix_stock_year', ['year'])
+
+    for name, table, columns in INDEXES:
+        if inspector().has_table(table) and name not in {index['name'] for index in inspector().get_indexes(table)}:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in INDEXES:
+        if inspector().has_table(table) and name in {index['name'] for index in inspector().get_indexes(table)}:
+            op.drop_index(name, table_name=table)
+
+    with op.batch_alter_table('stock', naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.add_column(sa.Column('name', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('category', sa.String(length=50), nullable=True))
+    op.execute("UPDATE stock SET name = (SELECT name FROM stock_master WHERE stock_master.stock_id = stock.stock_id)")
+    op.execute("UPDATE stock SET category = (SELECT category FROM stock_master WHERE stock_master.stock_id = stock.stock_id)")
+    with op.batch_alter_table('stock', naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.alter_column('name', existing_type=sa.String(length=50), nullable=False)
+        batch_op.alter_column('category', existing_type=sa.String(length=50), nullable=False)
+        batch_op.drop_index('ix_stock_year')
+        batch_op.drop_constraint('fk_stock_stock_id_stock_master', type_='foreignkey')
+        batch_op.drop_constraint('uq_stock_stock_id_year', type_='unique')
+
+    # stock.stock_id is not unique again, so nothing can reference it
+    for table in STOCK_REFERENCES:
+        point_stock_id_at(table, None)
+
+    op.drop_table('stock_master')
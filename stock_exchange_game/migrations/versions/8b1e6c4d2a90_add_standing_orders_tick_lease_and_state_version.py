@@ -0,0 +1,70 @@
+"""Add standing_order, tick_lease and game.state_version
+
+Revision ID: 8b1e6c4d2a90
+Revises: 3f9c2a7d1b4e
+Create Date: 2026-10-17 19:02:11.604388
+
+These were created from the models by create_all, and state_version by an ALTER
+TABLE, when each worker imported the app. Copies that already have them are
+left as they are, so this revision upgrades those and fresh copies alike.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b1e6c4d2a90'
+down_revision = '3f9c2a7d1b4e'
+branch_labels = None
+depends_on = None
+
+
+def inspector():
+    return sa.inspect(op.get_bind())
+
+
+def upgrade():
+    if not inspector().has_table('standing_order'):
+        op.create_table(
+            'standing_order',
+            sa.Column('order_id', sa.Integer(), nullable=False),
+            sa.Column('player_id', sa.Integer(), nullable=False),
+            sa.Column('stock_id', sa.Integer(), nullable=False),
+            sa.Column('side', sa.String(length=4), nullable=False),
+            sa.Column('order_type', sa.String(length=5), nullable=False),
+            sa.Column('trigger_price', sa.Float(), nullable=False),
+            sa.Column('quantity', sa.Integer(), nullable=False),
+            sa.Column('status', sa.String(length=10), nullable=False),
+            sa.Column('placed_year', sa.Integer(), nullable=False),
+            sa.Column('filled_year', sa.Integer(), nullable=True),
+            sa.Column('fill_price', sa.Float(), nullable=True),
+            sa.ForeignKeyConstraint(['player_id'], ['player.player_id'], name='fk_standing_order_player_id_player'),
+            sa.ForeignKeyConstraint(['stock_id'], ['stock_master.stock_id'],
+                                    name='fk_standing_order_stock_id_stock_master'),
+            sa.PrimaryKeyConstraint('order_id', name='pk_standing_order')
+        )
+        op.create_index('ix_standing_order_player_id', 'standing_order', ['player_id'])
+        op.create_index('ix_standing_order_status', 'standing_order', ['status'])
+
+    if not inspector().has_table('tick_lease'):
+        op.create_table(
+            'tick_lease',
+            sa.Column('name', sa.String(length=20), nullable=False),
+            sa.Column('holder', sa.String(length=100), nullable=True),
+            sa.Column('expires_at', sa.Float(), nullable=False),
+            sa.Column('term', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('name', name='pk_tick_lease')
+        )
+
+    if 'state_version' not in {column['name'] for column in inspector().get_columns('game')}:
+        with op.batch_alter_table('game') as batch_op:
+            batch_op.add_column(sa.Column('state_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('game') as batch_op:
+        batch_op.drop_column('state_version')
+    op.drop_table('tick_lease')
+    op.drop_index('ix_standing_order_status', table_name='standing_order')
+    op.drop_index('ix_standing_order_player_id', table_name='standing_order')
+    op.drop_table('standing_order')
@@ -0,0 +1,28 @@
+"""Add game.ticks_paused
+
+Revision ID: a6d4e2f81c37
+Revises: e1a7d3b95c62
+Create Date: 2026-10-17 23:12:08.640193
+
+Whether the admin has paused the game clock, so the pause reaches whichever worker
+holds the tick lease.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d4e2f81c37'
+down_revision = 'e1a7d3b95c62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('game') as batch_op:
+        batch_op.add_column(sa.Column('ticks_paused', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+
+def downgrade():
+    with op.batch_alter_table('game') as batch_op:
+        batch_op.drop_column('ticks_paused')
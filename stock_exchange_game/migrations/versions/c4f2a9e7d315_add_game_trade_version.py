@@ -0,0 +1,28 @@
+"""Add game.trade_version
+
+Revision ID: c4f2a9e7d315
+Revises: 8b1e6c4d2a90
+Create Date: 2026-10-17 19:40:27.118052
+
+Bumped with game.state_version whenever a team trades or joins, so workers can tell
+that only the year's prices and the leaderboard have changed.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4f2a9e7d315'
+down_revision = '8b1e6c4d2a90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('game') as batch_op:
+        batch_op.add_column(sa.Column('trade_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('game') as batch_op:
+        batch_op.drop_column('trade_version')
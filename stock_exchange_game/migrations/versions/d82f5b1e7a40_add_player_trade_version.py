@@ -0,0 +1,28 @@
+"""Add player.trade_version
+
+Revision ID: d82f5b1e7a40
+Revises: a6d4e2f81c37
+Create Date: 2026-10-17 23:48:51.302774
+
+The game.trade_version of the last trade that changed the player's net worth, so other
+workers re-value just the players a trade touched.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd82f5b1e7a40'
+down_revision = 'a6d4e2f81c37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('player') as batch_op:
+        batch_op.add_column(sa.Column('trade_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('player') as batch_op:
+        batch_op.drop_column('trade_version')
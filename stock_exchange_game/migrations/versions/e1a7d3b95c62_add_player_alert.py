@@ -0,0 +1,41 @@
+"""Add player_alert
+
+Revision ID: e1a7d3b95c62
+Revises: c4f2a9e7d315
+Create Date: 2026-10-17 21:05:43.270915
+
+Fired watch-list alerts, so every worker answers /api/alerts from the same rows.
+AUTOINCREMENT keeps ids, which clients hold as cursors, from being reused.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1a7d3b95c62'
+down_revision = 'c4f2a9e7d315'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'player_alert',
+        sa.Column('alert_id', sa.Integer(), nullable=False),
+        sa.Column('player_id', sa.Integer(), nullable=False),
+        sa.Column('stock_id', sa.Integer(), nullable=False),
+        sa.Column('year', sa.Integer(), nullable=False),
+        sa.Column('alert_type', sa.String(length=5), nullable=False),
+        sa.Column('threshold', sa.Float(), nullable=True),
+        sa.Column('message', sa.String(length=200), nullable=False),
+        sa.ForeignKeyConstraint(['player_id'], ['player.player_id'], name='fk_player_alert_player_id_player'),
+        sa.ForeignKeyConstraint(['stock_id'], ['stock_master.stock_id'], name='fk_player_alert_stock_id_stock_master'),
+        sa.PrimaryKeyConstraint('alert_id', name='pk_player_alert'),
+        sqlite_autoincrement=True
+    )
+    op.create_index('ix_player_alert_player_id_alert_id', 'player_alert', ['player_id', 'alert_id'])
+
+
+def downgrade():
+    op.drop_index('ix_player_alert_player_id_alert_id', table_name='player_alert')
+    op.drop_table('player_alert')
@@ -0,0 +1,24 @@
+"""Index watch_list by stock and value alert
+
+Revision ID: f3c81a6d9b25
+Revises: d82f5b1e7a40
+Create Date: 2026-10-18 00:21:36.514902
+
+A tick reads only the watch-list rows whose alerts the year's price moves cross.
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c81a6d9b25'
+down_revision = 'd82f5b1e7a40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_watch_list_stock_id_value_alert', 'watch_list', ['stock_id', 'value_alert'])
+
+
+def downgrade():
+    op.drop_index('ix_watch_list_stock_id_value_alert', table_name='watch_list')
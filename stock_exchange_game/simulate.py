@@ -0,0 +1,110 @@
+"""
+Headless fast-forward of a whole game, for tuning bots and market events before a
+live session and as a performance regression check.
+
+Runs the same pricing and AI code as the live game from any start year to 2024 as
+fast as possible, against a scratch copy (or an in-memory copy) of the database, so
+the real database is never modified.
+
+Usage:
+    python simulate.py --start-year 1900 [--end-year 2024] [--bots 5] [--workers 1]
+                       [--seed tuning] [--reset-players] [--in-memory] [--json results.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DATABASE = os.path.join(APP_DIR, 'instance', 'stock_exchange_game.db')
+
+
+def load_game(source_database, in_memory=False):
+    """
+    Point the app at a copy of source_database and import it.
+    """
+    work_dir = tempfile.mkdtemp(prefix='stock_exchange_sim_')
+    if in_memory:
+        os.environ['DATABASE_URL'] = 'sqlite://'
+    else:
+        scratch_database = os.path.join(work_dir, 'stock_exchange_game.db')
+        shutil.copy(source_database, scratch_database)
+        os.environ['DATABASE_URL'] = f'sqlite:///{scratch_database}'
+    os.environ['DATABASE_URI'] = os.environ['DATABASE_URL']
+
+    os.chdir(work_dir)
+    sys.path.insert(0, APP_DIR)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as game_app
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if in_memory:
+        # Flask-SQLAlchemy keeps a single connection for in-memory SQLite, so load it in place
+        with game_app.app.app_context():
+            connection = game_app.db.engine.raw_connection()
+            source = sqlite3.connect(source_database)
+            source.backup(connection.driver_connection)
+            source.close()
+            connection.close()
+    game_app.upgrade_database()
+    return game_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--start-year', type=int, default=None, help='defaults to the game\'s current year')
+    parser.add_argument('--end-year', type=int, default=2024)
+    parser.add_argument('--database', default=DEFAULT_DATABASE)
+    parser.add_argument('--in-memory', action='store_true', help='run against an in-memory copy of the database')
+    parser.add_argument('--bots', type=int, help='number of AI bots (AI_BOT_COUNT)')
+    parser.add_argument('--workers', type=int, help='AI worker processes (AI_WORKERS)')
+    parser.add_argument('--seed', help='AI seed, for repeatable runs (AI_SEED)')
+    parser.add_argument('--reset-players', action='store_true', help='start from fresh bots and no teams')
+    parser.add_argument('--top', type=int, default=10, help='standings to print')
+    parser.add_argument('--json', help='also write the results to this file')
+    parser.add_argument('--verbose', action='store_true', help='show the game\'s own output')
+    args = parser.parse_args()
+
+    if args.bots is not None:
+        os.environ['AI_BOT_COUNT'] = str(args.bots)
+    if args.workers is not None:
+        os.environ['AI_WORKERS'] = str(args.workers)
+    if args.seed is not None:
+        os.environ['AI_SEED'] = args.seed
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    game_app = load_game(os.path.abspath(args.database), args.in_memory)
+
+    def report_tick(year, seconds, timings):
+        phases = '  '.join(f"{phase} {phase_seconds * 1000:6.1f}" for phase, phase_seconds in timings.items())
+        print(f"  -> {year}  {seconds * 1000:7.1f} ms   {phases}", file=sys.stderr)
+
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        results = game_app.simulate_game(args.start_year, args.end_year, args.reset_players,
+                                         on_tick=report_tick if args.verbose else None)
+
+    print(f"Simulated {results['start_year']} -> {results['end_year']}: {results['years']} years "
+          f"in {results['seconds']:.2f}s ({results['years_per_second']} years/sec, "
+          f"slowest tick {results['slowest_tick_seconds']}s)")
+    print("Per-phase timings:")
+    for phase, timing in results['phases'].items():
+        print(f"  {phase:<10} total {timing['total_seconds']:8.3f}s   mean {timing['mean_ms']:8.2f} ms/tick")
+    print("Final standings:")
+    for rank, row in enumerate(results['standings'][:args.top], start=1):
+        print(f"  {rank:>3}. {row['name']:<30} {row['total_value']:>12,.1f}")
+
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {json_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Shared fixtures for the unit tests. Run with python -m pytest -q from stock_exchange_game.
+
+The app is imported once per session against a scratch copy of the game database, so
+the real instance/stock_exchange_game.db is never touched.
+"""
+import os
+import shutil
+import sys
+
+import pytest
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DATABASE = os.path.join(APP_DIR, 'instance', 'stock_exchange_game.db')
+
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+
+@pytest.fixture(scope='session')
+def game_app(tmp_path_factory):
+    work_dir = tmp_path_factory.mktemp('stock_exchange_game')
+    database = os.path.join(work_dir, 'stock_exchange_game.db')
+    shutil.copy(DEFAULT_DATABASE, database)
+
+    os.environ['DATABASE_URL'] = os.environ['DATABASE_URI'] = f'sqlite:///{database}'
+    os.environ['SESSION_COOKIE_SECURE'] = 'False'
+    # Tests drive the game themselves, so no worker should start the game clock
+    # or pick up game state from anywhere else
+    os.environ['TICK_LEADER_ELECTION'] = 'False'
+    os.environ['GAME_STATE_SYNC'] = 'False'
+    os.environ['AI_WORKERS'] = '1'
+
+    # Keep any relative files the app writes out of the source tree
+    previous_dir = os.getcwd()
+    os.chdir(work_dir)
+    import app
+    app.upgrade_database()
+    yield app
+    os.chdir(previous_dir)
+
+
+@pytest.fixture
+def client(game_app):
+    return game_app.app.test_client()
@@ -0,0 +1,69 @@
+import multiprocessing
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from ai_strategies import AI_STRATEGIES, MarketSnapshot, Holding, bot_rng, decide_orders
+
+
+@pytest.fixture(scope='module')
+def market():
+    rng = random.Random(11)
+    stock_ids = tuple(range(1, 41))
+    prices = {stock_id: round(rng.uniform(0, 120), 2) for stock_id in stock_ids}
+    return MarketSnapshot(
+        year=1960,
+        stock_ids=stock_ids,
+        prices=prices,
+        previous_prices={stock_id: round(price * rng.uniform(0.7, 1.3), 2) for stock_id, price in prices.items()},
+        names={stock_id: f'Stock {stock_id}' for stock_id in stock_ids}
+    )
+
+
+@pytest.fixture(scope='module')
+def jobs():
+    return [
+        (player_id, strategy_name, {3: Holding(10, 40.0), 17: Holding(2, 90.0)}, 1000.0)
+        for player_id, strategy_name in enumerate(sorted(AI_STRATEGIES) * 4, start=1)
+    ]
+
+
+def orders_of(results):
+    return [(player_id, strategy_name, orders) for player_id, strategy_name, orders, _, _ in results]
+
+
+def test_bot_rng_depends_only_on_seed_year_and_player():
+    draws = [bot_rng('seed', 1960, 4).random() for _ in range(3)]
+
+    assert len(set(draws)) == 1
+    assert bot_rng('seed', 1961, 4).random() != draws[0]
+    assert bot_rng('seed', 1960, 5).random() != draws[0]
+    assert bot_rng('other', 1960, 4).random() != draws[0]
+
+
+def test_orders_do_not_depend_on_how_jobs_are_split(market, jobs):
+    together = orders_of(decide_orders(market, jobs, 'seed'))
+    split = orders_of(decide_orders(market, jobs[:7], 'seed') + decide_orders(market, jobs[7:], 'seed'))
+
+    assert together == split
+    assert any(orders for _, _, orders in together)
+
+
+def test_orders_are_the_same_in_a_spawned_worker(market, jobs):
+    # A spawned interpreter has its own hash seed, which must not change any bot's draws
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        remote = executor.submit(decide_orders, market, jobs, 'seed').result()
+
+    assert orders_of(remote) == orders_of(decide_orders(market, jobs, 'seed'))
+
+
+def test_a_failing_strategy_returns_its_error(market, monkeypatch):
+    def broken(market, holdings, cash, rng):
+        raise ValueError('no prices')
+
+    monkeypatch.setitem(AI_STRATEGIES, 'broken', broken)
+    [(player_id, strategy_name, orders, _, error)] = decide_orders(market, [(9, 'broken', {}, 100.0)])
+
+    assert (player_id, strategy_name, orders) == (9, 'broken', [])
+    assert error == 'ValueError: no prices'
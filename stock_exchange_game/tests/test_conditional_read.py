@@ -0,0 +1,77 @@
+import pytest
+
+
+@pytest.fixture
+def game_state(game_app):
+    state = game_app.game_state
+    saved = state.read_version
+    yield state
+    state.read_version = saved
+
+
+def get(client, path, etag=None):
+    return client.get(path, headers={'If-None-Match': f'"{etag}"'} if etag else {})
+
+
+def test_unchanged_reads_answer_304(client):
+    first = get(client, '/get_player_table')
+    etag = first.get_etag()[0]
+    assert first.status_code == 200
+    assert etag
+
+    again = get(client, '/get_player_table', etag)
+    assert again.status_code == 304
+    assert again.data == b''
+    assert again.get_etag()[0] == etag
+    assert again.headers['Cache-Control'] == 'no-cache'
+
+
+def trade(client):
+    token = client.post('/api/login', json={'teamName': 'ETag Team'}).get_json()['token']
+    stock = next(stock for stock in client.get('/api/stocks/music').get_json() if stock['price'] > 0)
+    response = client.post('/api/update_portfolio', json={str(stock['stock_id']): 1},
+                           headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+
+
+def test_a_trade_changes_the_etag(client):
+    etag = get(client, '/get_player_table').get_etag()[0]
+    trade(client)
+
+    after = get(client, '/get_player_table', etag)
+    assert after.status_code == 200
+    assert after.get_etag()[0] != etag
+
+
+def test_a_worker_behind_the_shared_version_does_not_confirm_newer_bodies(game_app, client, game_state):
+    with game_app.app.app_context():
+        game_app.announce_game_state(players=[])
+    behind = game_state.read_version - 1
+    etag = get(client, '/get_player_table').get_etag()[0]
+
+    # This worker has not yet applied the version the client's body came from
+    game_state.read_version = behind
+    assert get(client, '/get_player_table', etag).status_code == 200
+
+
+def test_query_string_and_year_are_part_of_the_etag(game_app, client, monkeypatch):
+    etag = get(client, '/api/stocks/music').get_etag()[0]
+    assert get(client, '/api/stocks/music?page=2').get_etag()[0] != etag
+    assert get(client, '/api/stocks/music', etag).status_code == 304
+
+    monkeypatch.setattr(game_app, 'current_year', game_app.current_year + 1)
+    assert get(client, '/api/stocks/music', etag).status_code == 200
+
+
+def test_year_only_reads_may_be_cached_until_the_next_tick(game_app, client, monkeypatch):
+    monkeypatch.setattr(game_app, 'seconds_to_next_tick', lambda: 12.5)
+
+    response = get(client, '/get_current_year')
+    assert response.headers['Cache-Control'] == 'max-age=12'
+
+
+def test_the_home_page_poll_sends_only_the_players(client):
+    first = get(client, '/update_stocks')
+    assert set(first.get_json()) == {'player_table'}
+
+    assert get(client, '/update_stocks', first.get_etag()[0]).status_code == 304
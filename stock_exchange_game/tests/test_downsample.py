@@ -0,0 +1,20 @@
+import pytest
+
+
+@pytest.mark.parametrize('count, points', [(0, 10), (5, 10), (10, 10), (7, None), (7, 0)])
+def test_short_histories_are_returned_whole(game_app, count, points):
+    indexes, step = game_app.downsample_indexes(count, points)
+
+    assert list(indexes) == list(range(count))
+    assert step == 1
+
+
+@pytest.mark.parametrize('count, points', [(11, 10), (125, 10), (125, 2), (126, 50), (1000, 7)])
+def test_long_histories_keep_evenly_spaced_points_and_the_last(game_app, count, points):
+    indexes, step = game_app.downsample_indexes(count, points)
+
+    assert len(indexes) <= points
+    assert indexes[0] == 0
+    assert indexes[-1] == count - 1
+    assert all(later - earlier == step for earlier, later in zip(indexes[:-2], indexes[1:-1]))
+    assert 0 < indexes[-1] - indexes[-2] <= step
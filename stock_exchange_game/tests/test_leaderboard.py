@@ -0,0 +1,92 @@
+import random
+
+
+def ranked(entries):
+    """
+    The ranking the leaderboard should hold: highest net worth first, ties by player_id.
+    """
+    return [player_id for player_id, _ in sorted(entries.items(), key=lambda item: (-round(item[1], 1), item[0]))]
+
+
+def test_update_rank_and_top(game_app):
+    board = game_app.Leaderboard()
+    board.update(1, 'Alpha', 1500.04)
+    board.update(2, 'Beta', 2000)
+    board.update(3, 'Gamma', 1500)
+
+    assert [row['player_id'] for row in board.top()] == [2, 1, 3]
+    assert board.top(1) == [{'player_id': 2, 'name': 'Beta', 'total_value': 2000}]
+    assert board.row(1)['total_value'] == 1500.0
+    assert [board.rank(player_id) for player_id in (1, 2, 3)] == [2, 1, 3]
+
+    board.update(3, 'Gamma', 2500)
+    assert [row['player_id'] for row in board.top()] == [3, 2, 1]
+    assert board.rank(1) == 3
+
+    board.remove(2)
+    assert board.rank(2) is None
+    assert [row['player_id'] for row in board.top()] == [3, 1]
+    assert len(board) == 2
+
+
+def test_clear_sets_the_year_and_empties_the_board(game_app):
+    board = game_app.Leaderboard()
+    board.update(1, 'Alpha', 10)
+    board.clear(1960)
+
+    assert board.year == 1960
+    assert board.top() == []
+    assert len(board) == 0
+
+
+def test_incremental_updates_match_a_full_sort(game_app):
+    rng = random.Random(7)
+    board = game_app.Leaderboard()
+    entries = {}
+
+    for _ in range(2000):
+        player_id = rng.randint(1, 60)
+        if rng.random() < 0.1:
+            board.remove(player_id)
+            entries.pop(player_id, None)
+        else:
+            # Few distinct values, so ties are common
+            total_value = rng.choice([1000, 1000.04, 1250.5, 999.96, rng.uniform(0, 5000)])
+            board.update(player_id, f'Team {player_id}', total_value)
+            entries[player_id] = total_value
+
+    expected = ranked(entries)
+    assert [row['player_id'] for row in board.top()] == expected
+    assert [board.rank(player_id) for player_id in expected] == list(range(1, len(expected) + 1))
+
+
+def test_a_trade_on_another_worker_revalues_just_the_players_it_stamped(game_app, monkeypatch):
+    db, state = game_app.db, game_app.game_state
+    year = game_app.current_year
+    with game_app.app.app_context():
+        board = game_app.rebuild_leaderboard(year)
+        traded, untouched = [row['player_id'] for row in board.top()][:2]
+        before = {player_id: board.row(player_id)['total_value'] for player_id in (traded, untouched)}
+        game = db.session.query(game_app.Game.state_version, game_app.Game.trade_version).first()
+        monkeypatch.setattr(state, 'version', game.state_version)
+        monkeypatch.setattr(state, 'trade_version', game.trade_version)
+
+        # Another worker moves both balances but only stamps the player who traded
+        db.session.query(game_app.Player).filter(game_app.Player.player_id.in_([traded, untouched])).update(
+            {'balance': game_app.Player.balance + 500}, synchronize_session=False)
+        db.session.commit()
+        monkeypatch.setattr(state, 'announce', lambda *args: None)
+        game_app.announce_game_state(players=[traded])
+        game = db.session.query(game_app.Game.state_version, game_app.Game.trade_version).first()
+
+    try:
+        assert state.apply(game.state_version, year, game_app.game_running, trade_version=game.trade_version)
+        assert board.year == year
+        assert board.row(traded)['total_value'] == round(before[traded] + 500, 1)
+        assert board.row(untouched)['total_value'] == before[untouched]
+    finally:
+        with game_app.app.app_context():
+            db.session.query(game_app.Player).filter(game_app.Player.player_id.in_([traded, untouched])).update(
+                {'balance': game_app.Player.balance - 500}, synchronize_session=False)
+            db.session.commit()
+            game_app.rebuild_leaderboard(year)
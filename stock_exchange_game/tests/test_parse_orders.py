@@ -0,0 +1,24 @@
+import pytest
+
+
+def test_zero_changes_are_skipped(game_app):
+    assert game_app.parse_orders({'1': 5, '2': 0, '3': -2}) == [(1, 5), (3, -2)]
+
+
+@pytest.mark.parametrize('data', [{'1': 5, ' 1': -5}, {'1': 5, '01': 0}, {'x': 1}, {'1': 1.5}, {'1': True}])
+def test_invalid_batches_are_rejected(game_app, data):
+    with pytest.raises(game_app.OrderRejected) as rejected:
+        game_app.parse_orders(data)
+
+    assert rejected.value.status_code == 400
+
+
+def test_a_duplicate_leg_is_rejected_before_anything_is_written(game_app, client):
+    token = client.post('/api/login', json={'teamName': 'Duplicate Legs Team'}).get_json()['token']
+    headers = {'Authorization': f'Bearer {token}'}
+    stock = next(stock for stock in client.get('/api/stocks/music').get_json() if stock['price'] > 0)
+    stock_id = str(stock['stock_id'])
+
+    response = client.post('/api/update_portfolio', json={stock_id: 1, f' {stock_id}': 1}, headers=headers)
+    assert response.status_code == 400
+    assert client.get('/api/player_portfolio', headers=headers).get_json() == []
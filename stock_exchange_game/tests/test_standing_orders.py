@@ -0,0 +1,94 @@
+import random
+from collections import namedtuple
+
+Order = namedtuple('Order', ['order_id', 'stock_id', 'side', 'order_type', 'trigger_price'])
+
+
+def triggered_ids(game_app, orders, stock_id, price):
+    return [order.order_id for order in game_app.StandingOrderIndex(orders).triggered(stock_id, price)]
+
+
+def test_limit_and_stop_triggers(game_app):
+    orders = [
+        Order(1, 7, 'buy', 'limit', 10.0),
+        Order(2, 7, 'sell', 'stop', 10.0),
+        Order(3, 7, 'sell', 'limit', 10.0),
+        Order(4, 7, 'buy', 'stop', 10.0),
+    ]
+
+    # Buy limits and sell stops fire at or below their trigger, sell limits and buy stops at or above
+    assert sorted(triggered_ids(game_app, orders, 7, 9.5)) == [1, 2]
+    assert sorted(triggered_ids(game_app, orders, 7, 10.0)) == [1, 2, 3, 4]
+    assert sorted(triggered_ids(game_app, orders, 7, 10.5)) == [3, 4]
+
+
+def test_only_crossed_triggers_fire_in_price_then_id_order(game_app):
+    orders = [
+        Order(5, 7, 'buy', 'limit', 12.0),
+        Order(1, 7, 'buy', 'limit', 8.0),
+        Order(3, 7, 'buy', 'limit', 12.0),
+        Order(2, 7, 'buy', 'limit', 15.0),
+        Order(4, 8, 'buy', 'limit', 20.0),
+    ]
+
+    assert triggered_ids(game_app, orders, 7, 11.0) == [3, 5, 2]
+    assert triggered_ids(game_app, orders, 7, 16.0) == []
+    assert triggered_ids(game_app, orders, 9, 1.0) == []
+
+
+def test_matches_a_scan_of_every_order(game_app):
+    rng = random.Random(3)
+    orders = [
+        Order(order_id, rng.randint(1, 5), rng.choice(['buy', 'sell']), rng.choice(['limit', 'stop']),
+              round(rng.uniform(5, 50), 1))
+        for order_id in range(1, 300)
+    ]
+    rules = {(side, order_type): at_or_below for side, order_type, at_or_below in game_app.ORDER_TRIGGERS}
+
+    for stock_id in range(1, 7):
+        for price in (4.0, 12.5, 25.0, 37.3, 51.0):
+            expected = {
+                order.order_id for order in orders if order.stock_id == stock_id and (
+                    order.trigger_price >= price if rules[order.side, order.order_type] else order.trigger_price <= price
+                )
+            }
+            assert set(triggered_ids(game_app, orders, stock_id, price)) == expected
+
+
+def test_orders_trigger_and_fill_at_adjusted_prices(game_app):
+    db = game_app.db
+    year = 1980
+    with game_app.app.app_context():
+        stock = (db.session.query(game_app.Stock).filter(game_app.Stock.year == year, game_app.Stock.price >= 20)
+                 .order_by(game_app.Stock.id).first())
+        demand = game_app.SupplyDemand(stock_id=stock.stock_id, year=year, demand_modifier=1.2)
+        player = game_app.Player(name='Standing Order Team', balance=100000)
+        db.session.add_all([demand, player])
+        db.session.flush()
+        base_price = stock.price
+        adjusted_price = game_app.price_orders([stock.stock_id], year)[stock.stock_id][1]
+        assert adjusted_price > base_price
+
+        # The first order would fire at the base price, only the second at the adjusted price
+        orders = [
+            game_app.StandingOrder(player_id=player.player_id, stock_id=stock.stock_id, side='buy',
+                                   order_type='limit', trigger_price=trigger_price, quantity=1, placed_year=year)
+            for trigger_price in (base_price, adjusted_price)
+        ]
+        db.session.add_all(orders)
+        db.session.commit()
+
+        try:
+            game_app.match_standing_orders(year)
+            db.session.commit()
+            at_base, at_adjusted = [db.session.get(game_app.StandingOrder, order.order_id) for order in orders]
+            assert at_base.status == 'pending'
+            assert at_adjusted.status == 'filled'
+            assert at_adjusted.fill_price == adjusted_price
+        finally:
+            db.session.rollback()
+            for model in (game_app.StandingOrder, game_app.Portfolio, game_app.CompletedSale):
+                db.session.query(model).filter_by(player_id=player.player_id).delete()
+            db.session.query(game_app.Player).filter_by(player_id=player.player_id).delete()
+            db.session.query(game_app.SupplyDemand).filter_by(supply_demand_id=demand.supply_demand_id).delete()
+            db.session.commit()
@@ -0,0 +1,57 @@
+import time
+
+
+def run_scheduler(game_app, tick_seconds, interval, years):
+    """
+    Run a TickScheduler for the given years with a tick that takes tick_seconds, and
+    return it with the start time and when each tick started.
+    """
+    starts = []
+    year = [1950]
+
+    def tick():
+        starts.append(time.monotonic())
+        time.sleep(tick_seconds)
+        year[0] += 1
+        return year[0]
+
+    scheduler = game_app.TickScheduler(tick, lambda year: interval, lambda current: current >= 1950 + years)
+    started = time.monotonic()
+    scheduler.start(1950)
+    scheduler.thread.join(timeout=30)
+    return scheduler, started, starts
+
+
+def test_ticks_do_not_drift_by_the_tick_time(game_app):
+    scheduler, started, starts = run_scheduler(game_app, tick_seconds=0.02, interval=0.05, years=10)
+
+    assert len(starts) == 10
+    # Sleeping a fixed interval after each tick would be 10 x 20 ms late by the last one
+    drift = [start - (started + 0.05 * (index + 1)) for index, start in enumerate(starts)]
+    assert max(drift) < 0.03
+    assert min(drift) > -0.005
+    assert scheduler.overruns == 0
+    assert not scheduler.running
+
+
+def test_slow_ticks_count_as_overruns_without_bunching_up(game_app):
+    scheduler, _, starts = run_scheduler(game_app, tick_seconds=0.06, interval=0.02, years=4)
+
+    assert len(starts) == 4
+    assert scheduler.overruns == 3
+    # A late tick pushes the deadline to its end instead of firing the missed ones back to back
+    assert min(later - earlier for earlier, later in zip(starts, starts[1:])) >= 0.05
+
+
+def test_fast_forward_runs_the_next_tick_now(game_app):
+    ticks = []
+    scheduler = game_app.TickScheduler(lambda: ticks.append(time.monotonic()) or 1951, lambda year: 60,
+                                       lambda year: True)
+    started = time.monotonic()
+    scheduler.start(1950)
+    scheduler.fast_forward()
+    scheduler.thread.join(timeout=5)
+
+    assert len(ticks) == 1
+    assert ticks[0] - started < 1
+    assert scheduler.stats()['jitter_ms']['max'] is None
@@ -0,0 +1,49 @@
+import pytest
+
+
+@pytest.fixture
+def game(game_app):
+    with game_app.app.app_context():
+        game = game_app.db.session.query(game_app.Game).first()
+        saved = (game.current_year, game.game_running)
+    yield game_app
+    with game_app.app.app_context():
+        game_app.db.session.execute(game_app.update(game_app.Game).values(
+            current_year=saved[0], game_running=saved[1]))
+        game_app.db.session.commit()
+
+
+def tick_footprint(game_app):
+    """
+    What a tick writes: the year, the bots' sales and the year's adjusted prices.
+    """
+    db = game_app.db
+    with game_app.app.app_context():
+        year = db.session.query(game_app.Game.current_year).scalar()
+        sales = db.session.query(db.func.count(game_app.CompletedSale.sale_id)).scalar()
+        adjusted = db.session.query(db.func.sum(game_app.Stock.adjusted_price)).filter_by(year=year).scalar()
+        return year, sales, adjusted
+
+
+def set_game(game_app, **values):
+    with game_app.app.app_context():
+        game_app.db.session.execute(game_app.update(game_app.Game).values(**values))
+        game_app.db.session.commit()
+
+
+def test_a_tick_advances_the_year(game):
+    set_game(game, current_year=1960, game_running=True)
+    game.update_year()
+
+    assert tick_footprint(game)[0] == 1961
+
+
+def test_a_stopped_game_is_not_ticked(game):
+    set_game(game, current_year=1960, game_running=True)
+    game.update_year()
+    set_game(game, game_running=False)
+    before = tick_footprint(game)
+
+    game.update_year()
+    assert tick_footprint(game) == before
+
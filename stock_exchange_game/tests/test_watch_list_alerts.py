@@ -0,0 +1,79 @@
+import random
+from collections import namedtuple
+
+Row = namedtuple('Row', ['player_id', 'stock_id', 'birth_alert', 'value_alert', 'value_alert_enabled'])
+
+
+def fired(game_app, rows, stock_id, previous_price, price):
+    return sorted(game_app.WatchListAlertIndex(rows).triggered(stock_id, previous_price, price))
+
+
+def test_birth_fires_when_a_stock_first_prices_at_8(game_app):
+    rows = [Row(1, 7, True, None, False), Row(2, 7, False, None, False)]
+
+    assert fired(game_app, rows, 7, 0, 8) == [(1, 'birth', None)]
+    assert fired(game_app, rows, 7, 8, 8) == []
+    assert fired(game_app, rows, 7, 0, 0) == []
+
+
+def test_value_alerts_fire_once_when_the_price_rises_through_them(game_app):
+    rows = [
+        Row(1, 7, False, 20.0, True),
+        Row(2, 7, False, 30.0, True),
+        Row(3, 7, False, 25.0, False),
+        Row(4, 7, False, None, True),
+        Row(5, 8, False, 21.0, True),
+    ]
+
+    assert fired(game_app, rows, 7, 15, 25) == [(1, 'value', 20.0)]
+    assert fired(game_app, rows, 7, 15, 30) == [(1, 'value', 20.0), (2, 'value', 30.0)]
+    # Already above the threshold, or falling through it
+    assert fired(game_app, rows, 7, 20, 29) == []
+    assert fired(game_app, rows, 7, 35, 15) == []
+
+
+def test_index_only_covers_watched_stocks(game_app):
+    index = game_app.WatchListAlertIndex([
+        Row(1, 7, True, None, False),
+        Row(1, 8, False, 10.0, True),
+        Row(1, 9, False, 10.0, False),
+    ])
+
+    assert index.stock_ids == {7, 8}
+
+
+def test_a_tick_stores_the_same_alerts_as_a_scan_of_every_row(game_app):
+    db = game_app.db
+    year = 1990
+    rng = random.Random(5)
+    with game_app.app.app_context():
+        snapshot = game_app.get_price_snapshot(year)
+        player = game_app.Player(name='Watch List Team', balance=1000)
+        db.session.add(player)
+        db.session.flush()
+        rows = [
+            game_app.WatchList(player_id=player.player_id, stock_id=stock.stock_id, birth_alert=rng.random() < 0.5,
+                               value_alert=round(rng.uniform(0, 2) * (stock.price or 8), 2),
+                               value_alert_enabled=rng.random() < 0.8)
+            for stock in snapshot.stocks
+        ]
+        db.session.add_all(rows)
+        db.session.commit()
+
+        index = game_app.WatchListAlertIndex(rows)
+        expected = sorted(
+            (stock_id, alert_type, threshold)
+            for stock_id in index.stock_ids
+            for _, alert_type, threshold in index.triggered(
+                stock_id, snapshot.get(stock_id).previous_base_price or 0, snapshot.get(stock_id).price)
+        )
+        try:
+            assert game_app.evaluate_watch_list_alerts(year) == len(expected)
+            stored = db.session.query(game_app.PlayerAlert).filter_by(player_id=player.player_id).all()
+            assert expected
+            assert sorted((alert.stock_id, alert.alert_type, alert.threshold) for alert in stored) == expected
+        finally:
+            for model in (game_app.PlayerAlert, game_app.WatchList):
+                db.session.query(model).filter_by(player_id=player.player_id).delete()
+            db.session.query(game_app.Player).filter_by(player_id=player.player_id).delete()
+            db.session.commit()